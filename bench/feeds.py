@@ -0,0 +1,82 @@
+"""
+Checked-in feeds and deterministic synthetic copies of them scaled up N times.
+Every copy of a record gets a numbered suffix on its name fields, so a scaled
+feed holds N times as many distinct entities rather than N duplicates.
+"""
+import csv
+import os
+import re
+
+FEED_DIR = os.getenv("BENCH_FEED_DIR", "artifacts/bench/feeds")
+
+# feed key -> (checked-in file, record element patterns, name field pattern)
+XML_FEEDS = {
+    "un": ("data/UN.xml",
+           [r"<INDIVIDUAL>.*?</INDIVIDUAL>", r"<ENTITY>.*?</ENTITY>"],
+           r"(<FIRST_NAME>)([^<]*)"),
+    "ofac": ("data/consolidated.xml",
+             [r"<sdnEntry>.*?</sdnEntry>"],
+             r"(<lastName>)([^<]*)"),
+    "seco": ("data/seco.xml",
+             [r"<target\b[^>]*>.*?</target>"],
+             r"(<value>)([^<]*)"),
+}
+CSV_FEEDS = {
+    "uk": ("data/uk_predicted.csv", "Name"),
+}
+
+
+def _scale_xml(text, record_patterns, name_pattern, scale):
+    name_re = re.compile(name_pattern)
+
+    def repeat(match):
+        block = match.group(0)
+        copies = [block]
+        for n in range(1, scale):
+            copies.append(name_re.sub(lambda m: f"{m.group(1)}{m.group(2)} {n}", block))
+        return "\n".join(copies)
+
+    for pattern in record_patterns:
+        text = re.sub(pattern, repeat, text, flags=re.DOTALL)
+    return text
+
+
+def _scale_csv(src, dst, name_column, scale):
+    with open(src, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+    with open(dst, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            for n in range(1, scale):
+                writer.writerow(dict(row, **{name_column: f"{row[name_column]} {n}"}))
+
+
+def feed_path(feed, scale=1, out_dir=FEED_DIR):
+    """Path of `feed` scaled `scale` times, generating it on first use."""
+    if feed in XML_FEEDS:
+        src = XML_FEEDS[feed][0]
+    else:
+        src = CSV_FEEDS[feed][0]
+    if scale == 1:
+        return src
+
+    root, ext = os.path.splitext(os.path.basename(src))
+    dst = os.path.join(out_dir, f"{root}.x{scale}{ext}")
+    if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+        return dst
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = dst + ".tmp"
+    if feed in XML_FEEDS:
+        _, record_patterns, name_pattern = XML_FEEDS[feed]
+        with open(src, encoding="utf-8") as f:
+            text = f.read()
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(_scale_xml(text, record_patterns, name_pattern, scale))
+    else:
+        _scale_csv(src, tmp, CSV_FEEDS[feed][1], scale)
+    os.replace(tmp, dst)
+    return dst
@@ -0,0 +1,261 @@
+"""
+Benchmarks for the feed parsers and the database load path.
+
+Each case runs in a fresh interpreter so its peak RSS is its own, against the
+checked-in feeds and synthetic copies scaled up (see bench.feeds). Results are
+written as JSON keyed by commit, and can be compared against an earlier run:
+
+    python -m bench.run                                  # all cases at 1x, 10x, 100x
+    python -m bench.run --cases parse_un load_records --scales 1 10
+    python -m bench.run --compare artifacts/bench/abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from bench.feeds import feed_path
+
+RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", "artifacts/bench")
+# timings this short are mostly noise and never count as a regression
+MIN_SECONDS = 0.05
+
+# parser benchmarks: case -> feed
+PARSE_CASES = {
+    "parse_un": "un",
+    "parse_xml": "ofac",
+    "parse_sdn": "seco",
+    "parse_swiss": "seco",
+    "parse_csv": "uk",
+    # the same feeds through the compiled mappings in config/mappings/
+    "map_un": "un",
+    "map_ofac": "ofac",
+    "map_sdn": "seco",
+    "map_swiss": "seco",
+}
+# load benchmarks run each of these paths over each of these feeds
+LOAD_CASES = ("load_records", "insert_per_row")
+LOAD_FEEDS = ("un", "ofac", "uk")
+
+# feed -> (parser case used to produce its records, source name)
+FEED_SOURCES = {
+    "un": ("parse_un", "UN"),
+    "ofac": ("parse_xml", "USOFAC-Consolidated"),
+    "seco": ("parse_swiss", "Swizerland"),
+    "uk": ("parse_csv", "uk"),
+}
+
+
+def _peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _parse(case, path, source):
+    """Yield the records of `path` as produced by the parser behind `case`."""
+    if case == "parse_csv":
+        from utils.csv_parsers import parse_csv as parser
+    elif case.startswith("map_"):
+        from utils.mappings import mapping_parser
+        parser = mapping_parser(case[len("map_"):])
+    else:
+        from utils import xml_parsers
+        parser = getattr(xml_parsers, case)
+    with open(path, "rb") as stream:
+        yield from parser(stream, source)
+
+
+def _open_db(db):
+    if db == "mysql":
+        # never benchmark against the real list: point at a dedicated schema
+        os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", "sanctions_bench")
+        from db.db_utils import connect_db
+        from db.schema import ensure_schema
+        conn = connect_db()
+        cursor = conn.cursor()
+        ensure_schema(cursor)
+        for table in ("aliases", "nationalities", "sanction_types", "sanctioned_entities"):
+            cursor.execute(f"DELETE FROM {table}")
+        conn.commit()
+        return conn
+    from db.sqlite_db import Connection
+    return Connection(os.path.join(tempfile.mkdtemp(prefix="sanctions-bench-"), "bench.db"))
+
+
+def _load(case, cursor, records):
+    from db import db_utils
+    from db.dedup_index import DedupIndex
+    from db.lookups import LookupCache
+    if case == "load_records":
+        db_utils.load_records(cursor, records, db_utils.DEFAULT_BATCH_SIZE, DedupIndex(), LookupCache())
+        return
+    lookups = LookupCache()
+    for record in records:
+        entity_id = db_utils.insert_entity(cursor, record)
+        if entity_id is None:
+            continue
+        db_utils.insert_aliases(cursor, entity_id, record.aliases)
+        db_utils.insert_nationalities(cursor, entity_id, record.nationalities, lookups)
+        db_utils.insert_sanction_types(cursor, entity_id, record.sanction_types, lookups)
+
+
+def run_case(case, feed, scale, db="sqlite"):
+    """Run one benchmark in this process and return its measurements."""
+    path = feed_path(feed, scale)
+    parse_case, source = FEED_SOURCES[feed]
+    result = {"case": case, "feed": feed, "scale": scale, "path": path, "bytes": os.path.getsize(path)}
+
+    if case in PARSE_CASES:
+        start = time.perf_counter()
+        count = sum(1 for _ in _parse(case, path, source))
+        seconds = time.perf_counter() - start
+    else:
+        records = list(_parse(parse_case, path, source))
+        count = len(records)
+        conn = _open_db(db)
+        cursor = conn.cursor()
+        start = time.perf_counter()
+        _load(case, cursor, records)
+        conn.commit()
+        seconds = time.perf_counter() - start
+        conn.close()
+        result["db"] = db
+
+    result.update({
+        "records": count,
+        "seconds": seconds,
+        "records_per_sec": count / seconds if seconds > 0 else None,
+        "peak_rss_bytes": _peak_rss(),
+    })
+    return result
+
+
+def _run_isolated(case, feed, scale, db):
+    spec = json.dumps({"case": case, "feed": feed, "scale": scale, "db": db})
+    proc = subprocess.run([sys.executable, "-m", "bench.run", "--worker", spec],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        last = proc.stderr.strip().splitlines()[-1:] or ["no output"]
+        raise RuntimeError(f"{case} on {feed} x{scale} failed: {last[0]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def plan(cases, scales):
+    jobs = []
+    for case in cases:
+        feeds = [PARSE_CASES[case]] if case in PARSE_CASES else LOAD_FEEDS
+        for feed in feeds:
+            for scale in scales:
+                jobs.append((case, feed, scale))
+    return jobs
+
+
+def run_suite(cases, scales, repeat=3, db="sqlite"):
+    results = []
+    for case, feed, scale in plan(cases, scales):
+        feed_path(feed, scale)  # generate outside the timed runs
+        try:
+            runs = [_run_isolated(case, feed, scale, db) for _ in range(repeat)]
+        except RuntimeError as e:
+            print(f"  [ERROR] {e}")
+            results.append({"case": case, "feed": feed, "scale": scale, "error": str(e)})
+            continue
+        seconds = [run["seconds"] for run in runs]
+        best = min(runs, key=lambda run: run["seconds"])
+        row = dict(best, seconds=best["seconds"], median_seconds=statistics.median(seconds),
+                   runs=len(runs), peak_rss_bytes=max(run["peak_rss_bytes"] for run in runs))
+        results.append(row)
+        print(f"{case:<16} {feed:<5} x{scale:<4} {row['records']:>9} records  "
+              f"{row['seconds']:8.3f}s  {row['records_per_sec'] or 0:>12,.0f} rec/s  "
+              f"{row['peak_rss_bytes'] / 2**20:8.1f} MiB")
+    return results
+
+
+def _key(row):
+    return (row["case"], row["feed"], row["scale"])
+
+
+def compare(base, current, threshold=0.10):
+    """Print per-case changes against `base`; returns the cases that regressed."""
+    base_rows = {_key(row): row for row in base["results"]}
+    regressions = []
+    print(f"\nCompared with {base.get('commit', '?')} (threshold {threshold:.0%}):")
+    for row in current["results"]:
+        old = base_rows.get(_key(row))
+        if old is None or "error" in row or "error" in old:
+            continue
+        time_ratio = row["seconds"] / old["seconds"] if old["seconds"] else 1.0
+        rss_ratio = row["peak_rss_bytes"] / old["peak_rss_bytes"] if old["peak_rss_bytes"] else 1.0
+        flag = ""
+        slower = time_ratio > 1 + threshold and row["seconds"] >= MIN_SECONDS
+        if slower or rss_ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(_key(row))
+        case, feed, scale = _key(row)
+        print(f"{case:<16} {feed:<5} x{scale:<4} time {time_ratio - 1:+7.1%}  rss {rss_ratio - 1:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sanctions feed parsers and loaders.")
+    parser.add_argument("--cases", nargs="+", choices=list(PARSE_CASES) + list(LOAD_CASES),
+                        default=list(PARSE_CASES) + list(LOAD_CASES))
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3, help="fresh-process runs per case (best is kept)")
+    parser.add_argument("--db", choices=["sqlite", "mysql"], default="sqlite",
+                        help="load path target; mysql uses BENCH_DB_NAME (default sanctions_bench)")
+    parser.add_argument("--output", help="results file (default artifacts/bench/<commit>.json)")
+    parser.add_argument("--compare", metavar="BASE", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown / memory growth counted as a regression")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        spec = json.loads(args.worker)
+        print(json.dumps(run_case(spec["case"], spec["feed"], spec["scale"], spec["db"])))
+        return
+
+    commit = _commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": run_suite(args.cases, args.scales, args.repeat, args.db),
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        if compare(base, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
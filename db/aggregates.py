@@ -0,0 +1,309 @@
+"""
+Summary tables for list statistics, kept up to date by the ETL so dashboards
+read them by primary key instead of grouping the full tables:
+
+    source_stats       per source: entities, aliases, nationalities,
+                       sanction types, entities with several nationalities
+    nationality_stats  entities per nationality_id
+    program_stats      entities per sanction_type_id
+    sanctioned_entities.multi_nationality   1 when the entity has more than one nationality
+
+The writer feeds a ListStats with the rows it inserts and deletes, and it
+applies them to the tables as deltas in the transaction that commits those
+rows. Only `rebuild_stats` (migrations, snapshot restores, --rebuild)
+recomputes everything from scratch.
+
+    python -m db.aggregates              # print the statistics
+    python -m db.aggregates --check      # compare with a full recount
+    python -m db.aggregates --rebuild    # recompute from scratch
+"""
+import argparse
+from datetime import datetime
+
+from db.db_utils import LIVE_TABLES, _placeholders, chunked
+
+SOURCE_COLUMNS = ('entities', 'aliases', 'nationalities', 'sanction_types', 'multi_nationality')
+# child table -> (summary table, key column)
+KEYED_STATS = {
+    'nationalities': ('nationality_stats', 'nationality_id'),
+    'sanction_types': ('program_stats', 'sanction_type_id'),
+}
+STATS_TABLES = ('source_stats',) + tuple(table for table, _ in KEYED_STATS.values())
+
+
+def _table(tables, name):
+    return tables.get(name, name)
+
+
+class ListStats:
+    """
+    Deltas to the summary tables accumulated by the writer since the last
+    flush. Per entity it tracks the source, the multi_nationality flag as
+    stored and the current number of nationality rows, so flags are settled
+    without recounting; entities it has not seen are looked up at flush time.
+    """
+
+    def __init__(self, tables=LIVE_TABLES):
+        # logical -> physical names; a shadow load writes the staging copies
+        self.tables = tables
+        self.discard()
+
+    def discard(self):
+        """Forget everything since the last flush (the transaction was rolled back)."""
+        self.sources = {}
+        self.keyed = {table: {} for table in KEYED_STATS}
+        # entity_id -> [source, stored flag, nationality rows]
+        self.entities = {}
+        # entities that gained nationalities without being tracked
+        self.unknown = set()
+
+    def _add(self, source, column, delta):
+        counts = self.sources.setdefault(source or '', dict.fromkeys(SOURCE_COLUMNS, 0))
+        counts[column] += delta
+
+    def add_entities(self, rows):
+        """(entity_id, source) of newly inserted entities."""
+        for entity_id, source in rows:
+            self._add(source, 'entities', 1)
+            self.entities[entity_id] = [source, 0, 0]
+
+    def add_children(self, table, rows, sources):
+        """Inserted (entity_id, value) rows of a child table; `sources` maps entity_id -> source."""
+        for entity_id, value in rows:
+            self._add(sources.get(entity_id), table, 1)
+            if table in self.keyed:
+                self.keyed[table][value] = self.keyed[table].get(value, 0) + 1
+            if table == 'nationalities':
+                state = self.entities.get(entity_id)
+                if state is None:
+                    self.unknown.add(entity_id)
+                else:
+                    state[2] += 1
+
+    def remove_children(self, cursor, entity_ids):
+        """Account for the child rows of `entity_ids`; call before deleting them."""
+        entity_table = _table(self.tables, 'sanctioned_entities')
+        for chunk in chunked(list(entity_ids), 1000):
+            placeholders = _placeholders(len(chunk))
+            cursor.execute(f"""
+                SELECT entity_id, source, multi_nationality FROM {entity_table}
+                WHERE entity_id IN ({placeholders})
+            """, chunk)
+            for row in cursor.fetchall():
+                # the stored flag stands until the next flush rewrites it
+                self.entities[row['entity_id']] = [row['source'], row['multi_nationality'], 0]
+                self.unknown.discard(row['entity_id'])
+            cursor.execute(f"""
+                SELECT 'aliases' AS kind, entity_id, NULL AS value FROM {_table(self.tables, 'aliases')}
+                WHERE entity_id IN ({placeholders})
+                UNION ALL
+                SELECT 'nationalities', entity_id, nationality_id FROM {_table(self.tables, 'nationalities')}
+                WHERE entity_id IN ({placeholders})
+                UNION ALL
+                SELECT 'sanction_types', entity_id, sanction_type_id FROM {_table(self.tables, 'sanction_types')}
+                WHERE entity_id IN ({placeholders})
+            """, chunk * 3)
+            for row in cursor.fetchall():
+                state = self.entities.get(row['entity_id'])
+                self._add(state[0] if state else None, row['kind'], -1)
+                if row['kind'] in self.keyed:
+                    keyed = self.keyed[row['kind']]
+                    keyed[row['value']] = keyed.get(row['value'], 0) - 1
+
+    def remove_entities(self, entity_ids):
+        """Entities being deleted, after remove_children has seen them."""
+        for entity_id in entity_ids:
+            state = self.entities.pop(entity_id, None)
+            self.unknown.discard(entity_id)
+            if state is not None:
+                self._add(state[0], 'entities', -1)
+                self._add(state[0], 'multi_nationality', -state[1])
+
+    def _load_unknown(self, cursor):
+        entity_table = _table(self.tables, 'sanctioned_entities')
+        nationality_table = _table(self.tables, 'nationalities')
+        for chunk in chunked(sorted(self.unknown), 1000):
+            cursor.execute(f"""
+                SELECT e.entity_id, e.source, e.multi_nationality, COUNT(n.entity_id) AS count
+                FROM {entity_table} e LEFT JOIN {nationality_table} n ON n.entity_id = e.entity_id
+                WHERE e.entity_id IN ({_placeholders(len(chunk))})
+                GROUP BY e.entity_id, e.source, e.multi_nationality
+            """, chunk)
+            for row in cursor.fetchall():
+                self.entities[row['entity_id']] = [row['source'], row['multi_nationality'], row['count']]
+        self.unknown = set()
+
+    def flush(self, cursor):
+        """Write the accumulated deltas and flags; commit is left to the caller."""
+        if self.unknown:
+            self._load_unknown(cursor)
+        flags = []
+        for entity_id, (source, stored, count) in self.entities.items():
+            flag = 1 if count > 1 else 0
+            if flag != stored:
+                flags.append((flag, entity_id))
+                self._add(source, 'multi_nationality', flag - stored)
+        if flags:
+            cursor.executemany(
+                f"UPDATE {_table(self.tables, 'sanctioned_entities')} SET multi_nationality = %s "
+                f"WHERE entity_id = %s", flags
+            )
+
+        now = datetime.now()
+        source_rows = [(source,) + tuple(counts[c] for c in SOURCE_COLUMNS) + (now,)
+                       for source, counts in sorted(self.sources.items()) if any(counts.values())]
+        if source_rows:
+            cursor.executemany(f"""
+                INSERT INTO {_table(self.tables, 'source_stats')}
+                    (source, {', '.join(SOURCE_COLUMNS)}, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE {', '.join(f'{c} = {c} + VALUES({c})' for c in SOURCE_COLUMNS)},
+                    updated_at = VALUES(updated_at)
+            """, source_rows)
+            cursor.execute(f"DELETE FROM {_table(self.tables, 'source_stats')} WHERE entities <= 0")
+
+        for child, (stats_table, key_column) in KEYED_STATS.items():
+            rows = [(key, delta, now) for key, delta in sorted(self.keyed[child].items()) if delta]
+            if not rows:
+                continue
+            stats_table = _table(self.tables, stats_table)
+            cursor.executemany(f"""
+                INSERT INTO {stats_table} ({key_column}, entities, updated_at) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE entities = entities + VALUES(entities), updated_at = VALUES(updated_at)
+            """, rows)
+            cursor.execute(f"DELETE FROM {stats_table} WHERE entities <= 0")
+        self.discard()
+
+
+def count_stats(cursor):
+    """Recount the statistics from the live tables: (sources, nationalities, programs, multi-nationality ids)."""
+    sources = {}
+
+    def add(rows, column):
+        for row in rows:
+            counts = sources.setdefault(row['source'] or '', dict.fromkeys(SOURCE_COLUMNS, 0))
+            counts[column] = row['count']
+
+    cursor.execute("SELECT source, COUNT(*) AS count FROM sanctioned_entities GROUP BY source")
+    add(cursor.fetchall(), 'entities')
+    for table in ('aliases', 'nationalities', 'sanction_types'):
+        cursor.execute(f"""
+            SELECT e.source, COUNT(*) AS count FROM {table} t
+            JOIN sanctioned_entities e ON e.entity_id = t.entity_id GROUP BY e.source
+        """)
+        add(cursor.fetchall(), table)
+    cursor.execute("SELECT entity_id FROM nationalities GROUP BY entity_id HAVING COUNT(*) > 1")
+    multi = {row['entity_id'] for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT e.source, COUNT(*) AS count FROM sanctioned_entities e
+        JOIN (SELECT entity_id FROM nationalities GROUP BY entity_id HAVING COUNT(*) > 1) m
+            ON m.entity_id = e.entity_id
+        GROUP BY e.source
+    """)
+    add(cursor.fetchall(), 'multi_nationality')
+
+    keyed = {}
+    for child, (_, key_column) in KEYED_STATS.items():
+        cursor.execute(f"SELECT {key_column} AS id, COUNT(*) AS count FROM {child} GROUP BY {key_column}")
+        keyed[child] = {row['id']: row['count'] for row in cursor.fetchall()}
+    return sources, keyed['nationalities'], keyed['sanction_types'], multi
+
+
+def rebuild_stats(cursor):
+    """Recompute every summary table and flag from the live tables; commit is left to the caller."""
+    sources, nationalities, programs, multi = count_stats(cursor)
+    now = datetime.now()
+    cursor.execute("UPDATE sanctioned_entities SET multi_nationality = 0 WHERE multi_nationality <> 0")
+    for batch in chunked(sorted(multi), 1000):
+        cursor.execute(f"UPDATE sanctioned_entities SET multi_nationality = 1 "
+                       f"WHERE entity_id IN ({_placeholders(len(batch))})", batch)
+    for table in STATS_TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.executemany(f"""
+        INSERT INTO source_stats (source, {', '.join(SOURCE_COLUMNS)}, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [(source,) + tuple(counts[c] for c in SOURCE_COLUMNS) + (now,) for source, counts in sources.items()])
+    for (stats_table, key_column), counts in zip(KEYED_STATS.values(), (nationalities, programs)):
+        cursor.executemany(
+            f"INSERT INTO {stats_table} ({key_column}, entities, updated_at) VALUES (%s, %s, %s)",
+            [(key, count, now) for key, count in counts.items()]
+        )
+
+
+def read_stats(cursor):
+    """The summary tables as stored: {'sources': [...], 'nationalities': [...], 'programs': [...]} of dict rows."""
+    cursor.execute(f"SELECT source, {', '.join(SOURCE_COLUMNS)} FROM source_stats ORDER BY source")
+    sources = cursor.fetchall()
+    cursor.execute("""
+        SELECT s.nationality_id, c.nationality, s.entities FROM nationality_stats s
+        JOIN nationality_codes c ON c.nationality_id = s.nationality_id
+        ORDER BY s.entities DESC, c.nationality
+    """)
+    nationalities = cursor.fetchall()
+    cursor.execute("""
+        SELECT s.sanction_type_id, p.sanction_type, s.entities FROM program_stats s
+        JOIN sanction_programs p ON p.sanction_type_id = s.sanction_type_id
+        ORDER BY s.entities DESC, p.sanction_type
+    """)
+    return {'sources': sources, 'nationalities': nationalities, 'programs': cursor.fetchall()}
+
+
+def check_stats(cursor):
+    """Differences between the stored statistics and a full recount, as readable strings."""
+    sources, nationalities, programs, multi = count_stats(cursor)
+    stored = read_stats(cursor)
+    problems = []
+    stored_sources = {row['source']: {c: row[c] for c in SOURCE_COLUMNS} for row in stored['sources']}
+    if stored_sources != sources:
+        problems.append(f"source_stats {stored_sources} != recount {sources}")
+    for name, key_column, counts in (('nationalities', 'nationality_id', nationalities),
+                                     ('programs', 'sanction_type_id', programs)):
+        stored_counts = {row[key_column]: row['entities'] for row in stored[name]}
+        if stored_counts != counts:
+            problems.append(f"{name}: {len(set(stored_counts.items()) ^ set(counts.items()))} entries differ")
+    cursor.execute("SELECT entity_id FROM sanctioned_entities WHERE multi_nationality = 1")
+    flagged = {row['entity_id'] for row in cursor.fetchall()}
+    if flagged != multi:
+        problems.append(f"multi_nationality: {len(flagged ^ multi)} entities flagged wrongly")
+    return problems
+
+
+if __name__ == "__main__":
+    from db.db_utils import connect_db
+
+    parser = argparse.ArgumentParser(description="Show, check or rebuild the list statistics.")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--check", action="store_true", help="compare the summary tables with a full recount")
+    action.add_argument("--rebuild", action="store_true", help="recompute the summary tables from scratch")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    if conn is None:
+        raise SystemExit(1)
+    cursor = conn.cursor()
+    try:
+        if args.rebuild:
+            rebuild_stats(cursor)
+            conn.commit()
+            print("Rebuilt the list statistics")
+        elif args.check:
+            problems = check_stats(cursor)
+            for problem in problems:
+                print(f"  [ERROR] {problem}")
+            print("List statistics match a full recount" if not problems else "List statistics are out of date")
+            if problems:
+                raise SystemExit(1)
+        else:
+            stats = read_stats(cursor)
+            print(f"{'source':<24} " + ' '.join(f"{c:>17}" for c in SOURCE_COLUMNS))
+            for row in stats['sources']:
+                print(f"{row['source']:<24} " + ' '.join(f"{row[c]:>17}" for c in SOURCE_COLUMNS))
+            print("\nTop nationalities:")
+            for row in stats['nationalities'][:10]:
+                print(f"  {row['entities']:>6}  {row['nationality']}")
+            print("\nTop programs:")
+            for row in stats['programs'][:10]:
+                print(f"  {row['entities']:>6}  {row['sanction_type']}")
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,33 @@
+import os
+from datetime import datetime
+
+# Records per transaction in a checkpointed load; 0 commits once per source
+DEFAULT_COMMIT_EVERY = int(os.getenv("ETL_COMMIT_EVERY", 10000))
+
+
+def load_checkpoints(cursor):
+    """{source: (feed_hash, record_offset)} for every source with an unfinished load."""
+    cursor.execute("SELECT source, feed_hash, record_offset FROM load_checkpoints")
+    return {row['source']: (row['feed_hash'], row['record_offset']) for row in cursor.fetchall()}
+
+
+def resume_offset(checkpoints, source, feed_hash):
+    """Records of `source` already committed from this exact feed, or 0 if it changed."""
+    saved = checkpoints.get(source)
+    if saved is None or saved[0] != feed_hash:
+        return 0
+    return saved[1]
+
+
+def save_checkpoint(cursor, source, feed_hash, offset):
+    """Record `offset`; runs in the same transaction as the records it covers."""
+    cursor.execute("""
+        INSERT INTO load_checkpoints (source, feed_hash, record_offset, updated_at)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE feed_hash = VALUES(feed_hash),
+            record_offset = VALUES(record_offset), updated_at = VALUES(updated_at)
+    """, (source, feed_hash, offset, datetime.now()))
+
+
+def clear_checkpoint(cursor, source):
+    cursor.execute("DELETE FROM load_checkpoints WHERE source = %s", (source,))
@@ -0,0 +1,243 @@
+"""
+Columnar snapshots of the sanctions tables, in place of sanctions_dump.sql.
+
+`export` writes every table as a zstd-compressed Parquet file (or an
+uncompressed Arrow IPC file, which can be memory-mapped without copying)
+plus a manifest.json with row counts and checksums. `restore` bulk-loads a
+snapshot into the database named by DB_NAME, creating the schema first, so
+the dump no longer needs editing or a Workbench import. `open_snapshot`
+maps a snapshot for read-only analysis with no MySQL server at all.
+
+    python -m db.columnar export artifacts/snapshot
+    python -m db.columnar restore artifacts/snapshot --database restored_sanctions
+    python -m db.columnar inspect artifacts/snapshot
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import pymysql
+
+from db.aggregates import rebuild_stats
+from db.db_utils import chunked
+from db.read_api import bump_version
+from db.schema import ensure_schema
+
+MANIFEST = "manifest.json"
+SNAPSHOT_FORMAT = 1
+EXPORT_BATCH_SIZE = 10000
+
+_ID = pa.int32()
+_TEXT = pa.string()
+# repetitive strings are stored once per file and referenced by index
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+# Exported tables, parents first, with their column types
+TABLES = {
+    'sanctioned_entities': [('entity_id', _ID), ('name', _TEXT), ('designation', _DICT), ('source', _DICT),
+                            ('name_norm', _TEXT), ('name_hash', _TEXT)],
+    'nationality_codes': [('nationality_id', _ID), ('nationality', _TEXT)],
+    'sanction_programs': [('sanction_type_id', _ID), ('sanction_type', _TEXT)],
+    'aliases': [('alias_id', _ID), ('entity_id', _ID), ('alias_name', _TEXT),
+                ('alias_norm', _TEXT), ('alias_hash', _TEXT)],
+    'nationalities': [('nat_id', _ID), ('entity_id', _ID), ('nationality_id', _ID)],
+    'sanction_types': [('type_id', _ID), ('entity_id', _ID), ('sanction_type_id', _ID)],
+}
+# Bookkeeping that refers to the entity ids being replaced; the next ETL run rebuilds it
+DERIVED_TABLES = ('source_snapshots', 'load_checkpoints', 'canonical_entity')
+
+
+def table_schema(table):
+    return pa.schema([pa.field(name, type_) for name, type_ in TABLES[table]])
+
+
+def _sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _open_writer(path, schema, fmt):
+    if fmt == 'parquet':
+        return pq.ParquetWriter(path, schema, compression='zstd', use_dictionary=True)
+    # uncompressed so readers can map the buffers in place
+    return ipc.new_file(path, schema)
+
+
+def export_table(conn, table, path, fmt='parquet', batch_size=EXPORT_BATCH_SIZE):
+    """Stream one table into a Parquet / Arrow file. Returns the row count."""
+    schema = table_schema(table)
+    columns = [name for name, _ in TABLES[table]]
+    rows = 0
+    cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+    writer = _open_writer(path, schema, fmt)
+    try:
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {columns[0]}")
+        for batch in chunked(cursor, batch_size):
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            rows += len(batch)
+    finally:
+        writer.close()
+        cursor.close()
+    return rows
+
+
+def export_snapshot(conn, out_dir, fmt='parquet'):
+    """Write every table and the manifest to `out_dir`. Returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    extension = 'parquet' if fmt == 'parquet' else 'arrow'
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "file_format": fmt,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "tables": {},
+    }
+    for table in TABLES:
+        filename = f"{table}.{extension}"
+        path = os.path.join(out_dir, filename)
+        rows = export_table(conn, table, path, fmt)
+        manifest["tables"][table] = {
+            "file": filename,
+            "rows": rows,
+            "bytes": os.path.getsize(path),
+            "sha256": _sha256(path),
+            "columns": [name for name, _ in TABLES[table]],
+        }
+    # written last: a directory with a manifest holds a complete snapshot
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(snapshot_dir, verify=True):
+    with open(os.path.join(snapshot_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{snapshot_dir} has snapshot format {manifest.get('format')}, expected {SNAPSHOT_FORMAT}")
+    if verify:
+        for table, entry in manifest["tables"].items():
+            if _sha256(os.path.join(snapshot_dir, entry["file"])) != entry["sha256"]:
+                raise ValueError(f"{entry['file']} does not match its checksum in the manifest")
+    return manifest
+
+
+def _read_table(path, file_format):
+    if file_format == 'parquet':
+        return pq.read_table(path, memory_map=True)
+    # zero-copy: the columns point straight into the mapped file
+    return ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def open_snapshot(snapshot_dir, verify=False):
+    """{table: pyarrow.Table} for a snapshot, read through memory maps (no database needed)."""
+    manifest = read_manifest(snapshot_dir, verify)
+    return {
+        table: _read_table(os.path.join(snapshot_dir, entry["file"]), manifest["file_format"])
+        for table, entry in manifest["tables"].items()
+    }
+
+
+def _table_rows(arrow_table, batch_size):
+    """Yield lists of row tuples in the column order of the snapshot."""
+    for batch in arrow_table.to_batches(max_chunksize=batch_size):
+        yield list(zip(*(batch.column(i).to_pylist() for i in range(batch.num_columns))))
+
+
+def restore_snapshot(conn, snapshot_dir, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Replace the contents of the sanctions tables with a snapshot, in one
+    transaction, and clear the bookkeeping tied to the old entity ids.
+    Returns {table: rows}.
+    """
+    manifest = read_manifest(snapshot_dir)
+    cursor = conn.cursor()
+    counts = {}
+    try:
+        ensure_schema(cursor)
+        conn.commit()
+        # ids come from the snapshot, so the foreign keys already hold
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in DERIVED_TABLES + tuple(reversed(list(manifest["tables"]))):
+            cursor.execute(f"DELETE FROM {table}")
+        for table, entry in manifest["tables"].items():
+            arrow_table = _read_table(os.path.join(snapshot_dir, entry["file"]), manifest["file_format"])
+            columns = arrow_table.column_names
+            insert = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                      f"VALUES ({', '.join(['%s'] * len(columns))})")
+            counts[table] = 0
+            for rows in _table_rows(arrow_table, batch_size):
+                cursor.executemany(insert, rows)
+                counts[table] += len(rows)
+            if counts[table] != entry["rows"]:
+                raise ValueError(f"{table}: restored {counts[table]} rows, manifest lists {entry['rows']}")
+        # the summary tables describe the restored rows, not the replaced ones
+        rebuild_stats(cursor)
+        bump_version(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        finally:
+            cursor.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or restore columnar snapshots of the sanctions tables.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="write every table to a snapshot directory")
+    export_cmd.add_argument("out_dir")
+    export_cmd.add_argument("--format", choices=["parquet", "arrow"], default="parquet",
+                            help="parquet: zstd-compressed; arrow: uncompressed IPC, memory-mappable in place")
+    restore_cmd = commands.add_parser("restore", help="bulk-load a snapshot into MySQL")
+    restore_cmd.add_argument("snapshot_dir")
+    restore_cmd.add_argument("--database", help="schema to restore into (default DB_NAME)")
+    inspect_cmd = commands.add_parser("inspect", help="open a snapshot without a database and show its tables")
+    inspect_cmd.add_argument("snapshot_dir")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "inspect":
+        for table, data in open_snapshot(args.snapshot_dir, verify=True).items():
+            print(f"{table:<20} {data.num_rows:>8} rows  {', '.join(data.column_names)}")
+        return
+
+    if getattr(args, "database", None):
+        os.environ["DB_NAME"] = args.database
+    from db.db_utils import connect_db
+
+    conn = connect_db()
+    if conn is None:
+        raise SystemExit(1)
+    try:
+        if args.command == "export":
+            # databases restored from the old dump get the current columns first
+            cursor = conn.cursor()
+            ensure_schema(cursor)
+            conn.commit()
+            cursor.close()
+            manifest = export_snapshot(conn, args.out_dir, args.format)
+            total = sum(entry["bytes"] for entry in manifest["tables"].values())
+            print(f"Exported {len(manifest['tables'])} tables ({total / 2**20:.2f} MiB) to {args.out_dir} "
+                  f"in {time.perf_counter() - start:.1f}s")
+        else:
+            counts = restore_snapshot(conn, args.snapshot_dir)
+            print(f"Restored {sum(counts.values())} rows into {len(counts)} tables "
+                  f"in {time.perf_counter() - start:.1f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -110,12 +110,26 @@
 
 import pymysql
 from dotenv import load_dotenv
+import hashlib
 import os
 import time
 
+from db.lookups import LOOKUPS, LookupCache, child_values_sql
+from utils.normalize import normalize_name
+
 load_dotenv()
 
+# "mysql", or "sqlite" for the embedded single-file database (see db.sqlite_db)
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql")
+
+
 def connect_db(max_retries=3, retry_delay=5):
+    if DB_BACKEND == "sqlite":
+        from db.sqlite_db import SQLITE_PATH, connect
+
+        conn = connect(SQLITE_PATH)
+        print(f"Opened SQLite database {SQLITE_PATH}")
+        return conn
     for attempt in range(max_retries):
         try:
             conn = pymysql.connect(
@@ -137,76 +151,395 @@ def connect_db(max_retries=3, retry_delay=5):
     print("Failed to connect to database after retries")
     return None
 
+# Normalized names are stored up to this length; the hash covers the whole name
+NAME_NORM_LENGTH = 255
+
+
+def name_columns(name):
+    """
+    (normalized name, hash) stored next to an entity name or alias: the
+    utils.normalize.normalize_name form (casefolded, diacritics stripped,
+    punctuation collapsed, tokens sorted) and its SHA-1, both indexed.
+    """
+    norm = normalize_name(name)
+    if not norm:
+        return None, None
+    return norm[:NAME_NORM_LENGTH], hashlib.sha1(norm.encode('utf-8')).hexdigest()
+
+
 def insert_entity(cursor, record):
-    if not record.get('Name'):
+    if not record.name:
         print(f"Skipping record with missing Name: {record}")
         return None
+    name_norm, name_hash = name_columns(record.name)
     cursor.execute("""
         SELECT entity_id FROM sanctioned_entities
-        WHERE name = %s AND designation = %s AND source = %s
+        WHERE name_hash <=> %s AND name = %s AND designation = %s AND source = %s
     """, (
-        record['Name'],
-        record.get('Designation'),
-        record.get('Source')
+        name_hash,
+        record.name,
+        record.designation,
+        record.source
     ))
     existing = cursor.fetchone()
     if existing:
         return existing['entity_id']
     query = """
-        INSERT INTO sanctioned_entities (name, designation, source)
-        VALUES (%s, %s, %s)
+        INSERT INTO sanctioned_entities (name, designation, source, name_norm, name_hash)
+        VALUES (%s, %s, %s, %s, %s)
     """
     cursor.execute(query, (
-        record['Name'],
-        record.get('Designation'),
-        record.get('Source')
+        record.name,
+        record.designation,
+        record.source,
+        name_norm,
+        name_hash
     ))
     return cursor.lastrowid
 
 def insert_aliases(cursor, entity_id, aliases):
-    if not aliases or aliases.strip() == '':
-        return
-    for alias in aliases.split(', '):
-        alias = alias.strip()
-        if not alias:
-            continue
+    for alias in _split_values(aliases, ', '):
+        alias_norm, alias_hash = name_columns(alias)
         cursor.execute(
-            "SELECT COUNT(*) as count FROM aliases WHERE entity_id = %s AND alias_name = %s",
-            (entity_id, alias)
+            "SELECT COUNT(*) as count FROM aliases "
+            "WHERE entity_id = %s AND alias_hash <=> %s AND alias_name = %s",
+            (entity_id, alias_hash, alias)
         )
         if cursor.fetchone()['count'] == 0:
             cursor.execute(
-                "INSERT INTO aliases (entity_id, alias_name) VALUES (%s, %s)",
-                (entity_id, alias)
+                "INSERT INTO aliases (entity_id, alias_name, alias_norm, alias_hash) VALUES (%s, %s, %s, %s)",
+                (entity_id, alias, alias_norm, alias_hash)
             )
 
-def insert_nationalities(cursor, entity_id, nationality_str):
-    if not nationality_str or nationality_str.strip() == '':
+def insert_nationalities(cursor, entity_id, nationality_str, lookups=None):
+    nats = _split_values(nationality_str, ',')
+    if not nats:
         return
-    for nat in [n.strip() for n in nationality_str.split(',') if n.strip()]:
+    lookups = lookups or LookupCache()
+    ids = lookups.resolve(cursor, 'nationalities', nats)
+    for nat in nats:
         cursor.execute(
-            "SELECT COUNT(*) as count FROM nationalities WHERE entity_id = %s AND nationality = %s",
-            (entity_id, nat)
+            "SELECT COUNT(*) as count FROM nationalities WHERE entity_id = %s AND nationality_id = %s",
+            (entity_id, ids[nat])
         )
         if cursor.fetchone()['count'] == 0:
             cursor.execute(
-                "INSERT INTO nationalities (entity_id, nationality) VALUES (%s, %s)",
-                (entity_id, nat)
+                "INSERT INTO nationalities (entity_id, nationality_id) VALUES (%s, %s)",
+                (entity_id, ids[nat])
             )
 
-def insert_sanction_types(cursor, entity_id, sanction_str):
-    if not sanction_str or sanction_str.strip() == '':
+def insert_sanction_types(cursor, entity_id, sanction_str, lookups=None):
+    stypes = _split_values(sanction_str, ',')
+    if not stypes:
         return
-    for stype in [s.strip() for s in sanction_str.split(',') if s.strip()]:
+    lookups = lookups or LookupCache()
+    ids = lookups.resolve(cursor, 'sanction_types', stypes)
+    for stype in stypes:
         cursor.execute(
-            "SELECT COUNT(*) as count FROM sanction_types WHERE entity_id = %s AND sanction_type = %s",
-            (entity_id, stype)
+            "SELECT COUNT(*) as count FROM sanction_types WHERE entity_id = %s AND sanction_type_id = %s",
+            (entity_id, ids[stype])
         )
         if cursor.fetchone()['count'] == 0:
             cursor.execute(
-                "INSERT INTO sanction_types (entity_id, sanction_type) VALUES (%s, %s)",
-                (entity_id, stype)
+                "INSERT INTO sanction_types (entity_id, sanction_type_id) VALUES (%s, %s)",
+                (entity_id, ids[stype])
+            )
+
+# ---------------------------------------------------------------------------
+# Bulk-load path: one SELECT and one multi-row INSERT per table per batch
+# instead of a SELECT-then-INSERT per row.
+# ---------------------------------------------------------------------------
+
+DEFAULT_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", 1000))
+
+
+def chunked(iterable, size):
+    """Yield lists of up to `size` items from any iterable (including generators)."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _split_values(value, sep):
+    """Values of a multi-valued field given as a tuple, or as a `sep`-joined string."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(sep)
+    return [v.strip() for v in value if v and v.strip()]
+
+
+def _placeholders(n):
+    return ', '.join(['%s'] * n)
+
+
+# child table -> value column (nationalities and sanction types store a
+# dictionary key into nationality_codes / sanction_programs, see db.lookups)
+CHILD_COLUMNS = {
+    'aliases': 'alias_name',
+    'nationalities': 'nationality_id',
+    'sanction_types': 'sanction_type_id',
+}
+
+# Logical -> physical table names. A shadow load (db.shadow) runs the same
+# statements against staging copies by passing its own mapping as `tables`.
+LIVE_TABLES = {table: table for table in ('sanctioned_entities',) + tuple(CHILD_COLUMNS)}
+
+
+def record_children(record):
+    """A SanctionRecord's multi-valued fields as {child table: [values]}."""
+    return {
+        'aliases': _split_values(record.aliases, ', '),
+        'nationalities': _split_values(record.nationalities, ','),
+        'sanction_types': _split_values(record.sanction_types, ','),
+    }
+
+
+def delete_children(cursor, entity_ids, tables=LIVE_TABLES, stats=None):
+    """Remove every alias, nationality and sanction type row of the given entities."""
+    if not entity_ids:
+        return
+    if stats is not None:
+        stats.remove_children(cursor, entity_ids)
+    for table in CHILD_COLUMNS:
+        cursor.execute(
+            f"DELETE FROM {tables[table]} WHERE entity_id IN ({_placeholders(len(entity_ids))})",
+            list(entity_ids)
+        )
+
+
+def delete_entities(cursor, entity_ids, tables=LIVE_TABLES, stats=None):
+    """Remove entities together with their child rows."""
+    if not entity_ids:
+        return
+    delete_children(cursor, entity_ids, tables, stats)
+    if stats is not None:
+        stats.remove_entities(entity_ids)
+    cursor.execute(
+        f"DELETE FROM {tables['sanctioned_entities']} WHERE entity_id IN ({_placeholders(len(entity_ids))})",
+        list(entity_ids)
+    )
+
+
+def _resolve_entity_ids(cursor, keys, tables=LIVE_TABLES):
+    """
+    Map (name, designation, source) keys to entity_id with one SELECT per
+    source, seeking on the indexed name hash.
+    """
+    by_source = {}
+    for name, designation, source in keys:
+        by_source.setdefault(source, set()).add(name)
+
+    entity_table = tables['sanctioned_entities']
+    found = {}
+    for source, names in by_source.items():
+        hashes = set()
+        unhashed = []
+        for name in names:
+            name_hash = name_columns(name)[1]
+            if name_hash is None:
+                # nothing left after normalizing (e.g. only punctuation)
+                unhashed.append(name)
+            else:
+                hashes.add(name_hash)
+        conditions = []
+        args = [] if source is None else [source]
+        if hashes:
+            conditions.append(f"name_hash IN ({_placeholders(len(hashes))})")
+            args.extend(hashes)
+        if unhashed:
+            conditions.append(f"(name_hash IS NULL AND name IN ({_placeholders(len(unhashed))}))")
+            args.extend(unhashed)
+        source_condition = "source IS NULL" if source is None else "source = %s"
+        cursor.execute(f"""
+            SELECT entity_id, name, designation, source FROM {entity_table}
+            WHERE {source_condition} AND ({' OR '.join(conditions)})
+        """, args)
+        for row in cursor.fetchall():
+            key = (row['name'], row['designation'], row['source'])
+            # keep the newest row when the table already holds duplicates
+            if key in keys and row['entity_id'] > found.get(key, 0):
+                found[key] = row['entity_id']
+    return found
+
+
+def _insert_children(cursor, table, pairs, index=None, lookups=None, tables=LIVE_TABLES, stats=None, sources=None):
+    """
+    Insert (entity_id, value) pairs that are not already present in `table`.
+    With `stats` (a db.aggregates.ListStats), the inserted rows are counted
+    against their entity's source, looked up in `sources`.
+    """
+    if not pairs:
+        return 0
+    if index is not None:
+        new_rows = []
+        for eid, value in pairs:
+            if not index.has_child(table, eid, value):
+                index.add_child(table, eid, value)
+                new_rows.append((eid, value))
+    else:
+        entity_ids = list({eid for eid, _ in pairs})
+        cursor.execute(f"""
+            {child_values_sql(table, tables[table])}
+            WHERE t.entity_id IN ({_placeholders(len(entity_ids))})
+        """, entity_ids)
+        existing = {(row['entity_id'], row['value']) for row in cursor.fetchall()}
+        new_rows = [pair for pair in pairs if pair not in existing]
+    if new_rows:
+        if table in LOOKUPS:
+            # dictionary-encode the strings; each distinct one is resolved once per run
+            keys = lookups.resolve(cursor, table, [value for _, value in new_rows])
+            new_rows = [(eid, keys[value]) for eid, value in new_rows]
+        if table == 'aliases':
+            cursor.executemany(
+                f"INSERT INTO {tables[table]} (entity_id, alias_name, alias_norm, alias_hash) "
+                f"VALUES (%s, %s, %s, %s)",
+                [(eid, value) + name_columns(value) for eid, value in new_rows]
             )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {tables[table]} (entity_id, {CHILD_COLUMNS[table]}) VALUES (%s, %s)",
+                new_rows
+            )
+        if stats is not None:
+            stats.add_children(table, new_rows, sources)
+    return len(new_rows)
+
+
+def load_batch(cursor, records, index=None, lookups=None, tables=LIVE_TABLES, stats=None):
+    """
+    Writes one chunk of SanctionRecords to sanctioned_entities, aliases, nationalities
+    and sanction_types. Entity IDs are resolved for the whole chunk at once and
+    every table gets a single multi-row INSERT (pymysql folds executemany into
+    INSERT ... VALUES (...),(...)).
+    When a DedupIndex is given, existence checks are answered from memory and
+    only newly inserted entities cost a lookup round trip. Nationality and
+    sanction type strings are encoded through `lookups` (a LookupCache).
+    `tables` maps table names to the physical tables written (see LIVE_TABLES).
+    Inserted rows are reported to `stats` (see db.aggregates) when given.
+    Returns the entity_id of each record (None for skipped records).
+    """
+    if lookups is None:
+        lookups = LookupCache()
+    keys = []
+    for record in records:
+        if not record.name:
+            print(f"Skipping record with missing Name: {record}")
+            keys.append(None)
+            continue
+        keys.append((record.name, record.designation, record.source))
+
+    wanted = {key for key in keys if key is not None}
+    if index is not None:
+        ids = {}
+        for key in wanted:
+            eid = index.get_entity(*key)
+            if eid is not None:
+                ids[key] = eid
+    else:
+        ids = _resolve_entity_ids(cursor, wanted, tables) if wanted else {}
+
+    missing = []
+    seen = set()
+    for key in keys:
+        if key is None or key in ids:
+            continue
+        # two spellings that normalize to the same key become one entity
+        dedup_key = index.entity_key(*key) if index is not None else key
+        if dedup_key not in seen:
+            seen.add(dedup_key)
+            missing.append(key)
+    if missing:
+        cursor.executemany(f"""
+            INSERT INTO {tables['sanctioned_entities']} (name, designation, source, name_norm, name_hash)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [key + name_columns(key[0]) for key in missing])
+        inserted = _resolve_entity_ids(cursor, set(missing), tables)
+        ids.update(inserted)
+        if stats is not None:
+            stats.add_entities([(inserted[key], key[2]) for key in missing if key in inserted])
+        if index is not None:
+            for key, eid in inserted.items():
+                index.add_entity(*key, eid)
+            for key in wanted:
+                if key not in ids:
+                    ids[key] = index.get_entity(*key)
+
+    pairs = {table: {} for table in CHILD_COLUMNS}
+    entity_ids = []
+    sources = {}
+    for record, key in zip(records, keys):
+        eid = ids.get(key) if key is not None else None
+        entity_ids.append(eid)
+        if eid is None:
+            continue
+        sources[eid] = key[2]
+        for table, values in record_children(record).items():
+            for value in values:
+                pairs[table][(eid, value)] = None
+
+    for table in CHILD_COLUMNS:
+        _insert_children(cursor, table, list(pairs[table]), index, lookups, tables, stats, sources)
+    return entity_ids
+
+
+def load_records(cursor, records, batch_size=DEFAULT_BATCH_SIZE, index=None, lookups=None, tables=LIVE_TABLES,
+                 stats=None):
+    """Stream `records` into the database `batch_size` records at a time. Returns the record count."""
+    count = 0
+    for chunk in chunked(records, batch_size):
+        load_batch(cursor, chunk, index, lookups, tables, stats)
+        count += len(chunk)
+    return count
+
+
+_NAME_MATCH_QUERY = """
+    SELECT e.entity_id, e.name, e.designation, e.source, e.name AS matched_name, 'name' AS kind
+    FROM sanctioned_entities e WHERE e.{norm_condition}
+    UNION ALL
+    SELECT e.entity_id, e.name, e.designation, e.source, a.alias_name, 'alias'
+    FROM aliases a JOIN sanctioned_entities e ON e.entity_id = a.entity_id WHERE a.{alias_condition}
+    LIMIT %s
+"""
+
+
+def find_by_name(cursor, name, limit=100):
+    """
+    Entities whose name or an alias normalizes to the same form as `name`
+    (so case, accents, punctuation and word order do not matter), as dict
+    rows with the matched name and whether it was the 'name' or an 'alias'.
+    """
+    name_hash = name_columns(name)[1]
+    if name_hash is None:
+        return []
+    cursor.execute(_NAME_MATCH_QUERY.format(norm_condition="name_hash = %s", alias_condition="alias_hash = %s"),
+                   (name_hash, name_hash, limit))
+    return cursor.fetchall()
+
+
+def find_by_prefix(cursor, prefix, limit=100):
+    """
+    Entities whose normalized name or alias starts with the normalized
+    `prefix`. Stored names are token-sorted, so the prefix is matched against
+    that form (e.g. "ali moh" finds "Mohammad Ali").
+    """
+    prefix = normalize_name(prefix)
+    if not prefix:
+        return []
+    # normalize_name keeps only letters, digits and combining marks (any
+    # script) separated by single spaces; '%', '_' and '\' are punctuation
+    # (even their full-width forms fold to it under NFKD), so none of the
+    # LIKE metacharacters can reach the pattern
+    pattern = prefix + '%'
+    cursor.execute(_NAME_MATCH_QUERY.format(norm_condition="name_norm LIKE %s", alias_condition="alias_norm LIKE %s"),
+                   (pattern, pattern, limit))
+    return cursor.fetchall()
+
 
 if __name__ == "__main__":
     conn = connect_db()
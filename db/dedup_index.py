@@ -0,0 +1,104 @@
+import pymysql
+
+from utils.normalize import normalize_key
+
+CHILD_TABLES = ('aliases', 'nationalities', 'sanction_types')
+
+# One streaming pass over all four tables; rows are tagged with their table.
+_PRELOAD_QUERY = """
+    SELECT 'sanctioned_entities', entity_id, name, designation, source FROM sanctioned_entities
+    UNION ALL SELECT 'aliases', entity_id, alias_name, NULL, NULL FROM aliases
+    UNION ALL SELECT 'nationalities', n.entity_id, c.nationality, NULL, NULL
+        FROM nationalities n JOIN nationality_codes c ON c.nationality_id = n.nationality_id
+    UNION ALL SELECT 'sanction_types', s.entity_id, p.sanction_type, NULL, NULL
+        FROM sanction_types s JOIN sanction_programs p ON p.sanction_type_id = s.sanction_type_id
+"""
+
+
+class DedupIndex:
+    """
+    In-process replacement for the per-row existence SELECTs.
+
+    Entities are keyed on the normalized (name, designation, source) tuple and
+    child rows on (entity_id, normalized value), so every existence check is a
+    hash lookup with no round trip. Changes made since the last commit are
+    journalled so a rolled-back source does not leave phantom keys behind.
+    """
+
+    def __init__(self):
+        self.entities = {}
+        # table -> entity_id -> set of normalized values
+        self.children = {table: {} for table in CHILD_TABLES}
+        self._journal = []
+
+    @classmethod
+    def preload(cls, conn):
+        """Build the index from the database with a single unbuffered query."""
+        index = cls()
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(_PRELOAD_QUERY)
+            for table, entity_id, value, designation, source in cursor:
+                if table == 'sanctioned_entities':
+                    key = index.entity_key(value, designation, source)
+                    # keep the newest row when the table already holds duplicates
+                    if entity_id > index.entities.get(key, 0):
+                        index.entities[key] = entity_id
+                else:
+                    index.children[table].setdefault(entity_id, set()).add(normalize_key(value))
+        finally:
+            cursor.close()
+        return index
+
+    @staticmethod
+    def entity_key(name, designation, source):
+        return (normalize_key(name), normalize_key(designation), normalize_key(source))
+
+    def get_entity(self, name, designation, source):
+        return self.entities.get(self.entity_key(name, designation, source))
+
+    def add_entity(self, name, designation, source, entity_id):
+        key = self.entity_key(name, designation, source)
+        self.entities[key] = entity_id
+        self._journal.append(('add_entity', key, entity_id))
+
+    def remove_entity(self, name, designation, source):
+        key = self.entity_key(name, designation, source)
+        entity_id = self.entities.pop(key, None)
+        if entity_id is not None:
+            self._journal.append(('remove_entity', key, entity_id))
+            self.drop_children(entity_id)
+        return entity_id
+
+    def has_child(self, table, entity_id, value):
+        values = self.children[table].get(entity_id)
+        return values is not None and normalize_key(value) in values
+
+    def add_child(self, table, entity_id, value):
+        norm = normalize_key(value)
+        self.children[table].setdefault(entity_id, set()).add(norm)
+        self._journal.append(('add_child', table, (entity_id, norm)))
+
+    def drop_children(self, entity_id):
+        """Forget every child row of `entity_id` (its rows are being rewritten or deleted)."""
+        dropped = {table: self.children[table].pop(entity_id, None) for table in CHILD_TABLES}
+        self._journal.append(('drop_children', entity_id, dropped))
+
+    def commit(self):
+        self._journal = []
+
+    def rollback(self):
+        """Undo everything changed since the last commit."""
+        for action, target, value in reversed(self._journal):
+            if action == 'add_entity':
+                self.entities.pop(target, None)
+            elif action == 'remove_entity':
+                self.entities[target] = value
+            elif action == 'add_child':
+                entity_id, norm = value
+                self.children[target].get(entity_id, set()).discard(norm)
+            else:
+                for table, values in value.items():
+                    if values is not None:
+                        self.children[table][target] = values
+        self._journal = []
@@ -0,0 +1,192 @@
+import hashlib
+from datetime import datetime
+
+from db.db_utils import (
+    _placeholders, chunked, delete_children, delete_entities, load_batch, record_children,
+)
+from db.dedup_index import CHILD_TABLES
+from utils.normalize import normalize_key
+
+
+def _sha1(parts):
+    return hashlib.sha1('\x1f'.join(p or '' for p in parts).encode('utf-8')).hexdigest()
+
+
+def record_key(record):
+    """
+    Stable identity of a record within its source: the normalized dedup key.
+    Take it before a predicted designation is filled in, so a retrained model
+    does not turn the record into a new one.
+    """
+    return _sha1([
+        normalize_key(record.name),
+        normalize_key(record.designation),
+        normalize_key(record.source),
+    ])
+
+
+def record_fingerprint(record):
+    """Hash of everything that ends up in the database for a record."""
+    parts = [normalize_key(record.name), normalize_key(record.designation)]
+    for table, values in sorted(record_children(record).items()):
+        parts.append(table)
+        parts.extend(sorted({normalize_key(v) for v in values}))
+    return _sha1(parts)
+
+
+def stored_fingerprint(index, entity_id, name, designation):
+    """`record_fingerprint` of an entity as the dedup index holds it (for rows loaded without a snapshot)."""
+    parts = [normalize_key(name), normalize_key(designation)]
+    for table in sorted(CHILD_TABLES):
+        parts.append(table)
+        parts.extend(sorted(index.children[table].get(entity_id, ())))
+    return _sha1(parts)
+
+
+def write_snapshots(cursor, rows, table='source_snapshots'):
+    """Upsert (source, record_key, fingerprint, entity_id, name, designation, loaded_at) rows."""
+    cursor.executemany(f"""
+        INSERT INTO {table}
+            (source, record_key, fingerprint, entity_id, name, designation, loaded_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE fingerprint = VALUES(fingerprint),
+            entity_id = VALUES(entity_id), loaded_at = VALUES(loaded_at)
+    """, rows)
+
+
+class DeltaLoader:
+    """
+    Applies one source's feed as a change set against the snapshot recorded by
+    the previous load: new records are inserted, records whose fingerprint
+    changed get their child rows rewritten in place (keeping their entity_id),
+    unchanged records are not touched, and records missing from the feed are
+    deleted once `finish()` is called. Every change is written to entity_changes.
+
+    A record with no snapshot whose entity a full load already wrote is
+    compared with the stored rows: the first incremental run only records a
+    baseline for the entities it finds unchanged.
+    """
+
+    def __init__(self, cursor, source, index, lookups, list_stats=None):
+        self.cursor = cursor
+        self.source = source
+        self.index = index
+        self.lookups = lookups
+        # db.aggregates.ListStats told about every row inserted or deleted
+        self.list_stats = list_stats
+        self.run_at = datetime.now()
+        self.seen = set()
+        self.stats = {'added': 0, 'modified': 0, 'removed': 0, 'unchanged': 0}
+
+        self.snapshot = {}
+        cursor.execute("""
+            SELECT record_key, fingerprint, entity_id, name, designation
+            FROM source_snapshots WHERE source = %s
+        """, (source,))
+        for row in cursor.fetchall():
+            self.snapshot[row['record_key']] = (
+                row['fingerprint'], row['entity_id'], row['name'], row['designation']
+            )
+
+    def apply(self, records, keys=None):
+        """
+        Apply one chunk of the feed. `keys` are the records' `record_key`s when
+        the caller computed them before predicting missing designations.
+        """
+        to_load = []
+        rewrite_ids = []
+        relabel = []
+        snapshot_rows = []
+        for i, record in enumerate(records):
+            if not record.name:
+                to_load.append((record, None))
+                continue
+            key = keys[i] if keys is not None else record_key(record)
+            if key in self.seen:
+                # same entity listed twice in the feed; its children are merged in
+                to_load.append((record, None))
+                continue
+            self.seen.add(key)
+
+            fingerprint = record_fingerprint(record)
+            old = self.snapshot.get(key)
+            if old is None:
+                existing = self.index.get_entity(record.name, record.designation, record.source)
+                if existing is None:
+                    change = 'added'
+                elif stored_fingerprint(self.index, existing, record.name, record.designation) == fingerprint:
+                    # loaded by a full run with the same content: only record the baseline
+                    snapshot_rows.append(self._snapshot(key, fingerprint, existing, record))
+                    self.stats['unchanged'] += 1
+                    continue
+                else:
+                    # loaded by a full run with other content: rebuild its children from the feed
+                    change = 'modified'
+                    rewrite_ids.append(existing)
+            elif old[0] == fingerprint:
+                self.stats['unchanged'] += 1
+                continue
+            else:
+                change = 'modified'
+                rewrite_ids.append(old[1])
+                if normalize_key(old[3]) != normalize_key(record.designation):
+                    relabel.append((old, record))
+            to_load.append((record, (key, fingerprint, change)))
+
+        if rewrite_ids:
+            delete_children(self.cursor, rewrite_ids, stats=self.list_stats)
+            for eid in rewrite_ids:
+                self.index.drop_children(eid)
+        for (_, eid, name, designation), record in relabel:
+            # a designation predicted differently this time: same entity, new label
+            self.cursor.execute("UPDATE sanctioned_entities SET designation = %s WHERE entity_id = %s",
+                                (record.designation, eid))
+            self.index.remove_entity(name, designation, self.source)
+            self.index.add_entity(record.name, record.designation, self.source, eid)
+
+        batch = [record for record, _ in to_load]
+        entity_ids = (load_batch(self.cursor, batch, self.index, self.lookups, stats=self.list_stats)
+                      if batch else [])
+
+        changes = []
+        for (record, meta), eid in zip(to_load, entity_ids):
+            if meta is None or eid is None:
+                continue
+            key, fingerprint, change = meta
+            snapshot_rows.append(self._snapshot(key, fingerprint, eid, record))
+            changes.append((self.source, eid, record.name, change, self.run_at))
+            self.stats[change] += 1
+
+        if snapshot_rows:
+            write_snapshots(self.cursor, snapshot_rows)
+        if changes:
+            self._log(changes)
+
+    def _snapshot(self, key, fingerprint, entity_id, record):
+        name, designation = record.name, record.designation
+        self.snapshot[key] = (fingerprint, entity_id, name, designation)
+        return (self.source, key, fingerprint, entity_id, name, designation, self.run_at)
+
+    def finish(self, batch_size=1000):
+        """Delete every snapshot record that did not appear in this feed."""
+        removed = [(key, value) for key, value in self.snapshot.items() if key not in self.seen]
+        for chunk in chunked(removed, batch_size):
+            entity_ids = [eid for _, (_, eid, _, _) in chunk]
+            delete_entities(self.cursor, entity_ids, stats=self.list_stats)
+            for _, (_, eid, name, designation) in chunk:
+                self.index.remove_entity(name, designation, self.source)
+            keys = [key for key, _ in chunk]
+            self.cursor.execute(f"""
+                DELETE FROM source_snapshots
+                WHERE source = %s AND record_key IN ({_placeholders(len(keys))})
+            """, [self.source] + keys)
+            self._log([(self.source, eid, name, 'removed', self.run_at)
+                       for _, (_, eid, name, _) in chunk])
+            self.stats['removed'] += len(chunk)
+        return self.stats
+
+    def _log(self, changes):
+        self.cursor.executemany("""
+            INSERT INTO entity_changes (source, entity_id, name, change_type, changed_at)
+            VALUES (%s, %s, %s, %s, %s)
+        """, changes)
@@ -0,0 +1,73 @@
+# child table -> (reference table, key column, value column)
+LOOKUPS = {
+    'nationalities': ('nationality_codes', 'nationality_id', 'nationality'),
+    'sanction_types': ('sanction_programs', 'sanction_type_id', 'sanction_type'),
+}
+
+
+def child_values_sql(table, physical=None):
+    """
+    SELECT returning (entity_id, value) for a child table, decoding dictionary
+    keys. `physical` names the table actually read (e.g. its staging copy).
+    """
+    physical = physical or table
+    if table not in LOOKUPS:
+        return f"SELECT t.entity_id, t.alias_name AS value FROM {physical} t"
+    ref_table, key_column, value_column = LOOKUPS[table]
+    return (f"SELECT t.entity_id, r.{value_column} AS value FROM {physical} t "
+            f"JOIN {ref_table} r ON r.{key_column} = t.{key_column}")
+
+
+class LookupCache:
+    """
+    In-process cache of the nationality and sanction type dictionaries.
+
+    The reference tables hold a few hundred distinct strings, so they are read
+    whole once per run; strings seen for the first time are inserted in bulk
+    and resolved with one SELECT. Entries added since the last commit are
+    journalled so a rolled-back source does not leave dangling keys.
+    """
+
+    def __init__(self):
+        self.ids = {table: {} for table in LOOKUPS}
+        self._journal = []
+
+    @classmethod
+    def preload(cls, conn):
+        cache = cls()
+        cursor = conn.cursor()
+        try:
+            for table, (ref_table, key_column, value_column) in LOOKUPS.items():
+                cursor.execute(f"SELECT {key_column}, {value_column} FROM {ref_table}")
+                for row in cursor.fetchall():
+                    cache.ids[table][row[value_column]] = row[key_column]
+        finally:
+            cursor.close()
+        return cache
+
+    def resolve(self, cursor, table, values):
+        """Return {value: key} for `values` of child `table`, creating missing dictionary entries."""
+        cache = self.ids[table]
+        missing = [v for v in dict.fromkeys(values) if v not in cache]
+        if missing:
+            ref_table, key_column, value_column = LOOKUPS[table]
+            cursor.executemany(
+                f"INSERT IGNORE INTO {ref_table} ({value_column}) VALUES (%s)",
+                [(value,) for value in missing]
+            )
+            cursor.execute(f"""
+                SELECT {key_column}, {value_column} FROM {ref_table}
+                WHERE {value_column} IN ({', '.join(['%s'] * len(missing))})
+            """, missing)
+            for row in cursor.fetchall():
+                cache[row[value_column]] = row[key_column]
+                self._journal.append((table, row[value_column]))
+        return cache
+
+    def commit(self):
+        self._journal = []
+
+    def rollback(self):
+        for table, value in self._journal:
+            self.ids[table].pop(value, None)
+        self._journal = []
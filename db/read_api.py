@@ -0,0 +1,286 @@
+"""
+Read-only access to the loaded list for screening and other consumers, so
+they do not open their own connections and repeat the readme's joins.
+
+    from db.read_api import SanctionsReader
+    reader = SanctionsReader()
+    reader.search("Mohammad Taher Anwari")   # entities whose name or alias matches
+    reader.entity(1234)                      # entity with its aliases, nationalities, sanction types
+    reader.listings(1234)                    # the same entity on every list (see db.resolution)
+    reader.stats()                           # per-source, nationality and program counts (see db.aggregates)
+
+Queries run on a small pool of connections, and results are kept in an LRU
+cache with a TTL. Every ETL run that commits bumps `list_version`; a reader
+notices within VERSION_CHECK_SECONDS and drops everything it cached.
+"""
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from queue import Empty, LifoQueue
+
+from db.aggregates import read_stats
+from db.db_utils import connect_db, find_by_name, find_by_prefix
+from db.resolution import cluster_members
+
+POOL_SIZE = int(os.getenv("READ_POOL_SIZE", 4))
+CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", 10000))
+CACHE_TTL = float(os.getenv("READ_CACHE_TTL", 300))
+# how stale the reader's idea of the list version may get
+VERSION_CHECK_SECONDS = 5.0
+
+_DETAILS_QUERY = """
+    SELECT 'aliases' AS kind, entity_id, alias_name AS value FROM aliases WHERE entity_id IN ({ids})
+    UNION ALL
+    SELECT 'nationalities', n.entity_id, c.nationality FROM nationalities n
+        JOIN nationality_codes c ON c.nationality_id = n.nationality_id WHERE n.entity_id IN ({ids})
+    UNION ALL
+    SELECT 'sanction_types', s.entity_id, p.sanction_type FROM sanction_types s
+        JOIN sanction_programs p ON p.sanction_type_id = s.sanction_type_id WHERE s.entity_id IN ({ids})
+"""
+
+
+def bump_version(cursor):
+    """Mark the list as changed; called by the ETL in the transaction that finishes a run."""
+    cursor.execute("""
+        INSERT INTO list_version (id, version, updated_at) VALUES (1, 1, %s)
+        ON DUPLICATE KEY UPDATE version = version + 1, updated_at = VALUES(updated_at)
+    """, (datetime.now(),))
+
+
+def read_version(cursor):
+    cursor.execute("SELECT version FROM list_version WHERE id = 1")
+    row = cursor.fetchone()
+    return row['version'] if row else 0
+
+
+class ConnectionPool:
+    """Fixed-size pool of database connections, opened lazily."""
+
+    def __init__(self, size=POOL_SIZE, connect=connect_db):
+        self.connect = connect
+        self._idle = LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        conn = self.connect()
+        if conn is None:
+            self._slots.release()
+            raise ConnectionError("could not connect to the sanctions database")
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        else:
+            # end the read transaction so the next query sees the latest load
+            conn.rollback()
+            self._idle.put(conn)
+        self._slots.release()
+
+    def run(self, fn, *args):
+        """Call fn(cursor, *args) on a pooled connection and return its result."""
+        conn = self.acquire()
+        broken = True
+        try:
+            cursor = conn.cursor()
+            try:
+                result = fn(cursor, *args)
+            finally:
+                cursor.close()
+            broken = False
+            return result
+        finally:
+            self.release(conn, broken)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after they were stored."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _entity_details(cursor, entity_ids):
+    """{entity_id: entity dict with aliases, nationalities and sanction_types lists}, two queries."""
+    if not entity_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(entity_ids))
+    cursor.execute(f"""
+        SELECT entity_id, name, designation, source FROM sanctioned_entities
+        WHERE entity_id IN ({placeholders})
+    """, list(entity_ids))
+    entities = {}
+    for row in cursor.fetchall():
+        row.update(aliases=[], nationalities=[], sanction_types=[])
+        entities[row['entity_id']] = row
+    if entities:
+        placeholders = ', '.join(['%s'] * len(entities))
+        cursor.execute(_DETAILS_QUERY.format(ids=placeholders), list(entities) * 3)
+        for row in cursor.fetchall():
+            entities[row['entity_id']][row['kind']].append(row['value'])
+    return entities
+
+
+class SanctionsReader:
+    """
+    Cached lookups against the loaded list. Safe to share between threads.
+    Returned dicts and lists are shared with the cache and must not be modified.
+    """
+
+    def __init__(self, pool=None, cache=None, version_check=VERSION_CHECK_SECONDS):
+        self.pool = pool or ConnectionPool()
+        self.cache = cache or TTLCache()
+        self.version_check = version_check
+        self.version = None
+        self._checked_at = float('-inf')
+        self._version_lock = threading.Lock()
+
+    def _refresh_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.version_check:
+            return
+        with self._version_lock:
+            if now - self._checked_at < self.version_check:
+                return
+            version = self.pool.run(read_version)
+            if version != self.version:
+                # a load committed since these results were cached
+                self.cache.clear()
+                self.version = version
+            self._checked_at = now
+
+    def _store(self, key, value, version):
+        """
+        Cache a result queried while the list was at `version`. A result that
+        raced a version change may come from either list, so it is not cached.
+        """
+        with self._version_lock:
+            if self.version == version:
+                self.cache.put(key, value)
+
+    def _cached(self, key, fn, *args):
+        self._refresh_version()
+        value = self.cache.get(key)
+        if value is None:
+            version = self.version
+            value = self.pool.run(fn, *args)
+            self._store(key, value, version)
+        return value
+
+    def entity(self, entity_id):
+        """The entity with all its aliases, nationalities and sanction types, or None."""
+        return self._cached(('entity', entity_id), _entity_details, [entity_id]).get(entity_id)
+
+    def entities(self, entity_ids):
+        """entity() for several ids; ids not cached yet are fetched together."""
+        self._refresh_version()
+        found, missing = {}, []
+        for entity_id in dict.fromkeys(entity_ids):
+            value = self.cache.get(('entity', entity_id))
+            if value is None:
+                missing.append(entity_id)
+            else:
+                found.update(value)
+        if missing:
+            version = self.version
+            fetched = self.pool.run(_entity_details, missing)
+            for entity_id in missing:
+                value = {entity_id: fetched[entity_id]} if entity_id in fetched else {}
+                self._store(('entity', entity_id), value, version)
+                found.update(value)
+        return found
+
+    def search(self, name, prefix=False, limit=100):
+        """
+        Entities whose name or an alias matches `name` exactly after
+        normalization (or starts with it, with `prefix`); see db_utils.find_by_name.
+        """
+        lookup = find_by_prefix if prefix else find_by_name
+        return self._cached(('search', name, prefix, limit), lookup, name, limit)
+
+    def listings(self, entity_id):
+        """Every listing clustered with `entity_id` across sources (see db.resolution)."""
+        return self._cached(('listings', entity_id), cluster_members, entity_id)
+
+    def stats(self):
+        """The list statistics maintained by the ETL (see db.aggregates.read_stats)."""
+        return self._cached(('stats',), read_stats)
+
+    def close(self):
+        self.pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up entities in the loaded sanctions list.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    entity_cmd = commands.add_parser("entity", help="show an entity with its aliases, nationalities and programs")
+    entity_cmd.add_argument("entity_id", type=int)
+    search_cmd = commands.add_parser("search", help="find entities by name or alias")
+    search_cmd.add_argument("name")
+    search_cmd.add_argument("--prefix", action="store_true", help="match names starting with NAME")
+    search_cmd.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    reader = SanctionsReader()
+    if args.command == "entity":
+        entity = reader.entity(args.entity_id)
+        if entity is None:
+            print(f"No entity {args.entity_id}")
+        else:
+            print(f"[{entity['entity_id']}] {entity['name']} ({entity['source']})")
+            print(f"  designation: {entity['designation']}")
+            for field in ("aliases", "nationalities", "sanction_types"):
+                print(f"  {field}: {', '.join(entity[field]) or '-'}")
+    else:
+        for row in reader.search(args.name, args.prefix, args.limit):
+            print(f"  [{row['entity_id']}] {row['name']} ({row['source']})  via {row['kind']} '{row['matched_name']}'")
+    reader.close()
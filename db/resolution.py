@@ -0,0 +1,309 @@
+"""
+Cross-source entity resolution. Entities that several lists carry (the same
+person on UN, OFAC and UK) keep their own entity_id per source; this stage
+groups them into clusters in `canonical_entity`, so one hit can be expanded
+to every list the entity appears on.
+
+Comparing every pair of entities is quadratic, so each entity is first
+given blocking keys (its normalized names, their Soundex signature, and each
+name token paired with each nationality) and only entities from different
+sources that share a key are compared. The comparisons run in a process pool,
+and matching pairs are merged into clusters with a union-find, best match
+first. A list does not carry the same entity twice, so a merge that would put
+two listings of one source into the same cluster is refused.
+
+    python -m db.resolution                  # rebuild canonical_entity
+    python -m db.resolution --show 1234      # every listing clustered with entity 1234
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import combinations
+
+import pymysql
+
+from db.db_utils import chunked
+from screening.index import PHONETIC_WEIGHT, name_similarity
+from utils.normalize import normalize_key, normalize_name, phonetic_keys
+
+# Names at least this similar (see screening.index.name_similarity) are the same entity
+MATCH_THRESHOLD = float(os.getenv("RESOLUTION_THRESHOLD", 0.92))
+# Blocks larger than this are too common a key to narrow anything down and are skipped
+MAX_BLOCK_SIZE = 500
+# Candidate pairs handed to a comparison worker at a time
+PAIRS_PER_TASK = 20000
+# Tokens this short (initials, "al", "bin") are not used as blocking keys
+MIN_TOKEN_LENGTH = 3
+# Placeholders the feeds and mappings fill in for a missing nationality; they
+# say nothing about the entity, so they neither block nor rule out a match
+NO_NATIONALITY = frozenset({'unknown'})
+
+# One streaming pass: every entity with its names, aliases and nationalities
+_LOAD_QUERY = """
+    SELECT 'entity', entity_id, name, source FROM sanctioned_entities
+    UNION ALL SELECT 'alias', entity_id, alias_name, NULL FROM aliases
+    UNION ALL SELECT 'nationality', n.entity_id, c.nationality, NULL
+        FROM nationalities n JOIN nationality_codes c ON c.nationality_id = n.nationality_id
+"""
+
+
+def load_entities(rows):
+    """
+    Build {entity_id: (source, names, nationalities)} from tagged
+    (kind, entity_id, value, source) rows; names are normalized, nationalities
+    case-folded, both as frozensets. Placeholder nationalities (NO_NATIONALITY)
+    are dropped, so a listing without one is treated as giving none.
+    """
+    sources, names, nationalities = {}, {}, {}
+    for kind, entity_id, value, source in rows:
+        if kind == 'entity':
+            sources[entity_id] = source
+            target = names
+            value = normalize_name(value)
+        elif kind == 'alias':
+            target = names
+            value = normalize_name(value)
+        else:
+            target = nationalities
+            value = normalize_key(value)
+            if value in NO_NATIONALITY:
+                continue
+        if value:
+            target.setdefault(entity_id, set()).add(value)
+    return {
+        entity_id: (source, frozenset(names.get(entity_id, ())), frozenset(nationalities.get(entity_id, ())))
+        for entity_id, source in sources.items()
+        if entity_id in names
+    }
+
+
+def iter_entity_rows(conn):
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(_LOAD_QUERY)
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def blocking_keys(names, nationalities):
+    keys = set()
+    for name in names:
+        keys.add(('name', name))
+        codes = phonetic_keys(name)
+        if codes:
+            keys.add(('phonetic', ' '.join(sorted(codes))))
+        for token in name.split():
+            if len(token) < MIN_TOKEN_LENGTH:
+                continue
+            for nationality in nationalities or ('',):
+                keys.add(('token', token, nationality))
+    return keys
+
+
+def candidate_pairs(entities, max_block_size=MAX_BLOCK_SIZE):
+    """Distinct (entity_id, entity_id) pairs from different sources that share a blocking key."""
+    blocks = {}
+    for entity_id, (_, names, nationalities) in entities.items():
+        for key in blocking_keys(names, nationalities):
+            blocks.setdefault(key, []).append(entity_id)
+
+    pairs = set()
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > max_block_size:
+            continue
+        for a, b in combinations(sorted(members), 2):
+            if entities[a][0] != entities[b][0]:
+                pairs.add((a, b))
+
+    # a listing without nationalities shares a token with listings of any nationality
+    by_token = {}
+    for key, members in blocks.items():
+        if key[0] == 'token' and key[2] and len(members) <= max_block_size:
+            by_token.setdefault(key[1], []).append(members)
+    for key, unplaced in blocks.items():
+        if key[0] != 'token' or key[2] or len(unplaced) > max_block_size:
+            continue
+        for members in by_token.get(key[1], ()):
+            for a in unplaced:
+                for b in members:
+                    if entities[a][0] != entities[b][0]:
+                        pairs.add((min(a, b), max(a, b)))
+    return pairs
+
+
+def entity_similarity(names_a, names_b, threshold=MATCH_THRESHOLD):
+    """Best similarity between any name of one entity and any name of the other."""
+    if not names_a.isdisjoint(names_b):
+        return 1.0
+    best = 0.0
+    for a in names_a:
+        for b in names_b:
+            # the sequence ratio is bounded by the lengths, and the phonetic
+            # lift closes at most PHONETIC_WEIGHT of the rest of the gap
+            bound = 2 * min(len(a), len(b)) / (len(a) + len(b))
+            if bound + (1 - bound) * PHONETIC_WEIGHT < threshold:
+                continue
+            best = max(best, name_similarity(a, b))
+    return best
+
+
+_worker_entities = None
+
+
+def _init_worker(entities):
+    global _worker_entities
+    _worker_entities = entities
+
+
+def _compare(pairs, threshold):
+    """Comparison task (runs in a worker process): the matching pairs with their score."""
+    matches = []
+    for a, b in pairs:
+        _, names_a, nationalities_a = _worker_entities[a]
+        _, names_b, nationalities_b = _worker_entities[b]
+        # listings that both give nationalities must share one
+        if nationalities_a and nationalities_b and nationalities_a.isdisjoint(nationalities_b):
+            continue
+        score = entity_similarity(names_a, names_b, threshold)
+        if score >= threshold:
+            matches.append((a, b, score))
+    return matches
+
+
+class DisjointSet:
+    """
+    Union-find over entity ids; the smallest id of a cluster is its root.
+    `groups` maps each id to its source; a union that would put two ids of
+    the same group in one cluster is refused.
+    """
+
+    def __init__(self, groups):
+        self.parent = {item: item for item in groups}
+        self.groups = {item: frozenset((group,)) for item, group in groups.items()}
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # path compression
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        """Merge the clusters of `a` and `b`; False when their groups overlap."""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return True
+        if not self.groups[root_a].isdisjoint(self.groups[root_b]):
+            return False
+        root, child = min(root_a, root_b), max(root_a, root_b)
+        self.parent[child] = root
+        self.groups[root] |= self.groups.pop(child)
+        return True
+
+
+def resolve(entities, threshold=MATCH_THRESHOLD, workers=None, metrics=None):
+    """
+    Cluster `entities` (see load_entities). Returns {entity_id: (cluster_id,
+    score)} where score is the best match that joined the entity to its
+    cluster, or None for entities that matched nothing.
+
+    Matches are merged best first, and one that would join two listings of
+    the same source is skipped. With `metrics` (utils.metrics.Metrics), the
+    pair counts are recorded under the "all" source.
+    """
+    pairs = sorted(candidate_pairs(entities))
+    matches = []
+    if pairs:
+        tasks = [pairs[i:i + PAIRS_PER_TASK] for i in range(0, len(pairs), PAIRS_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(entities,)) as pool:
+            for task_matches in pool.map(_compare, tasks, [threshold] * len(tasks)):
+                matches.extend(task_matches)
+
+    clusters = DisjointSet({entity_id: source for entity_id, (source, _, _) in entities.items()})
+    scores = {}
+    refused = 0
+    for a, b, score in sorted(matches, key=lambda match: (-match[2], match[0], match[1])):
+        if not clusters.union(a, b):
+            refused += 1
+            continue
+        scores[a] = max(scores.get(a, 0.0), score)
+        scores[b] = max(scores.get(b, 0.0), score)
+    if metrics is not None:
+        metrics.set("all", "resolution_pairs_compared", len(pairs))
+        metrics.set("all", "resolution_matches_refused", refused)
+    return {entity_id: (clusters.find(entity_id), scores.get(entity_id)) for entity_id in entities}
+
+
+def write_clusters(cursor, assignments, batch_size=5000):
+    """Replace the contents of canonical_entity with `assignments`; commit is left to the caller."""
+    now = datetime.now()
+    cursor.execute("DELETE FROM canonical_entity")
+    for batch in chunked(sorted(assignments.items()), batch_size):
+        cursor.executemany("""
+            INSERT INTO canonical_entity (entity_id, cluster_id, match_score, resolved_at)
+            VALUES (%s, %s, %s, %s)
+        """, [(entity_id, cluster_id, score, now) for entity_id, (cluster_id, score) in batch])
+
+
+def resolve_entities(conn, threshold=MATCH_THRESHOLD, workers=None, metrics=None):
+    """Rebuild canonical_entity from the loaded list. Returns (entities, multi-listing clusters)."""
+    entities = load_entities(iter_entity_rows(conn))
+    assignments = resolve(entities, threshold, workers, metrics)
+    cursor = conn.cursor()
+    try:
+        write_clusters(cursor, assignments)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    sizes = {}
+    for cluster_id, _ in assignments.values():
+        sizes[cluster_id] = sizes.get(cluster_id, 0) + 1
+    return len(assignments), sum(1 for size in sizes.values() if size > 1)
+
+
+def cluster_members(cursor, entity_id):
+    """Every listing in the same cluster as `entity_id` (itself included), as dict rows."""
+    cursor.execute("""
+        SELECT e.entity_id, e.name, e.source, e.designation, c.cluster_id, c.match_score
+        FROM canonical_entity me
+        JOIN canonical_entity c ON c.cluster_id = me.cluster_id
+        JOIN sanctioned_entities e ON e.entity_id = c.entity_id
+        WHERE me.entity_id = %s
+        ORDER BY e.source, e.entity_id
+    """, (entity_id,))
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    from db.db_utils import connect_db
+    from utils.metrics import Metrics
+
+    parser = argparse.ArgumentParser(description="Cluster the same entity across sanctions lists.")
+    parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD)
+    parser.add_argument("--workers", type=int, help="comparison processes (default: one per CPU)")
+    parser.add_argument("--show", type=int, metavar="ENTITY_ID",
+                        help="print the cluster of ENTITY_ID instead of rebuilding")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    if args.show is not None:
+        cursor = conn.cursor()
+        for row in cluster_members(cursor, args.show):
+            print(f"  [{row['entity_id']}] {row['name']}  ({row['source']})")
+        cursor.close()
+    else:
+        metrics = Metrics()
+        total, merged = resolve_entities(conn, args.threshold, args.workers, metrics)
+        stats = metrics.sources["all"]
+        print(f"  [DEBUG] Compared {stats['resolution_pairs_compared']} candidate pairs, "
+              f"refused {stats['resolution_matches_refused']} same-source merges")
+        print(f"Resolved {total} entities, {merged} clusters span more than one listing")
+    conn.close()
@@ -0,0 +1,310 @@
+"""
+DDL for the sanctions database. The four core tables mirror sanctions_dump.sql;
+the rest are bookkeeping tables used by the ETL. Every statement is idempotent,
+so `ensure_schema` can run at the start of each load.
+"""
+from db.aggregates import rebuild_stats
+from db.db_utils import chunked, name_columns
+from db.sqlite_db import SCHEMA as SQLITE_SCHEMA
+
+CORE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS sanctioned_entities (
+      entity_id int NOT NULL AUTO_INCREMENT,
+      name varchar(255) DEFAULT NULL,
+      designation text,
+      source varchar(255) DEFAULT NULL,
+      name_norm varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL,
+      name_hash char(40) CHARACTER SET ascii COLLATE ascii_bin DEFAULT NULL,
+      multi_nationality tinyint(1) NOT NULL DEFAULT 0,
+      PRIMARY KEY (entity_id),
+      KEY name_hash (name_hash),
+      KEY name_norm (name_norm),
+      KEY multi_nationality (multi_nationality)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS aliases (
+      alias_id int NOT NULL AUTO_INCREMENT,
+      entity_id int DEFAULT NULL,
+      alias_name text,
+      alias_norm varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL,
+      alias_hash char(40) CHARACTER SET ascii COLLATE ascii_bin DEFAULT NULL,
+      PRIMARY KEY (alias_id),
+      KEY entity_id (entity_id),
+      KEY alias_hash (alias_hash),
+      KEY alias_norm (alias_norm),
+      CONSTRAINT aliases_ibfk_1 FOREIGN KEY (entity_id) REFERENCES sanctioned_entities (entity_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+    # Nationality and sanction type strings are dictionary-encoded: each
+    # distinct value is stored once and the child tables hold its integer key.
+    # Values compare byte-for-byte so every distinct spelling gets its own key.
+    """
+    CREATE TABLE IF NOT EXISTS nationality_codes (
+      nationality_id int NOT NULL AUTO_INCREMENT,
+      nationality varchar(255) COLLATE utf8mb4_bin NOT NULL,
+      PRIMARY KEY (nationality_id),
+      UNIQUE KEY nationality (nationality)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sanction_programs (
+      sanction_type_id int NOT NULL AUTO_INCREMENT,
+      sanction_type varchar(255) COLLATE utf8mb4_bin NOT NULL,
+      PRIMARY KEY (sanction_type_id),
+      UNIQUE KEY sanction_type (sanction_type)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS nationalities (
+      nat_id int NOT NULL AUTO_INCREMENT,
+      entity_id int DEFAULT NULL,
+      nationality_id int DEFAULT NULL,
+      PRIMARY KEY (nat_id),
+      KEY entity_id (entity_id),
+      KEY nationality_id (nationality_id),
+      CONSTRAINT nationalities_ibfk_1 FOREIGN KEY (entity_id) REFERENCES sanctioned_entities (entity_id),
+      CONSTRAINT nationalities_ibfk_2 FOREIGN KEY (nationality_id) REFERENCES nationality_codes (nationality_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sanction_types (
+      type_id int NOT NULL AUTO_INCREMENT,
+      entity_id int DEFAULT NULL,
+      sanction_type_id int DEFAULT NULL,
+      PRIMARY KEY (type_id),
+      KEY entity_id (entity_id),
+      KEY sanction_type_id (sanction_type_id),
+      CONSTRAINT sanction_types_ibfk_1 FOREIGN KEY (entity_id) REFERENCES sanctioned_entities (entity_id),
+      CONSTRAINT sanction_types_ibfk_2 FOREIGN KEY (sanction_type_id) REFERENCES sanction_programs (sanction_type_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+]
+
+# Databases restored from sanctions_dump.sql still carry the free-text
+# columns; these move them onto the reference tables in place.
+# (child table, text column, reference table, key column, foreign key name)
+LOOKUP_MIGRATIONS = [
+    ('nationalities', 'nationality', 'nationality_codes', 'nationality_id', 'nationalities_ibfk_2'),
+    ('sanction_types', 'sanction_type', 'sanction_programs', 'sanction_type_id', 'sanction_types_ibfk_2'),
+]
+
+# Normalized name / hash columns (see db_utils.name_columns) that older
+# databases lack; they are added and backfilled in place.
+# (table, primary key, name column, normalized column, hash column)
+NAME_MIGRATIONS = [
+    ('sanctioned_entities', 'entity_id', 'name', 'name_norm', 'name_hash'),
+    ('aliases', 'alias_id', 'alias_name', 'alias_norm', 'alias_hash'),
+]
+
+# Incremental loads: last loaded fingerprint of every record, per source,
+# and an append-only log of what each run changed.
+DELTA_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS source_snapshots (
+      source varchar(255) NOT NULL,
+      record_key char(40) NOT NULL,
+      fingerprint char(40) NOT NULL,
+      entity_id int NOT NULL,
+      name varchar(255) DEFAULT NULL,
+      designation text,
+      loaded_at datetime NOT NULL,
+      PRIMARY KEY (source, record_key)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS entity_changes (
+      change_id bigint NOT NULL AUTO_INCREMENT,
+      source varchar(255) NOT NULL,
+      entity_id int NOT NULL,
+      name varchar(255) DEFAULT NULL,
+      change_type enum('added','removed','modified') NOT NULL,
+      changed_at datetime NOT NULL,
+      PRIMARY KEY (change_id),
+      KEY source_changed_at (source, changed_at),
+      KEY entity_id (entity_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+]
+
+# Resumable loads: how far into each source's feed the last committed batch got.
+CHECKPOINT_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS load_checkpoints (
+      source varchar(255) NOT NULL,
+      feed_hash char(64) NOT NULL,
+      record_offset int NOT NULL,
+      updated_at datetime NOT NULL,
+      PRIMARY KEY (source)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+]
+
+# Designations predicted for records that arrive without one, per model version
+# (see prediction.designation), keyed by the record's fingerprint.
+PREDICTION_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS designation_predictions (
+      fingerprint char(40) NOT NULL,
+      model_version varchar(40) NOT NULL,
+      designation text NOT NULL,
+      predicted_at datetime NOT NULL,
+      PRIMARY KEY (model_version, fingerprint)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+]
+
+# Cross-source entity resolution (see db.resolution): every entity and the
+# cluster of listings it belongs to, identified by the cluster's lowest
+# entity_id. Rebuilt after each load; no foreign key, so a shadow load's
+# RENAME TABLE swap does not drag it along to the retired tables.
+RESOLUTION_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS canonical_entity (
+      entity_id int NOT NULL,
+      cluster_id int NOT NULL,
+      match_score float DEFAULT NULL,
+      resolved_at datetime NOT NULL,
+      PRIMARY KEY (entity_id),
+      KEY cluster_id (cluster_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+]
+
+# Bumped by every ETL run that commits; db.read_api drops its caches when it moves.
+VERSION_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS list_version (
+      id tinyint NOT NULL,
+      version bigint NOT NULL,
+      updated_at datetime NOT NULL,
+      PRIMARY KEY (id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+]
+
+
+# List statistics maintained by each load from the rows it inserts and
+# deletes (see db.aggregates). No foreign keys, like canonical_entity.
+AGGREGATE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS source_stats (
+      source varchar(255) NOT NULL,
+      entities int NOT NULL DEFAULT 0,
+      aliases int NOT NULL DEFAULT 0,
+      nationalities int NOT NULL DEFAULT 0,
+      sanction_types int NOT NULL DEFAULT 0,
+      multi_nationality int NOT NULL DEFAULT 0,
+      updated_at datetime NOT NULL,
+      PRIMARY KEY (source)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS nationality_stats (
+      nationality_id int NOT NULL,
+      entities int NOT NULL DEFAULT 0,
+      updated_at datetime NOT NULL,
+      PRIMARY KEY (nationality_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS program_stats (
+      sanction_type_id int NOT NULL,
+      entities int NOT NULL DEFAULT 0,
+      updated_at datetime NOT NULL,
+      PRIMARY KEY (sanction_type_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+]
+
+
+def _column_exists(cursor, table, column):
+    if getattr(cursor, 'dialect', 'mysql') == 'sqlite':
+        cursor.execute(f"SELECT COUNT(*) AS count FROM pragma_table_info('{table}') WHERE name = %s", (column,))
+        return cursor.fetchone()['count'] > 0
+    cursor.execute("""
+        SELECT COUNT(*) AS count FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone()['count'] > 0
+
+
+def migrate_lookup_columns(cursor):
+    """Dictionary-encode legacy free-text nationality / sanction_type columns."""
+    for table, column, ref_table, key_column, fk_name in LOOKUP_MIGRATIONS:
+        if not _column_exists(cursor, table, column):
+            continue
+        print(f"Migrating {table}.{column} to {ref_table}")
+        cursor.execute(f"""
+            INSERT IGNORE INTO {ref_table} ({column})
+            SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL
+        """)
+        if not _column_exists(cursor, table, key_column):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {key_column} int DEFAULT NULL AFTER entity_id")
+        cursor.execute(f"""
+            UPDATE {table} t JOIN {ref_table} r ON r.{column} = t.{column} COLLATE utf8mb4_bin
+            SET t.{key_column} = r.{key_column}
+        """)
+        cursor.execute(f"""
+            ALTER TABLE {table}
+              DROP COLUMN {column},
+              ADD KEY {key_column} ({key_column}),
+              ADD CONSTRAINT {fk_name} FOREIGN KEY ({key_column}) REFERENCES {ref_table} ({key_column})
+        """)
+
+
+def migrate_name_columns(cursor, batch_size=5000):
+    """Add, backfill and index the normalized name columns on databases created without them."""
+    for table, key_column, column, norm_column, hash_column in NAME_MIGRATIONS:
+        if _column_exists(cursor, table, hash_column):
+            continue
+        print(f"Adding {table}.{norm_column} / {hash_column}")
+        cursor.execute(f"""
+            ALTER TABLE {table}
+              ADD COLUMN {norm_column} varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL,
+              ADD COLUMN {hash_column} char(40) CHARACTER SET ascii COLLATE ascii_bin DEFAULT NULL
+        """)
+        cursor.execute(f"SELECT {key_column} AS id, {column} AS value FROM {table} WHERE {column} IS NOT NULL")
+        rows = cursor.fetchall()
+        for batch in chunked(rows, batch_size):
+            cursor.executemany(
+                f"UPDATE {table} SET {norm_column} = %s, {hash_column} = %s WHERE {key_column} = %s",
+                [name_columns(row['value']) + (row['id'],) for row in batch]
+            )
+        cursor.execute(f"ALTER TABLE {table} ADD KEY {hash_column} ({hash_column}), "
+                       f"ADD KEY {norm_column} ({norm_column})")
+
+
+def migrate_aggregates(cursor):
+    """Add the multi_nationality flag to databases created without it, and fill the summary tables once."""
+    sqlite = getattr(cursor, 'dialect', 'mysql') == 'sqlite'
+    if not _column_exists(cursor, 'sanctioned_entities', 'multi_nationality'):
+        print("Adding sanctioned_entities.multi_nationality and building the list statistics")
+        if sqlite:
+            cursor.execute("ALTER TABLE sanctioned_entities ADD COLUMN multi_nationality INTEGER NOT NULL DEFAULT 0")
+        else:
+            cursor.execute("""
+                ALTER TABLE sanctioned_entities
+                  ADD COLUMN multi_nationality tinyint(1) NOT NULL DEFAULT 0,
+                  ADD KEY multi_nationality (multi_nationality)
+            """)
+        rebuild_stats(cursor)
+    if sqlite:
+        # not in SQLITE_SCHEMA, which also runs against databases that lack the column
+        cursor.execute("CREATE INDEX IF NOT EXISTS sanctioned_entities_multi_nationality "
+                       "ON sanctioned_entities (multi_nationality)")
+
+
+def ensure_schema(cursor):
+    if getattr(cursor, 'dialect', 'mysql') == 'sqlite':
+        # embedded backend: the same tables and indexes, created fresh (see db.sqlite_db)
+        cursor.executescript(SQLITE_SCHEMA)
+        migrate_aggregates(cursor)
+        return
+    for statement in (CORE_TABLES + DELTA_TABLES + CHECKPOINT_TABLES + PREDICTION_TABLES
+                      + RESOLUTION_TABLES + VERSION_TABLES + AGGREGATE_TABLES):
+        cursor.execute(statement)
+    migrate_lookup_columns(cursor)
+    migrate_name_columns(cursor)
+    migrate_aggregates(cursor)
@@ -0,0 +1,235 @@
+"""
+Blue/green reloads. A shadow load writes the whole list into staging copies of
+the sanctions tables while readers keep using the live ones, then swaps the
+copies in with a single RENAME TABLE, so readers never block on the load and
+never see a partially loaded list.
+
+On SQLite (db.sqlite_db) the copies are created from the live tables' own
+DDL, foreign keys included, and swapped with ALTER TABLE ... RENAME inside
+one transaction; WAL readers keep reading the old tables until it commits.
+"""
+import re
+from datetime import datetime
+
+from db.db_utils import load_batch
+from db.delta import record_fingerprint, record_key, write_snapshots
+
+STAGING_SUFFIX = '_staging'
+RETIRED_SUFFIX = '_old'
+
+# Tables rebuilt by a shadow load, parents first. The nationality / sanction
+# type dictionaries are shared with the live tables and only ever grow.
+# The summary tables (db.aggregates) are rebuilt the same way, from the rows
+# the shadow load inserts, so they go live with the list they describe.
+SHADOW_TABLES = ('sanctioned_entities', 'aliases', 'nationalities', 'sanction_types', 'source_snapshots',
+                 'source_stats', 'nationality_stats', 'program_stats')
+
+# CREATE TABLE ... LIKE copies these indexes; they are dropped while the
+# staging copy loads and rebuilt in one pass at the end. The name_hash key
+# stays: load_batch resolves every batch's new entity IDs through it, and
+# without it each lookup would scan the growing staging table.
+SECONDARY_KEYS = {
+    'sanctioned_entities': [('name_norm', 'name_norm'), ('multi_nationality', 'multi_nationality')],
+    'aliases': [('entity_id', 'entity_id'), ('alias_hash', 'alias_hash'), ('alias_norm', 'alias_norm')],
+    'nationalities': [('entity_id', 'entity_id'), ('nationality_id', 'nationality_id')],
+    'sanction_types': [('entity_id', 'entity_id'), ('sanction_type_id', 'sanction_type_id')],
+}
+
+# LIKE never copies foreign keys. They are added back with the indexes and
+# named <table>_ibfk_<n>, which RENAME TABLE rewrites to follow the table.
+# (table, column, referenced table, referenced column)
+FOREIGN_KEYS = [
+    ('aliases', 'entity_id', 'sanctioned_entities', 'entity_id'),
+    ('nationalities', 'entity_id', 'sanctioned_entities', 'entity_id'),
+    ('nationalities', 'nationality_id', 'nationality_codes', 'nationality_id'),
+    ('sanction_types', 'entity_id', 'sanctioned_entities', 'entity_id'),
+    ('sanction_types', 'sanction_type_id', 'sanction_programs', 'sanction_type_id'),
+]
+
+# Refuse to swap in a list with fewer entities than this share of the live one
+MIN_ROW_RATIO = 0.5
+
+
+def _sqlite(cursor):
+    return getattr(cursor, 'dialect', 'mysql') == 'sqlite'
+
+
+def staging_tables():
+    """Logical -> physical table mapping for loading into the staging copies."""
+    return {table: table + STAGING_SUFFIX for table in SHADOW_TABLES}
+
+
+def _drop_tables(cursor, suffix):
+    # children before parents so no foreign key blocks the drop
+    for table in reversed(SHADOW_TABLES):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}{suffix}")
+
+
+def _table_sql(cursor, table):
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+    return cursor.fetchone()['sql']
+
+
+def _index_sql(cursor, table):
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s "
+                   "AND sql IS NOT NULL", (table,))
+    return cursor.fetchall()
+
+
+def _prepare_sqlite_staging(cursor, tables):
+    # The live DDL with the table and the shadowed parents it references
+    # renamed; SQLite declares foreign keys in CREATE TABLE, so they come along.
+    # Its indexes are separate objects and are not copied.
+    shadowed = '|'.join(SHADOW_TABLES)
+    for table in SHADOW_TABLES:
+        sql = re.sub(r'^CREATE TABLE\s+"?\w+"?', f'CREATE TABLE {tables[table]}', _table_sql(cursor, table))
+        sql = re.sub(rf'REFERENCES\s+"?({shadowed})"?(?=[\s(,]|$)',
+                     lambda match: f'REFERENCES {tables[match.group(1)]}', sql)
+        cursor.execute(sql)
+    cursor.execute(f"CREATE INDEX {tables['sanctioned_entities']}_name_hash "
+                   f"ON {tables['sanctioned_entities']} (name_hash)")
+
+
+def prepare_staging(cursor):
+    """Create empty staging copies of the live tables without their secondary indexes."""
+    _drop_tables(cursor, STAGING_SUFFIX)
+    _drop_tables(cursor, RETIRED_SUFFIX)
+    tables = staging_tables()
+    if _sqlite(cursor):
+        _prepare_sqlite_staging(cursor, tables)
+        return tables
+    for table in SHADOW_TABLES:
+        cursor.execute(f"CREATE TABLE {tables[table]} LIKE {table}")
+    for table, keys in SECONDARY_KEYS.items():
+        drops = ', '.join(f"DROP KEY {name}" for name, _ in keys)
+        cursor.execute(f"ALTER TABLE {tables[table]} {drops}")
+    return tables
+
+
+def discard_staging(cursor):
+    _drop_tables(cursor, STAGING_SUFFIX)
+
+
+def build_indexes(cursor, tables):
+    """Rebuild the staging tables' secondary indexes and foreign keys, one ALTER per table."""
+    if _sqlite(cursor):
+        # index names are global in SQLite and cannot be renamed, so the live
+        # ones are recreated under their own names as part of the swap
+        return
+    for table, keys in SECONDARY_KEYS.items():
+        clauses = [f"ADD KEY {name} ({columns})" for name, columns in keys]
+        n = 0
+        for fk_table, column, ref_table, ref_column in FOREIGN_KEYS:
+            if fk_table != table:
+                continue
+            n += 1
+            clauses.append(
+                f"ADD CONSTRAINT {tables[table]}_ibfk_{n} FOREIGN KEY ({column}) "
+                f"REFERENCES {tables.get(ref_table, ref_table)} ({ref_column})"
+            )
+        cursor.execute(f"ALTER TABLE {tables[table]} {', '.join(clauses)}")
+
+
+def _count(cursor, table):
+    cursor.execute(f"SELECT COUNT(*) AS count FROM {table}")
+    return cursor.fetchone()['count']
+
+
+def validate_staging(cursor, tables, index, min_ratio=MIN_ROW_RATIO):
+    """
+    Check the staging row counts against what the writer loaded (tracked by the
+    run's DedupIndex) and against the live list. Raises ValueError on mismatch.
+    """
+    expected = {'sanctioned_entities': len(index.entities)}
+    for table, by_entity in index.children.items():
+        expected[table] = sum(len(values) for values in by_entity.values())
+
+    counts = {}
+    for table, rows in expected.items():
+        counts[table] = _count(cursor, tables[table])
+        if counts[table] != rows:
+            raise ValueError(f"{tables[table]} holds {counts[table]} rows, expected {rows}")
+
+    cursor.execute(f"SELECT COALESCE(SUM(entities), 0) AS count FROM {tables['source_stats']}")
+    summarized = int(cursor.fetchone()['count'])
+    if summarized != counts['sanctioned_entities']:
+        raise ValueError(f"{tables['source_stats']} counts {summarized} entities, "
+                         f"expected {counts['sanctioned_entities']}")
+
+    live = _count(cursor, 'sanctioned_entities')
+    if counts['sanctioned_entities'] < live * min_ratio:
+        raise ValueError(
+            f"staging list has {counts['sanctioned_entities']} entities, "
+            f"under {min_ratio:.0%} of the {live} live ones"
+        )
+    return counts
+
+
+def _swap_sqlite_staging(cursor, tables):
+    indexes = {table: _index_sql(cursor, table) for table in SHADOW_TABLES}
+    cursor.execute("SAVEPOINT swap_staging")
+    try:
+        # live tables first, so the foreign keys SQLite rewrites on each rename
+        # follow the old tables out and the staging ones in
+        for table in SHADOW_TABLES:
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {table}{RETIRED_SUFFIX}")
+        for table in SHADOW_TABLES:
+            cursor.execute(f"ALTER TABLE {tables[table]} RENAME TO {table}")
+        _drop_tables(cursor, RETIRED_SUFFIX)
+        for table in SHADOW_TABLES:
+            for row in _index_sql(cursor, table):
+                cursor.execute(f"DROP INDEX {row['name']}")
+            for row in indexes[table]:
+                cursor.execute(row['sql'])
+    except Exception:
+        cursor.execute("ROLLBACK TO swap_staging")
+        raise
+    finally:
+        cursor.execute("RELEASE swap_staging")
+
+
+def swap_staging(cursor, tables):
+    """Atomically replace the live tables with the staging copies, then drop the old ones."""
+    if _sqlite(cursor):
+        _swap_sqlite_staging(cursor, tables)
+        return
+    renames = []
+    for table in SHADOW_TABLES:
+        renames.append(f"{table} TO {table}{RETIRED_SUFFIX}")
+        renames.append(f"{tables[table]} TO {table}")
+    cursor.execute(f"RENAME TABLE {', '.join(renames)}")
+    _drop_tables(cursor, RETIRED_SUFFIX)
+
+
+class ShadowLoader:
+    """
+    Loads one source's feed into the staging tables and records its snapshot
+    rows alongside, so incremental loads after the swap diff against this run.
+    """
+
+    def __init__(self, cursor, source, index, lookups, tables, list_stats=None):
+        self.cursor = cursor
+        self.source = source
+        self.index = index
+        self.lookups = lookups
+        self.tables = tables
+        self.list_stats = list_stats
+        self.run_at = datetime.now()
+        self.seen = set()
+
+    def apply(self, records, keys=None):
+        """Load one chunk; `keys` as for `DeltaLoader.apply`."""
+        entity_ids = load_batch(self.cursor, records, self.index, self.lookups, self.tables, self.list_stats)
+        rows = []
+        for i, (record, eid) in enumerate(zip(records, entity_ids)):
+            if eid is None:
+                continue
+            key = keys[i] if keys is not None else record_key(record)
+            # same entity listed twice in the feed; the first listing is its snapshot
+            if key in self.seen:
+                continue
+            self.seen.add(key)
+            rows.append((self.source, key, record_fingerprint(record), eid,
+                         record.name, record.designation, self.run_at))
+        if rows:
+            write_snapshots(self.cursor, rows, self.tables['source_snapshots'])
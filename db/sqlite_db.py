@@ -0,0 +1,181 @@
+"""
+Embedded SQLite backend. With DB_BACKEND=sqlite, `db_utils.connect_db`
+returns one of these connections instead of a pymysql one, so the ETL, the
+read API and the screening tools run on a single node with no MySQL server
+(and no network hop per query).
+
+It exposes the slice of the pymysql API the rest of the code uses (DictCursor
+rows by default, plain tuples for the unbuffered SSCursor, executemany,
+lastrowid) and rewrites the few MySQL-only constructs the queries emit, so
+db_utils and friends run unchanged. The schema mirrors db.schema with the
+same tables and indexes. The database runs in WAL mode, so readers keep
+reading the last committed list while a load writes.
+"""
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+import pymysql
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "artifacts/sanctions.db")
+
+# WAL lets readers and the single writer work concurrently; NORMAL sync is
+# durable across application crashes in WAL mode and much faster than FULL.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "temp_store": "MEMORY",
+    "cache_size": -64000,            # KiB
+    "mmap_size": 256 * 2**20,
+    "busy_timeout": 5000,            # ms to wait on a locked database
+    # normalized names are lower-case, and this lets LIKE 'prefix%' use their index
+    "case_sensitive_like": "ON",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sanctioned_entities (
+  entity_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, designation TEXT, source TEXT,
+  name_norm TEXT, name_hash TEXT, multi_nationality INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS sanctioned_entities_name_hash ON sanctioned_entities (name_hash);
+CREATE INDEX IF NOT EXISTS sanctioned_entities_name_norm ON sanctioned_entities (name_norm);
+CREATE TABLE IF NOT EXISTS aliases (
+  alias_id INTEGER PRIMARY KEY AUTOINCREMENT, entity_id INT REFERENCES sanctioned_entities, alias_name TEXT,
+  alias_norm TEXT, alias_hash TEXT);
+CREATE INDEX IF NOT EXISTS aliases_entity_id ON aliases (entity_id);
+CREATE INDEX IF NOT EXISTS aliases_alias_hash ON aliases (alias_hash);
+CREATE INDEX IF NOT EXISTS aliases_alias_norm ON aliases (alias_norm);
+CREATE TABLE IF NOT EXISTS nationality_codes (
+  nationality_id INTEGER PRIMARY KEY AUTOINCREMENT, nationality TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS sanction_programs (
+  sanction_type_id INTEGER PRIMARY KEY AUTOINCREMENT, sanction_type TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS nationalities (
+  nat_id INTEGER PRIMARY KEY AUTOINCREMENT, entity_id INT REFERENCES sanctioned_entities,
+  nationality_id INT REFERENCES nationality_codes);
+CREATE INDEX IF NOT EXISTS nationalities_entity_id ON nationalities (entity_id);
+CREATE INDEX IF NOT EXISTS nationalities_nationality_id ON nationalities (nationality_id);
+CREATE TABLE IF NOT EXISTS sanction_types (
+  type_id INTEGER PRIMARY KEY AUTOINCREMENT, entity_id INT REFERENCES sanctioned_entities,
+  sanction_type_id INT REFERENCES sanction_programs);
+CREATE INDEX IF NOT EXISTS sanction_types_entity_id ON sanction_types (entity_id);
+CREATE INDEX IF NOT EXISTS sanction_types_sanction_type_id ON sanction_types (sanction_type_id);
+CREATE TABLE IF NOT EXISTS source_snapshots (
+  source TEXT NOT NULL, record_key TEXT NOT NULL, fingerprint TEXT NOT NULL, entity_id INT NOT NULL,
+  name TEXT, designation TEXT, loaded_at TEXT NOT NULL, PRIMARY KEY (source, record_key));
+CREATE TABLE IF NOT EXISTS entity_changes (
+  change_id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, entity_id INT NOT NULL, name TEXT,
+  change_type TEXT NOT NULL CHECK (change_type IN ('added', 'removed', 'modified')), changed_at TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS entity_changes_source_changed_at ON entity_changes (source, changed_at);
+CREATE INDEX IF NOT EXISTS entity_changes_entity_id ON entity_changes (entity_id);
+CREATE TABLE IF NOT EXISTS load_checkpoints (
+  source TEXT PRIMARY KEY, feed_hash TEXT NOT NULL, record_offset INT NOT NULL, updated_at TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS designation_predictions (
+  fingerprint TEXT NOT NULL, model_version TEXT NOT NULL, designation TEXT NOT NULL, predicted_at TEXT NOT NULL,
+  PRIMARY KEY (model_version, fingerprint));
+CREATE TABLE IF NOT EXISTS canonical_entity (
+  entity_id INTEGER PRIMARY KEY, cluster_id INT NOT NULL, match_score REAL, resolved_at TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS canonical_entity_cluster_id ON canonical_entity (cluster_id);
+CREATE TABLE IF NOT EXISTS list_version (
+  id INTEGER PRIMARY KEY, version INT NOT NULL, updated_at TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS source_stats (
+  source TEXT PRIMARY KEY, entities INT NOT NULL DEFAULT 0, aliases INT NOT NULL DEFAULT 0,
+  nationalities INT NOT NULL DEFAULT 0, sanction_types INT NOT NULL DEFAULT 0,
+  multi_nationality INT NOT NULL DEFAULT 0, updated_at TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS nationality_stats (
+  nationality_id INTEGER PRIMARY KEY, entities INT NOT NULL DEFAULT 0, updated_at TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS program_stats (
+  sanction_type_id INTEGER PRIMARY KEY, entities INT NOT NULL DEFAULT 0, updated_at TEXT NOT NULL);
+"""
+
+_REWRITES = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\bINSERT IGNORE\b"), "INSERT OR IGNORE"),
+    (re.compile(r"ON DUPLICATE KEY UPDATE"), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"VALUES\((\w+)\)"), r"excluded.\1"),
+    (re.compile(r"<=>"), "IS"),
+    (re.compile(r"SET FOREIGN_KEY_CHECKS = 0"), "PRAGMA foreign_keys = OFF"),
+    (re.compile(r"SET FOREIGN_KEY_CHECKS = 1"), "PRAGMA foreign_keys = ON"),
+]
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+
+
+def _translate(query):
+    for pattern, replacement in _REWRITES:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+class Cursor:
+    dialect = "sqlite"
+
+    def __init__(self, cursor, as_dict=True):
+        self._cursor = cursor
+        self._as_dict = as_dict
+
+    def execute(self, query, args=None):
+        self._cursor.execute(_translate(query), tuple(args or ()))
+
+    def executemany(self, query, args):
+        self._cursor.executemany(_translate(query), [tuple(row) for row in args])
+
+    def executescript(self, script):
+        self._cursor.executescript(script)
+
+    def _columns(self):
+        return [d[0] for d in self._cursor.description]
+
+    def _row(self, row, columns):
+        return dict(zip(columns, row)) if self._as_dict else row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._row(row, self._columns())
+
+    def fetchall(self):
+        columns = self._columns()
+        return [self._row(row, columns) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        columns = self._columns()
+        return (self._row(row, columns) for row in self._cursor)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    dialect = "sqlite"
+
+    def __init__(self, path=":memory:", schema=True):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # pooled connections are handed between threads, one user at a time
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        for name, value in PRAGMAS.items():
+            self._conn.execute(f"PRAGMA {name} = {value}")
+        if schema:
+            self._conn.executescript(SCHEMA)
+
+    def cursor(self, cursorclass=None):
+        # pymysql's SSCursor / Cursor classes return plain tuples
+        as_dict = cursorclass is None or issubclass(cursorclass, pymysql.cursors.DictCursorMixin)
+        return Cursor(self._conn.cursor(), as_dict)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(path=SQLITE_PATH):
+    return Connection(path)
@@ -1,18 +1,43 @@
 
+import argparse
 import json
-import requests
-import pandas as pd
-from utils.xml_parsers import parse_xml, parse_sdn, parse_swiss, parse_un
-from db.db_utils import connect_db, insert_entity, insert_aliases, insert_nationalities, insert_sanction_types
+import os
+import time
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import Manager
+from queue import Empty, Queue
+from utils.feed_cache import FeedCache, feed_hash, make_session
+from utils.mappings import available_mappings, mapping_parser
+from utils.csv_parsers import parse_csv
+from db.aggregates import ListStats
+from db.db_utils import connect_db, load_records, chunked, DEFAULT_BATCH_SIZE, LIVE_TABLES
+from db.checkpoints import (
+    DEFAULT_COMMIT_EVERY, clear_checkpoint, load_checkpoints, resume_offset, save_checkpoint,
+)
+from db.dedup_index import DedupIndex
+from db.delta import DeltaLoader, record_key
+from db.lookups import LookupCache
+from db.read_api import bump_version
+from db.resolution import resolve_entities
+from db.schema import ensure_schema
+from db.shadow import (
+    ShadowLoader, build_indexes, discard_staging, prepare_staging, swap_staging, validate_staging,
+)
+from prediction.designation import MODEL_PATH, DesignationPredictor
+from screening.snapshot import publish_snapshot
+from utils.metrics import METRICS_PATH, CountingCursor, Metrics, profiled
 
-# Map parser keys to functions
+# Map parser keys to functions. XML feeds are described by the mappings in
+# config/mappings/ (ofac, un, sdn, swiss, ...), compiled once here.
 PARSERS = {
-    "ofac": parse_xml,
-    "un": parse_un,
-    "sdn": parse_sdn,
-       # not used since UK CSV is handled separately
-    "swiss": parse_swiss
+    name: mapping_parser(name) for name in available_mappings()
 }
+PARSERS.update({
+    # UK is loaded from the CSV whose missing designations were predicted (see app.ipynb)
+    "uk": parse_csv,
+    "csv": parse_csv,
+})
 
 def is_html(content):
     try:
@@ -20,17 +45,317 @@ def is_html(content):
     except Exception:
         return False
 
-def read_csv_data(csv_file):
-    """Read CSV, converting empty or 'null' values to None."""
-    df = pd.read_csv(csv_file, keep_default_na=True, na_values=['', 'null', 'NULL', 'N/A'])
-    df = df.rename(columns={
-        'SanctionType': 'Sanction Type',
-    })
-    df = df.where(pd.notnull(df), None)
-    return df.to_dict('records')
+# Max number of parsed chunks a source may have waiting for the writer
+QUEUE_SIZE = 8
 
 
-def main():
+def fetch_source(src, session, feed_cache, force=False, metrics=None, reuse_cached=False):
+    """
+    Fetch stage (runs in a thread). Returns the raw feed bytes for URL sources,
+    the file path for local sources, or None if the source should be skipped.
+    URL sources are requested conditionally against the raw feed cache; with
+    `reuse_cached`, an unchanged feed is read back from the cache instead of
+    being skipped (for loads that need every feed).
+    """
+    source_name = src["sanction_type"]
+    if "url" in src:
+        with metrics.timer(source_name, "fetch"):
+            content = feed_cache.fetch(session, source_name, src["url"], force=force)
+            if content is None and reuse_cached:
+                content = feed_cache.read_body(source_name)
+                if content is None:
+                    content = feed_cache.fetch(session, source_name, src["url"], force=True)
+                else:
+                    print(f"  [INFO] {source_name} feed unchanged since last load, reloading the cached copy.")
+        if content is None:
+            print(f"  [INFO] {source_name} feed unchanged since last load, skipping.")
+            return None
+        metrics.add(source_name, "bytes_fetched", len(content))
+        if is_html(content):
+            feed_cache.discard(source_name)
+            print(f"  [WARN] {source_name} URL returned HTML, skipping.")
+            return None
+        return content
+    path = src.get("path")
+    if path and os.path.isfile(path):
+        metrics.add(source_name, "bytes_fetched", os.path.getsize(path))
+    return path
+
+
+def _parse_chunks(parser_key, source_name, content, queue, chunk_size, skip):
+    """Body of the parse stage; returns its stats, or None after reporting an error."""
+    count = 0
+    parse_seconds = 0.0
+    stream = None
+    try:
+        start = time.perf_counter()
+        # Local files are handed to the parser as an open stream
+        if isinstance(content, str):
+            stream = content = open(content, "rb")
+        records = PARSERS[parser_key](content, source_name)
+
+        chunks = chunked(islice(records, skip, None), chunk_size)
+        while True:
+            # time spent producing records, not waiting on a full queue
+            chunk = next(chunks, None)
+            parse_seconds += time.perf_counter() - start
+            if chunk is None:
+                break
+            queue.put(("records", chunk))
+            count += len(chunk)
+            start = time.perf_counter()
+    except Exception as e:
+        queue.put(("error", f"Parsing failed for {source_name}: {e}"))
+        return None
+    finally:
+        if stream is not None:
+            stream.close()
+    return {"parsed": count, "parse_seconds": parse_seconds}
+
+
+def parse_source(parser_key, source_name, content, queue, chunk_size, skip=0,
+                 profile=False, trace_memory=False):
+    """
+    Parse stage (runs in a worker process). Streams records from the parser
+    and hands them to the writer in chunks through the bounded `queue`, then
+    finishes with a ("done", stats) or ("error", message) message. The first
+    `skip` records (committed by an earlier, interrupted run) are not sent.
+    `profile` / `trace_memory` wrap the stage in cProfile / tracemalloc.
+    """
+    with profiled(f"{source_name}.parse", profile, trace_memory) as prof:
+        stats = _parse_chunks(parser_key, source_name, content, queue, chunk_size, skip)
+    if stats is not None:
+        if "peak_bytes" in prof:
+            stats["parse_peak_bytes"] = prof["peak_bytes"]
+        queue.put(("done", stats))
+
+
+class LoadContext:
+    """Writer-side state shared by every source in a run."""
+
+    def __init__(self, conn, index, lookups, feed_cache, batch_size, incremental=False, staging=None,
+                 commit_every=0, metrics=None, predictor=None):
+        self.conn = conn
+        self.metrics = metrics or Metrics()
+        # every statement the writer sends is counted against the source being loaded
+        self.cursor = CountingCursor(conn.cursor(), self.metrics)
+        self.index = index
+        self.lookups = lookups
+        self.feed_cache = feed_cache
+        self.batch_size = batch_size
+        self.incremental = incremental
+        # staging table mapping for a shadow load, None when writing the live tables
+        self.staging = staging
+        # records per transaction for checkpointed loads, 0 for one transaction per source
+        self.commit_every = commit_every
+        # fills in missing designations before records are written, None to load them as they are
+        self.predictor = predictor
+        # deltas to the summary tables, written with each commit (see db.aggregates)
+        self.stats = ListStats(staging or LIVE_TABLES)
+        self.committed = 0
+        # sources that did not load in this run (failed, or skipped as unchanged)
+        self.incomplete = []
+
+
+def commit_run(ctx):
+    with ctx.metrics.timer(ctx.metrics.current, "commit"):
+        ctx.conn.commit()
+    ctx.metrics.add(ctx.metrics.current, "commits")
+    ctx.index.commit()
+    ctx.lookups.commit()
+    if ctx.predictor is not None:
+        ctx.predictor.commit()
+
+
+def write_source(ctx, source_name, queue, parse_job, feed=None, offset=0):
+    """
+    Writer stage (runs in the main process). Drains one source's queue into
+    MySQL and commits it as a unit, or rolls it back on any failure. With
+    `ctx.commit_every` set, it instead commits every that many records along
+    with a checkpoint of the feed's hash and offset, so a failed load keeps
+    what was committed and the next run of the same feed resumes there. In
+    incremental mode the feed is applied as a change set against the source's
+    last snapshot instead of being appended; in a shadow load it goes to the
+    staging tables. Records without a designation get one from
+    `ctx.predictor` first, if a model is loaded.
+    """
+    ctx.metrics.current = source_name
+    start = time.perf_counter()
+    count = 0
+    checkpointed = 0
+    error = None
+    loader = None
+    try:
+        if ctx.incremental:
+            loader = DeltaLoader(ctx.cursor, source_name, ctx.index, ctx.lookups, ctx.stats)
+        elif ctx.staging is not None:
+            loader = ShadowLoader(ctx.cursor, source_name, ctx.index, ctx.lookups, ctx.staging, ctx.stats)
+    except Exception as e:
+        error = f"Loading snapshot failed for {source_name}: {e}"
+
+    while True:
+        try:
+            with ctx.metrics.timer(source_name, "queue_wait"):
+                kind, payload = queue.get(timeout=1)
+        except Empty:
+            # a worker that died without reporting would otherwise block the writer forever
+            if parse_job.done() and queue.empty():
+                error = error or f"Parse worker for {source_name} exited: {parse_job.exception()}"
+                break
+            continue
+        if kind == "records":
+            if error is None:
+                try:
+                    keys = None
+                    if ctx.predictor is not None:
+                        # snapshots identify records by the designation the feed gave them
+                        if loader is not None:
+                            keys = [record_key(record) for record in payload]
+                        with ctx.metrics.timer(source_name, "predict"):
+                            payload, predicted, cached = ctx.predictor.fill(ctx.cursor, payload)
+                        ctx.metrics.add(source_name, "designations_predicted", predicted)
+                        ctx.metrics.add(source_name, "prediction_cache_hits", cached)
+                    with ctx.metrics.timer(source_name, "load"):
+                        if loader is not None:
+                            loader.apply(payload, keys)
+                        else:
+                            load_records(ctx.cursor, payload, ctx.batch_size, ctx.index, ctx.lookups,
+                                         stats=ctx.stats)
+                    count += len(payload)
+                    if ctx.commit_every and count - checkpointed >= ctx.commit_every:
+                        with ctx.metrics.timer(source_name, "stats"):
+                            ctx.stats.flush(ctx.cursor)
+                        save_checkpoint(ctx.cursor, source_name, feed, offset + count)
+                        commit_run(ctx)
+                        checkpointed = count
+                except Exception as e:
+                    # keep draining so the parse worker is not left blocked on a full queue
+                    error = f"Insert failed for {source_name}: {e}"
+        elif kind == "error":
+            error = error or payload
+            break
+        else:
+            # parse worker's own stats: records parsed, parse time, peak memory
+            for name, value in payload.items():
+                ctx.metrics.add(source_name, name, value)
+            break
+
+    # only a complete feed may delist the records it no longer contains
+    if error is None and ctx.incremental:
+        try:
+            loader.finish(ctx.batch_size)
+        except Exception as e:
+            error = f"Applying deletions failed for {source_name}: {e}"
+
+    # the whole feed is in, so the next run starts it from the beginning
+    if error is None and ctx.commit_every:
+        try:
+            clear_checkpoint(ctx.cursor, source_name)
+        except Exception as e:
+            error = f"Clearing checkpoint failed for {source_name}: {e}"
+
+    # the summary tables take this source's inserted and deleted rows in the same transaction
+    if error is None:
+        try:
+            with ctx.metrics.timer(source_name, "stats"):
+                ctx.stats.flush(ctx.cursor)
+        except Exception as e:
+            error = f"Updating list statistics failed for {source_name}: {e}"
+
+    ctx.metrics.set(source_name, "records", count)
+    ctx.metrics.set(source_name, "status", "failed" if error is not None else "ok")
+    if error is not None:
+        ctx.metrics.set(source_name, "write_seconds", time.perf_counter() - start)
+        print(f"  [ERROR] {error}")
+        ctx.conn.rollback()
+        ctx.index.rollback()
+        ctx.lookups.rollback()
+        ctx.stats.discard()
+        if ctx.predictor is not None:
+            ctx.predictor.rollback()
+        ctx.feed_cache.discard(source_name)
+        ctx.incomplete.append(source_name)
+        if checkpointed:
+            # the checkpointed part of the feed stays loaded
+            ctx.committed += 1
+            print(f"  [INFO] {source_name} committed through record {offset + checkpointed}, "
+                  f"the next run resumes there")
+        return
+
+    commit_run(ctx)
+    # a shadow load keeps its feeds pending until the staging tables go live
+    if ctx.staging is None:
+        ctx.feed_cache.commit(source_name)
+    ctx.committed += 1
+    elapsed = time.perf_counter() - start
+    ctx.metrics.set(source_name, "write_seconds", elapsed)
+    rate = count / elapsed if elapsed > 0 else 0.0
+    if ctx.incremental:
+        stats = loader.stats
+        print(f"  ✔ {source_name}: {stats['added']} added, {stats['modified']} modified, "
+              f"{stats['removed']} removed, {stats['unchanged']} unchanged in {elapsed:.1f}s\n")
+    else:
+        resumed = f", resumed after record {offset}" if offset else ""
+        print(f"  ✔ Inserted {count} records for {source_name} in {elapsed:.1f}s "
+              f"({rate:,.0f} rows/sec{resumed})\n")
+
+
+def publish_staging(ctx):
+    """
+    Ends a shadow load: rebuilds the staging indexes, checks the row counts and
+    swaps the staging tables in with one RENAME TABLE. If any source did not
+    load or a check fails, the staging tables are dropped and the live tables
+    are left as they were.
+    """
+    try:
+        if ctx.incomplete:
+            raise ValueError(f"{', '.join(ctx.incomplete)} did not load")
+        build_indexes(ctx.cursor, ctx.staging)
+        counts = validate_staging(ctx.cursor, ctx.staging, ctx.index)
+        swap_staging(ctx.cursor, ctx.staging)
+    except Exception as e:
+        print(f"  [ERROR] Shadow load not published, live tables unchanged: {e}")
+        discard_staging(ctx.cursor)
+        for source_name in list(ctx.feed_cache.pending):
+            ctx.feed_cache.discard(source_name)
+        ctx.committed = 0
+        return False
+
+    for source_name in list(ctx.feed_cache.pending):
+        ctx.feed_cache.commit(source_name)
+    print(f"Swapped in staging tables: {counts['sanctioned_entities']} entities, "
+          f"{counts['aliases']} aliases, {counts['nationalities']} nationalities, "
+          f"{counts['sanction_types']} sanction types")
+    return True
+
+
+def main(batch_size=DEFAULT_BATCH_SIZE, force=False, incremental=False, shadow=False,
+         commit_every=DEFAULT_COMMIT_EVERY, metrics_path=METRICS_PATH, prometheus_path=None,
+         profile=(), trace_memory=(), predict=True, model_path=MODEL_PATH, resolve=True):
+    """
+    Runs every source through a fetch → parse → write pipeline: fetches run
+    concurrently in a thread pool, each source is parsed in its own worker
+    process, and a single writer drains parsed chunks into MySQL through a
+    bounded queue per source. URL feeds that have not changed since the last
+    successful load are skipped unless `force` is set. With `incremental`,
+    each feed is diffed against its last snapshot and only the changes are
+    applied (see db.delta). With `shadow`, the full list is loaded into
+    staging tables and swapped in atomically at the end (see db.shadow).
+    Otherwise sources are committed every `commit_every` records with a
+    checkpoint, and an interrupted source resumes from it on the next run.
+
+    Per-source stage timings and counters are appended to `metrics_path` as
+    JSON lines (and written to `prometheus_path` in Prometheus text format if
+    given). Sources named in `profile` / `trace_memory` have their parse and
+    write stages run under cProfile / tracemalloc (see utils.metrics).
+
+    With `predict`, missing designations in any source are filled in by the
+    model at `model_path` when it exists (see prediction.designation).
+    With `resolve`, listings of the same entity across sources are then
+    re-clustered into canonical_entity (see db.resolution).
+    """
+    run_start = time.perf_counter()
+    metrics = Metrics()
     # Load source list
     with open("config/sources.json") as f:
         sources = json.load(f)
@@ -39,66 +364,176 @@ def main():
     conn = connect_db()
     cursor = conn.cursor()
     print("Connected to database successfully")
+    ensure_schema(cursor)
+    conn.commit()
 
-    # Process each source
-    for src in sources:
-        source_name = src["sanction_type"]
-        parser_key = src.get("parser")
-        parser_func = PARSERS.get(parser_key)
+    staging = None
+    if shadow:
+        # the staging tables start empty, so every feed is reloaded
+        staging = prepare_staging(cursor)
+        index = DedupIndex()
+        print("Loading into staging tables")
+    else:
+        # Existence checks for the whole run are answered from this in-memory index
+        index = DedupIndex.preload(conn)
+        print(f"Loaded dedup index with {len(index.entities)} entities")
+    if incremental or shadow:
+        # both need a source's whole feed in one transaction
+        commit_every = 0
+    # Nationality / sanction type dictionaries, resolved once per distinct string
+    lookups = LookupCache.preload(conn)
+    checkpoints = load_checkpoints(cursor) if commit_every else {}
 
-        print(f"→ Processing {source_name} with parser '{parser_key}'")
+    predictor = None
+    if predict and os.path.exists(model_path):
+        try:
+            predictor = DesignationPredictor.load(model_path).preload(conn)
+            print(f"Loaded designation model {predictor.version} "
+                  f"with {len(predictor.cache)} cached predictions")
+        except Exception as e:
+            print(f"  [ERROR] Loading designation model failed, missing designations stay empty: {e}")
+    elif predict:
+        print(f"  [INFO] No designation model at {model_path}, missing designations stay empty")
 
-        # Handle UK directly from CSV, bypass parser since there missing value present in column desingation so we predicted and used that value. 
-        if source_name.lower() == "uk":
-            try:
-                csv_path = r'C:\Users\acer\OneDrive\Desktop\New folder\New folder (3)\designation_predic.csv'
-                records = read_csv_data(csv_path)
-                print(f"  [DEBUG] Loaded {len(records)} records from CSV for UK")
-            except Exception as e:
-                print(f"  [ERROR] Failed to load CSV for {source_name}: {e}")
-                continue
-        else:
-            if not parser_func:
-                print(f"  [ERROR] No parser available for '{parser_key}', skipping {source_name}")
-                continue
+    # Sources are handed to the writer as soon as their parse job is started
+    ready = Queue()
+    session = make_session(pool_size=len(sources))
+    feed_cache = FeedCache()
+    ctx = LoadContext(conn, index, lookups, feed_cache, batch_size, incremental, staging, commit_every,
+                      metrics, predictor)
+
+    with Manager() as manager, \
+            ThreadPoolExecutor(max_workers=len(sources)) as fetchers, \
+            ProcessPoolExecutor(max_workers=len(sources)) as parsers:
 
-            # Fetch XML content (URL or local file)
+        def start_parse(src, content):
+            source_name = src["sanction_type"]
+            feed, skip = None, 0
+            if commit_every:
+                try:
+                    feed = feed_hash(content)
+                except Exception as e:
+                    print(f"  [ERROR] Reading feed failed for {source_name}: {e}")
+                    ready.put((source_name, None, None, None, 0))
+                    return
+                skip = resume_offset(checkpoints, source_name, feed)
+                if skip:
+                    print(f"  [INFO] Resuming {source_name} after record {skip}")
+            queue = manager.Queue(QUEUE_SIZE)
+            job = parsers.submit(parse_source, src.get("parser"), source_name, content, queue, batch_size, skip,
+                                 source_name in profile, source_name in trace_memory)
+            ready.put((source_name, queue, job, feed, skip))
+
+        def on_fetched(src, future):
+            source_name = src["sanction_type"]
             try:
-                if "url" in src:
-                    resp = requests.get(src["url"])
-                    content = resp.content
-                    if is_html(content):
-                        print(f"  [WARN] {source_name} URL returned HTML, skipping.")
-                        continue
-                else:
-                    with open(src["path"], "rb") as f:
-                        content = f.read()
+                content = future.result()
             except Exception as e:
                 print(f"  [ERROR] Fetch failed for {source_name}: {e}")
-                continue
+                ready.put((source_name, None, None, None, 0))
+                return
+            if content is None:
+                ready.put((source_name, None, None, None, 0))
+                return
+            start_parse(src, content)
 
-            # Parse XML content
-            try:
-                records = parser_func(content, source_name)
-                print(f"  [DEBUG] Parsed {len(records)} records from XML for {source_name}")
-            except Exception as e:
-                print(f"  [ERROR] Parsing failed for {source_name}: {e}")
+        for src in sources:
+            source_name = src["sanction_type"]
+            parser_key = src.get("parser")
+            print(f"→ Processing {source_name} with parser '{parser_key}'")
+
+            if parser_key not in PARSERS:
+                print(f"  [ERROR] No parser available for '{parser_key}', skipping {source_name}")
+                ready.put((source_name, None, None, None, 0))
                 continue
 
-        # Insert records into DB
-        for rec in records:
-            eid = insert_entity(cursor, rec)
-            insert_aliases(cursor, eid, rec.get("Alias"))
-            insert_nationalities(cursor, eid, rec.get("Nationality"))
-            insert_sanction_types(cursor, eid, rec.get("Sanction Type"))
+            future = fetchers.submit(fetch_source, src, session, feed_cache, force, metrics, staging is not None)
+            future.add_done_callback(lambda f, src=src: on_fetched(src, f))
+
+        # Single writer: drain sources in the order their parse jobs start
+        for _ in sources:
+            source_name, queue, job, feed, skip = ready.get()
+            if queue is not None:
+                with profiled(f"{source_name}.write", source_name in profile,
+                              source_name in trace_memory) as prof:
+                    write_source(ctx, source_name, queue, job, feed, skip)
+                if "peak_bytes" in prof:
+                    metrics.set(source_name, "write_peak_bytes", prof["peak_bytes"])
+            else:
+                ctx.incomplete.append(source_name)
+
+    if ctx.staging is not None:
+        publish_staging(ctx)
 
-        conn.commit()
-        print(f"  ✔ Inserted {len(records)} records for {source_name}\n")
+    if ctx.committed and resolve:
+        try:
+            with metrics.timer("all", "resolution"):
+                total, merged = resolve_entities(conn, metrics=metrics)
+            metrics.set("all", "clusters_merged", merged)
+            print(f"Resolved {total} entities, {merged} clusters span more than one listing")
+        except Exception as e:
+            print(f"  [ERROR] Entity resolution failed, canonical_entity unchanged: {e}")
+
+    # Publish a fresh screening index artifact for the screening workers
+    if ctx.committed:
+        try:
+            # readers (db.read_api) drop their cached results when this moves
+            bump_version(ctx.cursor)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"  [ERROR] Updating list version failed: {e}")
+        try:
+            path = publish_snapshot(conn)
+            print(f"Screening index written to {path}")
+        except Exception as e:
+            print(f"  [ERROR] Writing screening index failed: {e}")
+
+    metrics.set("all", "run_seconds", time.perf_counter() - run_start)
+    metrics.set("all", "sources_committed", ctx.committed)
+    try:
+        print(f"Metrics appended to {metrics.write_json_lines(metrics_path)}")
+        if prometheus_path:
+            metrics.write_prometheus(prometheus_path)
+    except OSError as e:
+        print(f"  [ERROR] Writing metrics failed: {e}")
 
     # Clean up
+    session.close()
+    ctx.cursor.close()
     cursor.close()
     conn.close()
     print("All sources processed.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Load the configured sanctions sources into MySQL.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="records per multi-row insert")
+    parser.add_argument("--force", action="store_true",
+                        help="re-download URL feeds even if they are unchanged")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--incremental", action="store_true",
+                      help="apply only the changes since each source's last snapshot")
+    mode.add_argument("--shadow", action="store_true",
+                      help="load into staging tables and swap them in atomically when complete")
+    parser.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY,
+                        help="records per transaction, with a resumable checkpoint (0: one per source)")
+    parser.add_argument("--metrics", default=METRICS_PATH,
+                        help="JSON lines file the run's per-source metrics are appended to")
+    parser.add_argument("--prometheus", metavar="PATH",
+                        help="also write the metrics in Prometheus text format (e.g. for node_exporter)")
+    parser.add_argument("--profile", action="append", default=[], metavar="SOURCE",
+                        help="run SOURCE's parse and write stages under cProfile (repeatable)")
+    parser.add_argument("--tracemalloc", action="append", default=[], metavar="SOURCE",
+                        help="trace SOURCE's memory allocations with tracemalloc (repeatable)")
+    parser.add_argument("--no-predict", action="store_true",
+                        help="load missing designations as empty instead of predicting them")
+    parser.add_argument("--model", default=MODEL_PATH,
+                        help="designation model artifact (see prediction.designation)")
+    parser.add_argument("--no-resolve", action="store_true",
+                        help="skip re-clustering entities across sources after the load")
+    args = parser.parse_args()
+    main(batch_size=args.batch_size, force=args.force, incremental=args.incremental, shadow=args.shadow,
+         commit_every=args.commit_every, metrics_path=args.metrics, prometheus_path=args.prometheus,
+         profile=args.profile, trace_memory=args.tracemalloc, predict=not args.no_predict,
+         model_path=args.model, resolve=not args.no_resolve)
@@ -0,0 +1,216 @@
+"""
+Designation prediction for records whose feed leaves it empty.
+
+The model is the one from app.ipynb: TF-IDF over "<name> <nationalities>"
+and a logistic regression trained on the records that do carry a
+designation. It is trained offline into a versioned joblib artifact, loaded
+once per ETL run, and applied to each parsed chunk with one vectorized
+predict call. Predictions are cached by record fingerprint and model
+version, so an unchanged record is only ever scored once per model.
+
+    python -m prediction.designation train uk_sanctions_data.csv
+"""
+import argparse
+import hashlib
+import os
+from datetime import datetime, timezone
+
+import joblib
+
+from db.delta import record_fingerprint
+from utils.csv_parsers import parse_csv
+
+MODEL_PATH = os.getenv("DESIGNATION_MODEL_PATH", "artifacts/models/designation.joblib")
+# bumped when the artifact layout changes
+ARTIFACT_FORMAT = 1
+# TfidfVectorizer / LogisticRegression settings from app.ipynb
+MAX_FEATURES = 1000
+MAX_ITER = 1000
+
+
+def input_text(record):
+    """Model input for a record: its name and nationalities, 'Unknown' where missing."""
+    return f"{record.name or 'Unknown'} {', '.join(record.nationalities) or 'Unknown'}"
+
+
+def train(records, validation_split=0.2, random_state=42):
+    """
+    Fit the vectorizer and classifier on the records that have a designation
+    and return the artifact dict. With `validation_split`, accuracy on a
+    held-out split is measured first and stored in the artifact; the saved
+    model is always fitted on every labelled record.
+    """
+    from sklearn import __version__ as sklearn_version
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import accuracy_score
+    from sklearn.model_selection import train_test_split
+
+    texts, labels = [], []
+    for record in records:
+        if record.designation:
+            texts.append(input_text(record))
+            labels.append(record.designation)
+    if not texts:
+        raise ValueError("no records with a designation to train on")
+
+    def fit(x, y):
+        vectorizer = TfidfVectorizer(max_features=MAX_FEATURES)
+        classifier = LogisticRegression(max_iter=MAX_ITER)
+        classifier.fit(vectorizer.fit_transform(x), y)
+        return vectorizer, classifier
+
+    accuracy = None
+    if validation_split:
+        x_train, x_val, y_train, y_val = train_test_split(
+            texts, labels, test_size=validation_split, random_state=random_state)
+        vectorizer, classifier = fit(x_train, y_train)
+        accuracy = accuracy_score(y_val, classifier.predict(vectorizer.transform(x_val)))
+
+    vectorizer, classifier = fit(texts, labels)
+
+    # same training data and settings -> same version, so the cache survives a retrain
+    digest = hashlib.sha1(f"{ARTIFACT_FORMAT}:{MAX_FEATURES}:{MAX_ITER}:{sklearn_version}".encode())
+    for text, label in zip(texts, labels):
+        digest.update(f"\x1e{text}\x1f{label}".encode('utf-8'))
+
+    return {
+        "format": ARTIFACT_FORMAT,
+        "version": digest.hexdigest()[:16],
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "training_rows": len(texts),
+        "validation_accuracy": accuracy,
+        "sklearn_version": sklearn_version,
+        "vectorizer": vectorizer,
+        "classifier": classifier,
+    }
+
+
+def save_artifact(artifact, path=MODEL_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    joblib.dump(artifact, tmp_path)
+    # a running ETL must never load a half-written model
+    os.replace(tmp_path, path)
+    return path
+
+
+class DesignationPredictor:
+    """
+    Fills in missing designations chunk by chunk for the writer. Cached
+    predictions for the loaded model version are read once per run; new ones
+    are written in the writer's transaction and journalled, so a rolled-back
+    source does not leave cache entries behind.
+    """
+
+    def __init__(self, artifact):
+        if artifact.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"unsupported designation model format {artifact.get('format')}")
+        self.version = artifact["version"]
+        self.vectorizer = artifact["vectorizer"]
+        self.classifier = artifact["classifier"]
+        self.cache = {}
+        self._journal = []
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        artifact = joblib.load(path)
+        from sklearn import __version__ as sklearn_version
+        if artifact.get("sklearn_version") != sklearn_version:
+            print(f"  [WARN] Designation model was trained with scikit-learn "
+                  f"{artifact.get('sklearn_version')}, running {sklearn_version}")
+        return cls(artifact)
+
+    def preload(self, conn):
+        """Read the cached predictions of this model version."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT fingerprint, designation FROM designation_predictions WHERE model_version = %s",
+                (self.version,)
+            )
+            for row in cursor.fetchall():
+                self.cache[row['fingerprint']] = row['designation']
+        finally:
+            cursor.close()
+        return self
+
+    def fill(self, cursor, records):
+        """
+        Return `records` with missing designations predicted, plus the number
+        of records scored by the model and the number answered from the cache.
+        """
+        missing = [i for i, record in enumerate(records) if not record.designation and record.name]
+        if not missing:
+            return records, 0, 0
+
+        records = list(records)
+        to_score = []
+        hits = 0
+        for i in missing:
+            fingerprint = record_fingerprint(records[i])
+            designation = self.cache.get(fingerprint)
+            if designation is None:
+                to_score.append((i, fingerprint))
+            else:
+                records[i] = records[i]._replace(designation=designation)
+                hits += 1
+
+        if to_score:
+            texts = [input_text(records[i]) for i, _ in to_score]
+            predicted = self.classifier.predict(self.vectorizer.transform(texts))
+            now = datetime.now()
+            rows = []
+            for (i, fingerprint), designation in zip(to_score, predicted):
+                designation = str(designation)
+                records[i] = records[i]._replace(designation=designation)
+                # a record listed twice in one chunk is scored twice but cached once
+                if fingerprint not in self.cache:
+                    self.cache[fingerprint] = designation
+                    self._journal.append(fingerprint)
+                    rows.append((fingerprint, self.version, designation, now))
+            cursor.executemany("""
+                INSERT IGNORE INTO designation_predictions
+                    (fingerprint, model_version, designation, predicted_at)
+                VALUES (%s, %s, %s, %s)
+            """, rows)
+        return records, len(to_score), hits
+
+    def commit(self):
+        self._journal = []
+
+    def rollback(self):
+        for fingerprint in self._journal:
+            self.cache.pop(fingerprint, None)
+        self._journal = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or inspect the designation prediction model.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_cmd = commands.add_parser("train", help="train on a CSV export and save the model artifact")
+    train_cmd.add_argument("csv", help="CSV in the export layout, e.g. uk_sanctions_data.csv")
+    train_cmd.add_argument("--output", default=MODEL_PATH)
+    train_cmd.add_argument("--validation-split", type=float, default=0.2,
+                           help="share of labelled rows held out to report accuracy (0 to skip)")
+    info_cmd = commands.add_parser("info", help="show the metadata of a saved model")
+    info_cmd.add_argument("path", nargs="?", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        with open(args.csv, "rb") as f:
+            artifact = train(parse_csv(f, None), args.validation_split)
+        path = save_artifact(artifact, args.output)
+        accuracy = artifact["validation_accuracy"]
+        print(f"Trained designation model {artifact['version']} on {artifact['training_rows']} records"
+              + (f", validation accuracy {accuracy:.1%}" if accuracy is not None else ""))
+        print(f"Model written to {path}")
+    else:
+        artifact = joblib.load(args.path)
+        for name in ("version", "trained_at", "training_rows", "validation_accuracy", "sklearn_version"):
+            print(f"{name}: {artifact.get(name)}")
+        print(f"classes: {len(artifact['classifier'].classes_)}")
+
+
+if __name__ == "__main__":
+    main()
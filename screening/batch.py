@@ -0,0 +1,170 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from screening.index import iter_list_names
+from screening.snapshot import SNAPSHOT_PATH, SnapshotIndex
+from utils.normalize import normalize_name
+
+DEFAULT_CHUNK_SIZE = 1000
+
+MATCH_COLUMNS = ['row', 'input_name', 'rank', 'score', 'entity_id', 'name', 'matched_name', 'kind']
+
+
+class BatchScreener:
+    """
+    Vectorized screening for bulk name files.
+
+    The sanctions names and aliases are encoded once as a sparse TF-IDF matrix
+    of character n-grams (the same TfidfVectorizer approach the notebook uses
+    for designation prediction). Each chunk of input names is encoded the same
+    way and scored against the whole list with one sparse matrix product, so
+    memory is bounded by the chunk size rather than the input size.
+    """
+
+    def __init__(self, rows, ngram_range=(3, 3)):
+        # generation of the snapshot this was built from, if any
+        self.generation = None
+        self.entity_ids = []
+        self.names = []
+        self.kinds = []
+        self.primary_names = {}
+        normalized = []
+        for entity_id, name, kind in rows:
+            norm = normalize_name(name)
+            if not norm:
+                continue
+            self.entity_ids.append(entity_id)
+            self.names.append(name)
+            self.kinds.append(kind)
+            normalized.append(norm)
+            if kind == 'name':
+                self.primary_names.setdefault(entity_id, name)
+        self.entity_ids = np.asarray(self.entity_ids, dtype=np.int64)
+
+        self.vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=ngram_range,
+                                          dtype=np.float32, sublinear_tf=True)
+        # rows are L2-normalized, so a dot product is the cosine similarity
+        self.list_matrix_t = self.vectorizer.fit_transform(normalized).T.tocsr()
+
+    @classmethod
+    def from_db(cls, conn, **kwargs):
+        return cls(iter_list_names(conn), **kwargs)
+
+    @classmethod
+    def from_snapshot(cls, path=SNAPSHOT_PATH, **kwargs):
+        """Build from the screening index artifact the ETL publishes (see screening.snapshot)."""
+        with SnapshotIndex(path) as index:
+            rows = ((index.entity_id(i), index.name(i), index.kind(i)) for i in range(len(index)))
+            screener = cls(rows, **kwargs)
+            screener.generation = index.generation
+        return screener
+
+    def screen_chunk(self, names, top_k=5, threshold=0.8):
+        """
+        Score one chunk of names. Returns, per input name, up to `top_k`
+        (score, entity_id, name, matched_name, kind) tuples, best entity first.
+        """
+        normalized = [normalize_name(n) for n in names]
+        scores = (self.vectorizer.transform(normalized) @ self.list_matrix_t).tocsr()
+
+        results = []
+        for i in range(scores.shape[0]):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            data = scores.data[start:end]
+            entries = scores.indices[start:end]
+            keep = data >= threshold
+            data, entries = data[keep], entries[keep]
+            # an entity can hit through its name and several aliases; over-fetch before dedup
+            wanted = min(len(data), top_k * 4)
+            if wanted < len(data):
+                part = np.argpartition(-data, wanted - 1)[:wanted]
+                data, entries = data[part], entries[part]
+            order = np.argsort(-data, kind='stable')
+
+            matches = []
+            seen = set()
+            for j in order:
+                entry = entries[j]
+                entity_id = int(self.entity_ids[entry])
+                if entity_id in seen:
+                    continue
+                seen.add(entity_id)
+                matches.append((
+                    round(float(data[j]), 4),
+                    entity_id,
+                    self.primary_names.get(entity_id, self.names[entry]),
+                    self.names[entry],
+                    self.kinds[entry],
+                ))
+                if len(matches) == top_k:
+                    break
+            results.append(matches)
+        return results
+
+
+def read_names(path, column, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of names from a CSV or Parquet file, `chunk_size` at a time."""
+    if os.path.splitext(path)[1].lower() in ('.parquet', '.pq'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=[column]):
+            yield ['' if n is None else str(n) for n in batch.column(0).to_pylist()]
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            chunk = []
+            for row in reader:
+                chunk.append(row.get(column) or '')
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+
+def screen_file(screener, in_path, out_path, column='name', top_k=5, threshold=0.8,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+    """Screen every name in `in_path` and write one CSV row per match to `out_path`."""
+    screened = 0
+    hits = 0
+    with open(out_path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        writer.writerow(MATCH_COLUMNS)
+        for names in read_names(in_path, column, chunk_size):
+            for offset, matches in enumerate(screener.screen_chunk(names, top_k, threshold)):
+                for rank, (score, entity_id, name, matched_name, kind) in enumerate(matches, 1):
+                    writer.writerow([screened + offset, names[offset], rank, score,
+                                     entity_id, name, matched_name, kind])
+                    hits += 1
+            screened += len(names)
+    return screened, hits
+
+
+if __name__ == "__main__":
+    import time
+
+    from db.db_utils import connect_db
+
+    parser = argparse.ArgumentParser(description="Screen a CSV/Parquet file of names against the sanctions list.")
+    parser.add_argument("input", help="CSV or Parquet file of names to screen")
+    parser.add_argument("--column", default="name", help="column holding the names")
+    parser.add_argument("--out", default="matches.csv", help="match file to write")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="input names scored per sparse matrix product")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    screener = BatchScreener.from_db(conn)
+    conn.close()
+
+    start = time.perf_counter()
+    screened, hits = screen_file(screener, args.input, args.out, args.column,
+                                 args.top_k, args.threshold, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"Screened {screened} names in {elapsed:.1f}s, wrote {hits} matches to {args.out}")
@@ -0,0 +1,210 @@
+import argparse
+import heapq
+from array import array
+from collections import Counter, namedtuple
+from difflib import SequenceMatcher
+
+import pymysql
+
+from utils.normalize import normalize_name, phonetic_keys
+
+Match = namedtuple('Match', ['entity_id', 'name', 'matched_name', 'kind', 'score'])
+
+NGRAM = 3
+
+# Grams that occur in more than this share of all names are too common to
+# narrow anything down; they are skipped during candidate generation.
+MAX_POSTING_SHARE = 0.05
+
+# At most this many of the best-overlapping names are scored exactly.
+MAX_CANDIDATES = 200
+
+# Share of the gap to 1.0 that fully agreeing Soundex codes close. Kept small
+# so names that only sound alike ('peter' / 'potter') stay under the default
+# threshold, while spellings that are also close lift over it.
+PHONETIC_WEIGHT = 0.3
+
+_LOAD_QUERY = """
+    SELECT entity_id, name, 'name' FROM sanctioned_entities WHERE name IS NOT NULL
+    UNION ALL
+    SELECT entity_id, alias_name, 'alias' FROM aliases WHERE alias_name IS NOT NULL
+"""
+
+
+def ngrams(normalized, n=NGRAM):
+    """Character n-grams of a normalized name, padded so short tokens still produce grams."""
+    padded = f' {normalized} '
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def iter_list_names(conn):
+    """Stream (entity_id, name, kind) for every entity name and alias in the database."""
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(_LOAD_QUERY)
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def blocking_keys(normalized):
+    keys = ngrams(normalized)
+    keys.update('#' + key for key in phonetic_keys(normalized))
+    return keys
+
+
+def name_similarity(normalized, candidate):
+    """
+    Similarity of two normalized names in [0, 1]: the sequence ratio, moved
+    towards 1 by the share of Soundex codes the tokens have in common,
+    weighted by PHONETIC_WEIGHT.
+    """
+    ratio = SequenceMatcher(None, normalized, candidate).ratio()
+    query_keys = phonetic_keys(normalized)
+    candidate_keys = phonetic_keys(candidate)
+    if query_keys and candidate_keys:
+        overlap = len(query_keys & candidate_keys) / len(query_keys | candidate_keys)
+        ratio += (1 - ratio) * PHONETIC_WEIGHT * overlap
+    return ratio
+
+
+class ScreeningIndex:
+    """
+    In-memory screening index over entity names and aliases.
+
+    Every name is normalized (see utils.normalize.normalize_name) and posted
+    under its character trigrams and the Soundex code of each token. A query
+    only touches the posting lists of its own keys, so candidate generation
+    costs the size of those lists rather than the size of the sanctions list.
+    The best-overlapping candidates are then scored with a sequence ratio,
+    lifted when the phonetic codes agree (transliteration variants).
+    """
+
+    def __init__(self):
+        self.entity_ids = array('i')
+        self.names = []
+        self.normalized = []
+        self.kinds = []
+        self.primary_names = {}
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    # Storage accessors; SnapshotIndex serves the same lookups from a mapped file.
+
+    def posting(self, key):
+        return self.postings.get(key)
+
+    def entity_id(self, entry):
+        return self.entity_ids[entry]
+
+    def name(self, entry):
+        return self.names[entry]
+
+    def normalized_name(self, entry):
+        return self.normalized[entry]
+
+    def kind(self, entry):
+        return self.kinds[entry]
+
+    def primary_name(self, entry):
+        return self.primary_names.get(self.entity_ids[entry], self.names[entry])
+
+    def add(self, entity_id, name, kind='name'):
+        normalized = normalize_name(name)
+        if not normalized:
+            return
+        entry = len(self.names)
+        self.entity_ids.append(entity_id)
+        self.names.append(name)
+        self.normalized.append(normalized)
+        self.kinds.append(kind)
+        if kind == 'name':
+            self.primary_names.setdefault(entity_id, name)
+        for key in blocking_keys(normalized):
+            posting = self.postings.get(key)
+            if posting is None:
+                posting = self.postings[key] = array('I')
+            posting.append(entry)
+
+    @classmethod
+    def build(cls, rows):
+        """Build from an iterable of (entity_id, name, kind) rows."""
+        index = cls()
+        for entity_id, name, kind in rows:
+            index.add(entity_id, name, kind)
+        return index
+
+    @classmethod
+    def from_db(cls, conn):
+        """Build from sanctioned_entities and aliases with one unbuffered query."""
+        return cls.build(iter_list_names(conn))
+
+    def candidates(self, normalized, limit=MAX_CANDIDATES):
+        """Entry numbers sharing the most blocking keys with `normalized`."""
+        max_posting = max(1, int(len(self) * MAX_POSTING_SHARE))
+        postings = [p for p in map(self.posting, blocking_keys(normalized)) if p is not None]
+        selective = [p for p in postings if len(p) <= max_posting]
+        counts = Counter()
+        for posting in selective or postings:
+            counts.update(posting)
+        return [entry for entry, _ in counts.most_common(limit)]
+
+    def score(self, normalized, entry):
+        return name_similarity(normalized, self.normalized_name(entry))
+
+    def screen(self, name, threshold=0.85, limit=10):
+        """
+        Ranked matches for `name` with a score of at least `threshold`, best
+        match per entity, highest score first.
+        """
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+        best = {}
+        for entry in self.candidates(normalized):
+            score = self.score(normalized, entry)
+            if score < threshold:
+                continue
+            entity_id = self.entity_id(entry)
+            if score > best.get(entity_id, (0.0, None))[0]:
+                best[entity_id] = (score, entry)
+
+        top = heapq.nlargest(limit, best.items(), key=lambda item: item[1][0])
+        return [
+            Match(
+                entity_id,
+                self.primary_name(entry),
+                self.name(entry),
+                self.kind(entry),
+                round(score, 4),
+            )
+            for entity_id, (score, entry) in top
+        ]
+
+
+if __name__ == "__main__":
+    from db.db_utils import connect_db
+
+    parser = argparse.ArgumentParser(description="Screen names against the loaded sanctions list.")
+    parser.add_argument("names", nargs="+")
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--snapshot", help="screen against an index artifact written by the ETL instead of MySQL")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        from screening.snapshot import SnapshotIndex
+
+        index = SnapshotIndex(args.snapshot)
+    else:
+        conn = connect_db()
+        index = ScreeningIndex.from_db(conn)
+        conn.close()
+    for query in args.names:
+        print(f"{query}:")
+        for match in index.screen(query, args.threshold, args.limit):
+            print(f"  {match.score:.3f}  [{match.entity_id}] {match.name}  (via {match.kind} '{match.matched_name}')")
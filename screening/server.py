@@ -0,0 +1,379 @@
+"""
+Real-time screening server for synchronous callers such as the payment flow.
+
+    python -m screening.server --port 8080
+
+    GET  /screen?name=Mohammad+Taher+Anwari&threshold=0.8&limit=5
+    POST /screen   {"name": "...", "threshold": 0.8, "limit": 5}
+    GET  /stats    request counts, batch sizes, queue depth, p50/p99 latency
+    GET  /health
+
+It serves the screening index artifact the ETL publishes (see
+screening.snapshot), loaded into a BatchScreener. Concurrent requests are
+queued and gathered into micro-batches of up to MAX_BATCH names, waiting at
+most MAX_WAIT_MS for a batch to fill, and every batch is scored with one
+sparse matrix product off the event loop. When MAX_PENDING requests are
+already waiting, new ones get 503 with Retry-After instead of queueing
+without bound.
+
+The artifact is checked every RELOAD_SECONDS. When a load publishes a new
+one, the next list is built in the background and swapped in between
+batches; batches already running finish on the list they started with.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from screening.batch import BatchScreener
+from screening.snapshot import SNAPSHOT_PATH
+
+HOST = os.getenv("SCREENING_HOST", "127.0.0.1")
+PORT = int(os.getenv("SCREENING_PORT", 8080))
+MAX_BATCH = int(os.getenv("SCREENING_MAX_BATCH", 64))
+MAX_WAIT_MS = float(os.getenv("SCREENING_MAX_WAIT_MS", 2))
+MAX_PENDING = int(os.getenv("SCREENING_MAX_PENDING", 2048))
+# batches scored at the same time; the sparse products run outside the GIL
+WORKERS = int(os.getenv("SCREENING_WORKERS", 2))
+RELOAD_SECONDS = float(os.getenv("SCREENING_RELOAD_SECONDS", 2))
+STATS_SECONDS = float(os.getenv("SCREENING_STATS_SECONDS", 30))
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 50
+# latencies kept for the percentiles
+LATENCY_WINDOW = 10000
+MAX_BODY = 64 * 1024
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class BadRequest(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def percentile(sorted_values, share):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+def snapshot_signature(path):
+    """Changes whenever the ETL replaces the artifact (it is swapped in with os.replace)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def score_batch(screener, batch):
+    """
+    Score a batch of (name, threshold, limit, ...) requests with one
+    screen_chunk call, at the lowest threshold and largest limit asked for,
+    then cut each result down to what its request asked for.
+    """
+    threshold = min(request[1] for request in batch)
+    top_k = max(request[2] for request in batch)
+    results = screener.screen_chunk([request[0] for request in batch], top_k, threshold)
+    # matches come best first, so the ones above a higher threshold are a prefix
+    return [
+        [match for match in matches if match[0] >= request[1]][:request[2]]
+        for matches, request in zip(results, batch)
+    ]
+
+
+class ScreeningServer:
+    def __init__(self, snapshot_path=SNAPSHOT_PATH, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS,
+                 max_pending=MAX_PENDING, workers=WORKERS, reload_seconds=RELOAD_SECONDS):
+        self.snapshot_path = snapshot_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.workers = workers
+        self.reload_seconds = reload_seconds
+        self.screener = None
+        self.signature = None
+        self.queue = None
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='screen')
+        self.tasks = []
+        self.in_flight = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {'served': 0, 'rejected': 0, 'failed': 0, 'batches': 0, 'reloads': 0}
+        self.started = time.monotonic()
+
+    # -- list loading
+
+    def load(self):
+        """Build the screener from the current artifact (blocking) and make it live."""
+        signature = snapshot_signature(self.snapshot_path)
+        start = time.perf_counter()
+        screener = BatchScreener.from_snapshot(self.snapshot_path)
+        # one reference swap: batches hold the screener they started with
+        self.screener = screener
+        self.signature = signature
+        print(f"[INFO] Loaded {len(screener.names)} names (generation {screener.generation}) "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    async def watch_snapshot(self, interval=RELOAD_SECONDS):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            signature = snapshot_signature(self.snapshot_path)
+            if signature is None or signature == self.signature:
+                continue
+            try:
+                # built on the default executor so scoring keeps its workers
+                await loop.run_in_executor(None, self.load)
+                self.counts['reloads'] += 1
+            except Exception as e:
+                # keep serving the previous list; retried on the next change
+                self.signature = signature
+                print(f"[ERROR] Reloading {self.snapshot_path} failed: {e}")
+
+    # -- micro-batching
+
+    def submit(self, name, threshold, limit):
+        """Queue one request; returns a future for its matches, or None when overloaded."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((name, threshold, limit, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.counts['rejected'] += 1
+            return None
+        return future
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch:
+            # take whatever is already waiting before sleeping for more
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            timeout = deadline - asyncio.get_running_loop().time()
+            if len(batch) >= self.max_batch or timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # callers that went away do not need scoring
+        return [request for request in batch if not request[3].done()]
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            screener = self.screener
+            self.in_flight += 1
+            try:
+                results = await loop.run_in_executor(self.executor, score_batch, screener, batch)
+            except Exception as e:
+                print(f"[ERROR] Scoring a batch of {len(batch)} failed: {e}")
+                self.counts['failed'] += len(batch)
+                for request in batch:
+                    if not request[3].done():
+                        request[3].set_exception(e)
+                continue
+            finally:
+                self.in_flight -= 1
+            self.counts['batches'] += 1
+            now = time.perf_counter()
+            for request, matches in zip(batch, results):
+                if not request[3].done():
+                    request[3].set_result((matches, screener.generation))
+                    self.latencies.append(now - request[4])
+                    self.counts['served'] += 1
+
+    # -- reporting
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        p50, p99 = percentile(latencies, 0.50), percentile(latencies, 0.99)
+        return {
+            **self.counts,
+            'mean_batch': round(self.counts['served'] / self.counts['batches'], 2) if self.counts['batches'] else 0,
+            'pending': self.queue.qsize() if self.queue else 0,
+            'p50_ms': round(p50 * 1000, 3) if p50 is not None else None,
+            'p99_ms': round(p99 * 1000, 3) if p99 is not None else None,
+            'generation': self.screener.generation if self.screener else None,
+            'names': len(self.screener.names) if self.screener else 0,
+            'uptime_seconds': round(time.monotonic() - self.started, 1),
+        }
+
+    async def report(self, interval=STATS_SECONDS):
+        served = 0
+        while True:
+            await asyncio.sleep(interval)
+            stats = self.stats()
+            print(f"[INFO] {(stats['served'] - served) / interval:.0f} req/s, p50 {stats['p50_ms']} ms, "
+                  f"p99 {stats['p99_ms']} ms, mean batch {stats['mean_batch']}, "
+                  f"pending {stats['pending']}, rejected {stats['rejected']}")
+            served = stats['served']
+
+    # -- HTTP
+
+    async def _read_request(self, reader):
+        """(method, target, headers, body), or None when the client closed the connection."""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise BadRequest("malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise BadRequest("invalid Content-Length")
+        if length < 0:
+            raise BadRequest("invalid Content-Length")
+        if length > MAX_BODY:
+            raise BadRequest(f"body over {MAX_BODY} bytes", 413)
+        body = await reader.readexactly(length) if length else b''
+        return method, target, headers, body
+
+    def _screen_args(self, query, body):
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        if body:
+            try:
+                params.update(json.loads(body))
+            except (ValueError, TypeError):
+                raise BadRequest("body must be a JSON object")
+        name = params.get('name')
+        if not isinstance(name, str) or not name.strip():
+            raise BadRequest("'name' is required")
+        try:
+            threshold = float(params.get('threshold', DEFAULT_THRESHOLD))
+            limit = min(MAX_LIMIT, max(1, int(params.get('limit', DEFAULT_LIMIT))))
+        except (TypeError, ValueError):
+            raise BadRequest("'threshold' and 'limit' must be numbers")
+        return name, threshold, limit
+
+    async def _respond(self, method, target, body):
+        """(status, payload, extra headers) for one request."""
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'generation': self.screener.generation}, ()
+        if url.path == '/stats':
+            return 200, self.stats(), ()
+        if url.path != '/screen':
+            return 404, {'error': f"no route {url.path}"}, ()
+        if method not in ('GET', 'POST'):
+            return 405, {'error': "use GET or POST"}, ()
+
+        try:
+            name, threshold, limit = self._screen_args(url.query, body)
+        except BadRequest as e:
+            return 400, {'error': str(e)}, ()
+        future = self.submit(name, threshold, limit)
+        if future is None:
+            return 503, {'error': "overloaded, retry shortly"}, (('Retry-After', '1'),)
+        try:
+            matches, generation = await future
+        except Exception:
+            return 500, {'error': "screening failed"}, ()
+        return 200, {
+            'name': name,
+            'generation': generation,
+            'matches': [
+                {'score': score, 'entity_id': entity_id, 'name': primary, 'matched_name': matched, 'kind': kind}
+                for score, entity_id, primary, matched, kind in matches
+            ],
+        }, ()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    status, payload, extra = await self._respond(method, target, body)
+                except BadRequest as e:
+                    # the stream cannot be trusted after a malformed request
+                    headers = {'connection': 'close'}
+                    status, payload, extra = e.status, {'error': str(e)}, ()
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                head = [f"HTTP/1.1 {status} {_REASONS[status]}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(data)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{key}: {value}" for key, value in extra]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=HOST, port=PORT):
+        """Load the list, start the batchers and listen; returns the asyncio server (port 0 picks a free one)."""
+        self.queue = asyncio.Queue(self.max_pending)
+        await asyncio.get_running_loop().run_in_executor(None, self.load)
+        self.tasks = [asyncio.create_task(self.batcher()) for _ in range(self.workers)]
+        self.tasks += [asyncio.create_task(self.watch_snapshot(self.reload_seconds)),
+                       asyncio.create_task(self.report())]
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        port = server.sockets[0].getsockname()[1]
+        print(f"[INFO] Screening server listening on {host}:{port} "
+              f"(batches of up to {self.max_batch}, {self.max_wait * 1000:g} ms wait)")
+        return server
+
+    async def shutdown(self, server, timeout=5):
+        """Stop accepting, then let queued and running batches answer their callers."""
+        server.close()
+        deadline = time.monotonic() + timeout
+        while (self.queue.qsize() or self.in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        for task in self.tasks:
+            task.cancel()
+        self.executor.shutdown()
+        print(f"[INFO] Stopped: {json.dumps(self.stats())}")
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await self.start(host, port)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await stop.wait()
+        await self.shutdown(server)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve real-time name screening over HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="screening index artifact written by the ETL")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="names scored per batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="longest a request waits for its batch to fill")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING,
+                        help="queued requests before new ones are rejected with 503")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="batches scored concurrently")
+    args = parser.parse_args()
+
+    server = ScreeningServer(args.snapshot, args.max_batch, args.max_wait_ms, args.max_pending, args.workers)
+    asyncio.run(server.serve(args.host, args.port))
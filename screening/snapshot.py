@@ -0,0 +1,197 @@
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+
+from screening.index import ScreeningIndex
+
+SNAPSHOT_PATH = os.getenv("SCREENING_INDEX_PATH", "artifacts/screening_index.bin")
+
+MAGIC = b'SANCTIDX'
+FORMAT_VERSION = 1
+
+# Column layout of the artifact, in file order: (section, array typecode)
+SECTIONS = [
+    ('entity_ids', 'i'),       # entity_id of every entry
+    ('kinds', 'B'),            # index into KINDS
+    ('primary', 'I'),          # entry holding the entity's primary name
+    ('name_offsets', 'I'),     # n + 1 offsets into `names`
+    ('names', 'B'),            # UTF-8 display names, concatenated
+    ('norm_offsets', 'I'),     # n + 1 offsets into `normalized`
+    ('normalized', 'B'),       # UTF-8 normalized names, concatenated
+    ('key_hashes', 'I'),       # sorted CRC32 of each blocking key
+    ('posting_offsets', 'I'),  # n_keys + 1 offsets into `postings`
+    ('postings', 'I'),         # entry numbers, grouped by key
+]
+KINDS = ('name', 'alias')
+
+_HEADER = struct.Struct('<8sIQI')  # magic, format version, generation, entry count
+_SECTION = struct.Struct('<QQ')    # byte offset, byte length
+
+
+def key_hash(key):
+    return zlib.crc32(key.encode('utf-8'))
+
+
+def _pack_strings(values):
+    offsets = array('I', [0])
+    blob = bytearray()
+    for value in values:
+        blob += value.encode('utf-8')
+        offsets.append(len(blob))
+    return offsets, blob
+
+
+def write_snapshot(index, path=SNAPSHOT_PATH, generation=None):
+    """
+    Serialize an in-memory ScreeningIndex to a flat, array-backed artifact.
+    The file is written next to `path` and renamed into place, so readers
+    that already have the old version mapped keep a consistent view.
+    """
+    if sys.byteorder != 'little':
+        raise RuntimeError("screening index snapshots are written little-endian")
+    generation = generation if generation is not None else time.time_ns()
+
+    first_entry = {}
+    for entry, (entity_id, kind) in enumerate(zip(index.entity_ids, index.kinds)):
+        if kind == 'name':
+            first_entry.setdefault(entity_id, entry)
+    primary = array('I', (first_entry.get(eid, entry) for entry, eid in enumerate(index.entity_ids)))
+    name_offsets, names = _pack_strings(index.names)
+    norm_offsets, normalized = _pack_strings(index.normalized)
+
+    # CRC32 collisions just merge two posting lists; scoring filters the extra candidates
+    merged = {}
+    for key, posting in index.postings.items():
+        merged.setdefault(key_hash(key), []).append(posting)
+    key_hashes = array('I', sorted(merged))
+    posting_offsets = array('I', [0])
+    postings = array('I')
+    for h in key_hashes:
+        lists = merged[h]
+        postings.extend(lists[0] if len(lists) == 1 else sorted(set().union(*lists)))
+        posting_offsets.append(len(postings))
+
+    columns = {
+        'entity_ids': index.entity_ids,
+        'kinds': array('B', (KINDS.index(k) for k in index.kinds)),
+        'primary': primary,
+        'name_offsets': name_offsets,
+        'names': names,
+        'norm_offsets': norm_offsets,
+        'normalized': normalized,
+        'key_hashes': key_hashes,
+        'posting_offsets': posting_offsets,
+        'postings': postings,
+    }
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, generation, len(index)))
+        table_pos = f.tell()
+        f.write(b'\0' * (_SECTION.size * len(SECTIONS)))
+        table = []
+        for section, _ in SECTIONS:
+            # 8-byte align every column
+            f.write(b'\0' * (-f.tell() % 8))
+            data = memoryview(columns[section]).cast('B')
+            table.append((f.tell(), len(data)))
+            f.write(data)
+        f.seek(table_pos)
+        for offset, length in table:
+            f.write(_SECTION.pack(offset, length))
+    os.replace(tmp_path, path)
+    return path
+
+
+def publish_snapshot(conn, path=SNAPSHOT_PATH):
+    """Rebuild the screening index from the database and publish it as an artifact."""
+    return write_snapshot(ScreeningIndex.from_db(conn), path)
+
+
+class SnapshotIndex(ScreeningIndex):
+    """
+    A ScreeningIndex served straight from a memory-mapped snapshot. Opening it
+    costs a header read; columns are paged in on demand and shared between
+    every process on the host that maps the same file.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = [memoryview(self._mmap)]
+        magic, version, generation, count = _HEADER.unpack_from(self._views[0], 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a screening index snapshot")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        self.generation = generation
+        self.count = count
+
+        pos = _HEADER.size
+        for section, typecode in SECTIONS:
+            offset, length = _SECTION.unpack_from(self._views[0], pos)
+            pos += _SECTION.size
+            view = self._views[0][offset:offset + length].cast(typecode)
+            self._views.append(view)
+            setattr(self, '_' + section, view)
+
+    def __len__(self):
+        return self.count
+
+    def posting(self, key):
+        h = key_hash(key)
+        i = bisect_left(self._key_hashes, h)
+        if i < len(self._key_hashes) and self._key_hashes[i] == h:
+            return self._postings[self._posting_offsets[i]:self._posting_offsets[i + 1]]
+        return None
+
+    def entity_id(self, entry):
+        return self._entity_ids[entry]
+
+    def name(self, entry):
+        return bytes(self._names[self._name_offsets[entry]:self._name_offsets[entry + 1]]).decode('utf-8')
+
+    def normalized_name(self, entry):
+        return bytes(self._normalized[self._norm_offsets[entry]:self._norm_offsets[entry + 1]]).decode('utf-8')
+
+    def kind(self, entry):
+        return KINDS[self._kinds[entry]]
+
+    def primary_name(self, entry):
+        return self.name(self._primary[entry])
+
+    def add(self, entity_id, name, kind='name'):
+        raise TypeError("snapshot indexes are read-only")
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    from db.db_utils import connect_db
+
+    conn = connect_db()
+    written = publish_snapshot(conn)
+    conn.close()
+    print(f"Screening index written to {written}")
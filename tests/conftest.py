@@ -0,0 +1,33 @@
+import pytest
+
+from db.schema import ensure_schema
+from db.sqlite_db import Connection
+from utils.records import SanctionRecord
+
+
+@pytest.fixture
+def conn():
+    """A fresh in-memory database on the embedded SQLite backend (see db.sqlite_db)."""
+    conn = Connection(":memory:")
+    cursor = conn.cursor()
+    ensure_schema(cursor)
+    cursor.close()
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def cursor(conn):
+    cursor = conn.cursor()
+    yield cursor
+    cursor.close()
+
+
+def record(name, aliases=(), nationalities=(), designation="individual", sanction_types=(), source="TEST"):
+    return SanctionRecord(name, tuple(aliases), tuple(nationalities), designation, tuple(sanction_types), source)
+
+
+def entity_count(cursor):
+    cursor.execute("SELECT COUNT(*) AS count FROM sanctioned_entities")
+    return cursor.fetchone()["count"]
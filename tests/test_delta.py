@@ -0,0 +1,121 @@
+from conftest import entity_count, record
+from db.aggregates import ListStats, check_stats
+from db.db_utils import load_records
+from db.dedup_index import DedupIndex
+from db.delta import DeltaLoader, record_key
+from db.lookups import LookupCache
+
+
+def _run(cursor, records, index, lookups, stats=None):
+    loader = DeltaLoader(cursor, "TEST", index, lookups, stats)
+    loader.apply(records)
+    loader.finish()
+    if stats is not None:
+        stats.flush(cursor)
+    return loader
+
+
+def _changes(cursor):
+    cursor.execute("SELECT name, change_type FROM entity_changes ORDER BY change_id")
+    return [(row["name"], row["change_type"]) for row in cursor.fetchall()]
+
+
+def test_delta_loader_records_added_modified_and_removed(cursor):
+    index, lookups = DedupIndex(), LookupCache()
+    first = _run(cursor, [record("Ali Hassan"), record("Omar Said", aliases=["Abu Omar"]),
+                          record("Zaid Karim")], index, lookups)
+    assert first.stats == {"added": 3, "modified": 0, "removed": 0, "unchanged": 0}
+    omar = index.get_entity("Omar Said", "individual", "TEST")
+    zaid = index.get_entity("Zaid Karim", "individual", "TEST")
+
+    second = _run(cursor, [record("Ali Hassan"), record("Omar Said", aliases=["Omar al-Said"]),
+                           record("Nadia Farouk")], index, lookups)
+    assert second.stats == {"added": 1, "modified": 1, "removed": 1, "unchanged": 1}
+
+    # a modified record keeps its entity and gets its children rewritten
+    assert index.get_entity("Omar Said", "individual", "TEST") == omar
+    cursor.execute("SELECT alias_name FROM aliases WHERE entity_id = %s", (omar,))
+    assert [row["alias_name"] for row in cursor.fetchall()] == ["Omar al-Said"]
+    cursor.execute("SELECT COUNT(*) AS count FROM sanctioned_entities WHERE entity_id = %s", (zaid,))
+    assert cursor.fetchone()["count"] == 0
+    assert entity_count(cursor) == 3
+    assert _changes(cursor)[3:] == [("Omar Said", "modified"), ("Nadia Farouk", "added"),
+                                    ("Zaid Karim", "removed")]
+
+
+def test_first_incremental_run_after_a_full_load_records_a_baseline(cursor):
+    feed = [record("Ali Hassan", aliases=["Abu Ali"], nationalities=["Iraq"]),
+            record("Omar Said", aliases=["Abu Omar"]), record("Zaid Karim", sanction_types=["ISIL"])]
+    index, lookups = DedupIndex(), LookupCache()
+    load_records(cursor, feed, index=index, lookups=lookups)
+    cursor.execute("SELECT alias_id FROM aliases ORDER BY alias_id")
+    alias_ids = [row["alias_id"] for row in cursor.fetchall()]
+
+    feed[1] = record("Omar Said", aliases=["Omar al-Said"])
+    first = _run(cursor, feed, index, lookups)
+    assert first.stats == {"added": 0, "modified": 1, "removed": 0, "unchanged": 2}
+    assert _changes(cursor) == [("Omar Said", "modified")]
+    # the unchanged entity keeps its child rows
+    cursor.execute("SELECT alias_id FROM aliases WHERE alias_name = %s", ("Abu Ali",))
+    assert cursor.fetchone()["alias_id"] == alias_ids[0]
+
+    again = _run(cursor, feed, index, lookups)
+    assert again.stats == {"added": 0, "modified": 0, "removed": 0, "unchanged": 3}
+    assert entity_count(cursor) == 3
+
+
+def test_a_repredicted_designation_keeps_the_record_and_its_entity(cursor):
+    index, lookups = DedupIndex(), LookupCache()
+    feed = [record("Zaid Karim", aliases=["Abu Zaid"], designation=None)]
+    # keys are taken from the feed before the designation is predicted
+    keys = [record_key(r) for r in feed]
+
+    first = DeltaLoader(cursor, "TEST", index, lookups)
+    first.apply([feed[0]._replace(designation="individual")], keys)
+    first.finish()
+    zaid = index.get_entity("Zaid Karim", "individual", "TEST")
+
+    second = DeltaLoader(cursor, "TEST", index, lookups)
+    second.apply([feed[0]._replace(designation="entity")], keys)
+    second.finish()
+    assert second.stats == {"added": 0, "modified": 1, "removed": 0, "unchanged": 0}
+    assert index.get_entity("Zaid Karim", "entity", "TEST") == zaid
+    assert index.get_entity("Zaid Karim", "individual", "TEST") is None
+    cursor.execute("SELECT entity_id, designation FROM sanctioned_entities")
+    assert cursor.fetchall() == [{"entity_id": zaid, "designation": "entity"}]
+    cursor.execute("SELECT alias_name FROM aliases WHERE entity_id = %s", (zaid,))
+    assert [row["alias_name"] for row in cursor.fetchall()] == ["Abu Zaid"]
+
+
+def test_list_stats_match_a_recount_through_loads_and_deletions(cursor):
+    index, lookups, stats = DedupIndex(), LookupCache(), ListStats()
+    _run(cursor, [
+        record("Ali Hassan", nationalities=["Iraq", "Syria"], sanction_types=["ISIL"]),
+        record("Omar Said", aliases=["Abu Omar"], nationalities=["Iraq"], sanction_types=["ISIL", "AQ"]),
+        record("Zaid Karim", nationalities=["Yemen"]),
+    ], index, lookups, stats)
+    assert check_stats(cursor) == []
+
+    _run(cursor, [
+        record("Ali Hassan", nationalities=["Iraq"], sanction_types=["ISIL"]),
+        record("Omar Said", aliases=["Abu Omar"], nationalities=["Iraq", "Jordan"], sanction_types=["AQ"]),
+    ], index, lookups, stats)
+    assert check_stats(cursor) == []
+
+    cursor.execute("SELECT entities, aliases, nationalities, multi_nationality FROM source_stats")
+    assert cursor.fetchone() == {"entities": 2, "aliases": 1, "nationalities": 3, "multi_nationality": 1}
+
+
+def test_list_stats_follow_the_first_incremental_run_after_a_full_load(cursor):
+    index, lookups, stats = DedupIndex(), LookupCache(), ListStats()
+    load_records(cursor, [record("Ali Hassan", nationalities=["Iraq"]),
+                          record("Omar Said", nationalities=["Iraq", "Syria"])], index=index, lookups=lookups,
+                 stats=stats)
+    stats.flush(cursor)
+    assert check_stats(cursor) == []
+
+    _run(cursor, [record("Ali Hassan", nationalities=["Iraq"]), record("Omar Said", nationalities=["Syria"])],
+         index, lookups, stats)
+    assert check_stats(cursor) == []
+    cursor.execute("SELECT multi_nationality FROM source_stats")
+    assert cursor.fetchone()["multi_nationality"] == 0
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from etl import fetch_source
+from utils.feed_cache import FeedCache, make_session
+from utils.metrics import Metrics
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """Serves `server.body` with an ETag, answering 304 when the client already has it."""
+
+    def do_GET(self):
+        self.server.requests += 1
+        etag = '"%s"' % hashlib.sha256(self.server.body).hexdigest()[:16]
+        if self.server.validators and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        if self.server.validators:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def feed_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    server.body = b"<list><entry>Ali Hassan</entry></list>"
+    server.validators = True
+    server.requests = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/feed.xml"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def session():
+    session = make_session()
+    yield session
+    session.close()
+
+
+def test_not_modified_feed_returns_none(feed_server, session, tmp_path):
+    cache = FeedCache(str(tmp_path))
+    assert cache.fetch(session, "UN", feed_server.url) == feed_server.body
+    cache.commit("UN")
+
+    assert cache.fetch(session, "UN", feed_server.url) is None
+    assert feed_server.requests == 2
+    # force ignores the validators
+    assert cache.fetch(session, "UN", feed_server.url, force=True) == feed_server.body
+
+
+def test_unchanged_body_hash_returns_none(feed_server, session, tmp_path):
+    feed_server.validators = False
+    cache = FeedCache(str(tmp_path))
+    assert cache.fetch(session, "UN", feed_server.url) == feed_server.body
+    cache.commit("UN")
+
+    assert cache.fetch(session, "UN", feed_server.url) is None
+    feed_server.body += b"\n"
+    assert cache.fetch(session, "UN", feed_server.url) == feed_server.body
+
+
+def test_uncommitted_fetch_is_downloaded_again(feed_server, session, tmp_path):
+    cache = FeedCache(str(tmp_path))
+    assert cache.fetch(session, "UN", feed_server.url) == feed_server.body
+    cache.discard("UN")
+
+    assert cache.fetch(session, "UN", feed_server.url) == feed_server.body
+    assert cache.read_body("UN") is None
+
+
+def test_reuse_cached_reads_an_unchanged_feed_back(feed_server, session, tmp_path):
+    cache = FeedCache(str(tmp_path))
+    src = {"sanction_type": "UN", "url": feed_server.url}
+    assert fetch_source(src, session, cache, metrics=Metrics()) == feed_server.body
+    cache.commit("UN")
+
+    assert fetch_source(src, session, cache, metrics=Metrics()) is None
+    assert fetch_source(src, session, cache, metrics=Metrics(), reuse_cached=True) == feed_server.body
+    assert feed_server.requests == 3
+
+
+def test_reuse_cached_downloads_when_no_body_is_cached(feed_server, session, tmp_path):
+    cache = FeedCache(str(tmp_path))
+    src = {"sanction_type": "UN", "url": feed_server.url}
+    assert fetch_source(src, session, cache, metrics=Metrics()) == feed_server.body
+    cache.commit("UN")
+    body_path, _ = cache._paths("UN")
+    os.remove(body_path)
+
+    assert fetch_source(src, session, cache, metrics=Metrics(), reuse_cached=True) == feed_server.body
+    assert feed_server.requests == 3
+
+
+def test_fetch_source_counts_the_bytes_of_urls_and_local_files(feed_server, session, tmp_path):
+    metrics = Metrics()
+    fetch_source({"sanction_type": "UN", "url": feed_server.url}, session, FeedCache(str(tmp_path)), metrics=metrics)
+    assert fetch_source({"sanction_type": "EU", "path": "data/UN.xml"}, session, None, metrics=metrics) == "data/UN.xml"
+
+    assert metrics.sources["UN"]["bytes_fetched"] == len(feed_server.body)
+    assert metrics.sources["EU"]["bytes_fetched"] == os.path.getsize("data/UN.xml")
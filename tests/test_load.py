@@ -0,0 +1,162 @@
+from queue import Queue
+
+from conftest import entity_count, record
+from db.checkpoints import clear_checkpoint, load_checkpoints, resume_offset, save_checkpoint
+from db.db_utils import find_by_name, find_by_prefix, load_batch, load_records
+from db.dedup_index import DedupIndex
+from db.lookups import LookupCache
+from etl import parse_source
+
+
+def test_load_batch_returns_ids_in_input_order(cursor):
+    records = [
+        record("Ali Hassan", aliases=["Abu Ali"], nationalities=["Iraq"]),
+        record("Omar Said"),
+        record("Ali Hassan", aliases=["Abu Ali", "Ali al-Hassan"]),
+        record(None),
+        record("Zaid Karim"),
+    ]
+    ids = load_batch(cursor, records)
+
+    assert ids[0] == ids[2]
+    assert ids[3] is None
+    assert ids[0] < ids[1] < ids[4]
+    assert entity_count(cursor) == 3
+    cursor.execute("SELECT alias_name FROM aliases WHERE entity_id = %s ORDER BY alias_name", (ids[0],))
+    assert [row["alias_name"] for row in cursor.fetchall()] == ["Abu Ali", "Ali al-Hassan"]
+
+
+def test_load_batch_resolves_existing_entities_in_input_order(cursor):
+    first = load_batch(cursor, [record("Omar Said"), record("Ali Hassan", nationalities=["Iraq"])])
+    again = load_batch(cursor, [record("Ali Hassan", nationalities=["Iraq"]), record("New Name"),
+                                record("Omar Said")])
+
+    assert again[0] == first[1]
+    assert again[2] == first[0]
+    assert again[1] not in first
+    assert entity_count(cursor) == 3
+    cursor.execute("SELECT COUNT(*) AS count FROM nationalities WHERE entity_id = %s", (first[1],))
+    assert cursor.fetchone()["count"] == 1
+
+
+def test_load_batch_merges_spellings_through_the_dedup_index(cursor):
+    ids = load_batch(cursor, [record("Ali Hassan", aliases=["Abu Ali"]), record("ALI  HASSAN", aliases=["ABU ALI"])],
+                     DedupIndex())
+
+    assert ids[0] == ids[1]
+    assert entity_count(cursor) == 1
+    cursor.execute("SELECT COUNT(*) AS count FROM aliases")
+    assert cursor.fetchone()["count"] == 1
+
+
+def test_dedup_index_rollback_forgets_uncommitted_keys():
+    index = DedupIndex()
+    index.add_entity("Omar Said", "individual", "TEST", 1)
+    index.add_child("aliases", 1, "Abu Omar")
+    index.commit()
+
+    index.add_entity("Ali Hassan", "individual", "TEST", 2)
+    index.add_child("aliases", 1, "Omar al-Said")
+    index.rollback()
+
+    assert index.get_entity("omar  SAID", "Individual", "test") == 1
+    assert index.get_entity("Ali Hassan", "individual", "TEST") is None
+    assert index.has_child("aliases", 1, "abu omar")
+    assert not index.has_child("aliases", 1, "Omar al-Said")
+
+
+def test_dedup_index_rollback_matches_a_rolled_back_transaction(conn, cursor):
+    index, lookups = DedupIndex(), LookupCache()
+    kept = load_batch(cursor, [record("Omar Said", aliases=["Abu Omar"], nationalities=["Iraq"])], index, lookups)[0]
+    conn.commit()
+    index.commit()
+    lookups.commit()
+
+    load_batch(cursor, [record("Ali Hassan", nationalities=["Yemen"]),
+                        record("Omar Said", aliases=["Omar al-Said"])], index, lookups)
+    conn.rollback()
+    index.rollback()
+    lookups.rollback()
+
+    assert index.get_entity("Omar Said", "individual", "TEST") == kept
+    assert not index.has_child("aliases", kept, "Omar al-Said")
+    # the rolled-back entity and code are inserted again rather than resolved to dead ids
+    ids = load_batch(cursor, [record("Ali Hassan", nationalities=["Yemen"]),
+                              record("Omar Said", aliases=["Omar al-Said"])], index, lookups)
+    cursor.execute("SELECT name FROM sanctioned_entities WHERE entity_id = %s", (ids[0],))
+    assert cursor.fetchone()["name"] == "Ali Hassan"
+    cursor.execute("""
+        SELECT c.nationality FROM nationalities n JOIN nationality_codes c ON c.nationality_id = n.nationality_id
+        WHERE n.entity_id = %s
+    """, (ids[0],))
+    assert cursor.fetchone()["nationality"] == "Yemen"
+    cursor.execute("SELECT alias_name FROM aliases WHERE entity_id = %s ORDER BY alias_name", (kept,))
+    assert [row["alias_name"] for row in cursor.fetchall()] == ["Abu Omar", "Omar al-Said"]
+
+
+def _parsed(skip):
+    queue = Queue()
+    parse_source("un", "UN", "data/UN.xml", queue, 100, skip)
+    records = []
+    while True:
+        kind, payload = queue.get_nowait()
+        if kind != "records":
+            assert kind == "done"
+            return records, payload
+        records.extend(payload)
+
+
+def test_resume_offset_only_applies_to_the_same_feed():
+    checkpoints = {"UN": ("feed-hash", 150)}
+    assert resume_offset(checkpoints, "UN", "feed-hash") == 150
+    assert resume_offset(checkpoints, "UN", "other-hash") == 0
+    assert resume_offset(checkpoints, "EU", "feed-hash") == 0
+
+
+def test_parse_source_skips_the_committed_records():
+    full, stats = _parsed(0)
+    rest, rest_stats = _parsed(150)
+    assert stats["parsed"] == len(full)
+    assert rest == full[150:]
+    assert rest_stats["parsed"] == len(full) - 150
+
+
+def test_resume_from_checkpoint_loads_the_rest_of_the_feed(conn, cursor):
+    full, _ = _parsed(0)
+    load_records(cursor, full, index=DedupIndex(), lookups=LookupCache())
+    expected = entity_count(cursor)
+    conn.rollback()
+
+    # an interrupted run committed the first 150 records with a checkpoint
+    index, lookups = DedupIndex(), LookupCache()
+    load_records(cursor, full[:150], index=index, lookups=lookups)
+    save_checkpoint(cursor, "UN", "feed-hash", 150)
+    conn.commit()
+
+    skip = resume_offset(load_checkpoints(cursor), "UN", "feed-hash")
+    assert skip == 150
+    rest, _ = _parsed(skip)
+    load_records(cursor, rest, index=index, lookups=lookups)
+    clear_checkpoint(cursor, "UN")
+    conn.commit()
+    assert entity_count(cursor) == expected
+    assert load_checkpoints(cursor) == {}
+
+
+def test_name_lookups_ignore_case_accents_order_and_script(cursor):
+    ids = load_batch(cursor, [record("Mohammad Ali", aliases=["Abū al-Ḥasan"]),
+                              record("Мухаммад Али", nationalities=["Russia"]), record("Ali_Mohammad")])
+
+    assert {row["entity_id"] for row in find_by_name(cursor, "ALI, mohammad")} == {ids[0], ids[2]}
+    assert [(row["entity_id"], row["kind"]) for row in find_by_name(cursor, "al hasan abu")] == [(ids[0], "alias")]
+    assert [row["entity_id"] for row in find_by_name(cursor, "али мухаммад")] == [ids[1]]
+    assert {row["entity_id"] for row in find_by_prefix(cursor, "ali moh")} == {ids[0], ids[2]}
+    assert [row["entity_id"] for row in find_by_prefix(cursor, "Али")] == [ids[1]]
+
+
+def test_prefix_lookup_treats_like_wildcards_as_punctuation(cursor):
+    load_batch(cursor, [record("Omar Said"), record("Zaid Karim")])
+
+    assert find_by_prefix(cursor, "%") == []
+    assert find_by_prefix(cursor, "_") == []
+    assert [row["name"] for row in find_by_prefix(cursor, "omar%")] == ["Omar Said"]
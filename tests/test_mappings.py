@@ -0,0 +1,19 @@
+import pytest
+
+from utils.mappings import mapping_parser
+from utils.xml_parsers import parse_sdn, parse_swiss, parse_un, parse_xml
+
+
+@pytest.mark.parametrize("mapping, legacy, feed, source", [
+    ("un", parse_un, "data/UN.xml", "UN"),
+    ("ofac", parse_xml, "data/consolidated.xml", "USOFAC-Consolidated"),
+    ("sdn", parse_sdn, "data/seco.xml", "USOFAC-SDN"),
+    ("swiss", parse_swiss, "data/seco.xml", "Swizerland"),
+])
+def test_mapping_matches_legacy_parser(mapping, legacy, feed, source):
+    with open(feed, "rb") as f:
+        expected = list(legacy(f, source))
+    with open(feed, "rb") as f:
+        records = list(mapping_parser(mapping)(f, source))
+    assert records
+    assert records == expected
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from utils.csv_parsers import parse_csv
+from utils.records import record_from_row
+
+
+def legacy_read_csv(csv_file, source):
+    """The pandas reader parse_csv replaced, with parse_csv's Source fallback."""
+    df = pd.read_csv(csv_file, keep_default_na=True, na_values=['', 'null', 'NULL', 'N/A'])
+    df = df.rename(columns={'SanctionType': 'Sanction Type'})
+    df = df.where(pd.notnull(df), None)
+    rows = df.to_dict('records')
+    for row in rows:
+        if not isinstance(row.get('Source'), str):
+            row['Source'] = source
+    return [record_from_row(row) for row in rows]
+
+
+@pytest.mark.parametrize("path", [
+    "data/uk_predicted.csv",
+    "uk_sanctions_data.csv",
+    "un_sanctions_data.csv",
+    "usofac-sdn_sanctions_data.csv",
+    "USOFAC-Consolidated_sanctions_data.csv",
+    "swizerland_sanctions_data.csv",
+])
+def test_parse_csv_matches_the_pandas_reader(path):
+    with open(path, "rb") as f:
+        records = list(parse_csv(f, "UK"))
+    assert records
+    assert records == legacy_read_csv(path, "UK")
+
+
+def test_parse_csv_reads_na_tokens_as_missing(tmp_path):
+    path = tmp_path / "list.csv"
+    path.write_text(
+        "Name,Alias,Nationality,Designation,SanctionType,Source\n"
+        "Ali Hassan,NA,n/a,None,#N/A,\n"
+        "Omar Said,Abu Omar,NULL,null,ISIL,EU\n"
+        "Zaid Karim,nan,<NA>,N/A,,EU\n"
+        "\n"
+        "NA Corp,\"Abu Ali, Umm Ali\",Iraq,Entity,AQ,EU\n",
+        encoding="utf-8",
+    )
+    with open(path, "rb") as f:
+        records = list(parse_csv(f, "UK"))
+    assert records == legacy_read_csv(str(path), "UK")
+    assert records[0] == record_from_row({"Name": "Ali Hassan", "Source": "UK"})
+    assert records[1].designation is None and records[1].sanction_types == ("ISIL",)
+    assert records[3].name == "NA Corp" and records[3].aliases == ("Abu Ali", "Umm Ali")
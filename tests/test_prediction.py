@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import record
+from prediction.designation import DesignationPredictor, train
+
+TRAINING = [
+    record("Ali Hassan", nationalities=["Iraq"], designation="individual"),
+    record("Omar Said", nationalities=["Syria"], designation="individual"),
+    record("Nadia Farouk", nationalities=["Iraq"], designation="individual"),
+    record("Al Noor Trading Company", nationalities=["Syria"], designation="entity"),
+    record("Hassan Shipping Company", nationalities=["Iraq"], designation="entity"),
+    record("Farouk Exchange Company", designation="entity"),
+]
+
+
+@pytest.fixture(scope="module")
+def artifact():
+    return train(TRAINING, validation_split=0)
+
+
+def _cached(cursor):
+    cursor.execute("SELECT COUNT(*) AS count FROM designation_predictions")
+    return cursor.fetchone()["count"]
+
+
+def test_fill_predicts_missing_designations_and_reuses_the_cache(conn, cursor, artifact):
+    predictor = DesignationPredictor(artifact)
+    chunk = [record("Zaid Trading Company", designation=None), record("Zaid Karim", designation=None),
+             record("Omar Said"), record(None, designation=None)]
+
+    filled, scored, hits = predictor.fill(cursor, chunk)
+    assert (scored, hits) == (2, 0)
+    assert {filled[0].designation, filled[1].designation} <= {"entity", "individual"}
+    assert [r.designation for r in filled[2:]] == ["individual", None]
+    assert chunk[0].designation is None
+    predictor.commit()
+    conn.commit()
+    assert _cached(cursor) == 2
+
+    again, scored, hits = predictor.fill(cursor, chunk)
+    assert (scored, hits) == (0, 2)
+    assert again == filled
+    # another run with the same model version reads the cache from the database
+    reloaded = DesignationPredictor(artifact).preload(conn)
+    assert reloaded.fill(cursor, chunk)[1:] == (0, 2)
+
+
+def test_fill_rollback_forgets_uncommitted_predictions(conn, cursor, artifact):
+    predictor = DesignationPredictor(artifact)
+    kept = [record("Zaid Karim", designation=None)]
+    predictor.fill(cursor, kept)
+    predictor.commit()
+    conn.commit()
+
+    dropped = [record("Zaid Trading Company", designation=None)]
+    predictor.fill(cursor, dropped)
+    conn.rollback()
+    predictor.rollback()
+
+    assert _cached(cursor) == 1
+    assert predictor.fill(cursor, kept)[1:] == (0, 1)
+    assert predictor.fill(cursor, dropped)[1:] == (1, 0)
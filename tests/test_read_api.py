@@ -0,0 +1,78 @@
+import time
+
+from conftest import record
+from db.db_utils import load_batch
+from db.read_api import ConnectionPool, SanctionsReader, TTLCache, bump_version
+from db.sqlite_db import Connection
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def _reader(path):
+    return SanctionsReader(pool=ConnectionPool(size=2, connect=lambda: Connection(path)), version_check=0)
+
+
+def _rename(path, entity_id, name, bump):
+    conn = Connection(path)
+    cursor = conn.cursor()
+    cursor.execute("UPDATE sanctioned_entities SET name = %s WHERE entity_id = %s", (name, entity_id))
+    if bump:
+        bump_version(cursor)
+    conn.commit()
+    conn.close()
+
+
+def test_reader_drops_its_cache_when_the_list_version_changes(tmp_path):
+    path = str(tmp_path / "sanctions.db")
+    conn = Connection(path)
+    cursor = conn.cursor()
+    entity_id = load_batch(cursor, [record("Ali Hassan", aliases=["Abu Ali"])])[0]
+    bump_version(cursor)
+    conn.commit()
+    conn.close()
+
+    reader = _reader(path)
+    assert reader.entity(entity_id)["aliases"] == ["Abu Ali"]
+
+    # a write without a version bump is not seen: the result is cached
+    _rename(path, entity_id, "Changed Quietly", bump=False)
+    assert reader.entity(entity_id)["name"] == "Ali Hassan"
+
+    _rename(path, entity_id, "Ali al-Hassan", bump=True)
+    assert reader.entity(entity_id)["name"] == "Ali al-Hassan"
+    reader.close()
+
+
+def test_reader_does_not_cache_a_result_that_raced_a_version_change(tmp_path):
+    path = str(tmp_path / "sanctions.db")
+    conn = Connection(path)
+    cursor = conn.cursor()
+    entity_id = load_batch(cursor, [record("Ali Hassan")])[0]
+    conn.commit()
+    conn.close()
+
+    reader = _reader(path)
+    reader._refresh_version()
+    started = reader.version
+    # the refresh that runs while the query is in flight sees a new version
+    reader.version = started + 1
+    reader._store(("entity", entity_id), {}, started)
+    assert len(reader.cache) == 0
+    reader.close()
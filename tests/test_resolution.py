@@ -0,0 +1,89 @@
+from db.resolution import (
+    DisjointSet, blocking_keys, candidate_pairs, load_entities, resolve,
+)
+from utils.metrics import Metrics
+
+
+def _entities(*listings):
+    """load_entities over (entity_id, source, names, nationalities) listings."""
+    rows = []
+    for entity_id, source, names, nationalities in listings:
+        rows.append(('entity', entity_id, names[0], source))
+        rows.extend(('alias', entity_id, name, None) for name in names[1:])
+        rows.extend(('nationality', entity_id, nationality, None) for nationality in nationalities)
+    return load_entities(rows)
+
+
+def test_disjoint_set_refuses_to_join_two_members_of_one_group():
+    clusters = DisjointSet({1: "UN", 2: "OFAC", 3: "UN"})
+    assert clusters.union(1, 2)
+    assert not clusters.union(2, 3)
+    assert clusters.find(3) == 3
+    assert clusters.find(2) == 1
+
+
+def test_resolve_keeps_two_listings_of_one_source_apart():
+    # the OFAC listing is close to both UN listings; only the better match joins it
+    entities = _entities(
+        (1, "UN", ["Mohammed Ali Hassan"], ["Iraq"]),
+        (2, "UN", ["Mohammed Ali Hasan"], ["Iraq"]),
+        (3, "OFAC", ["Mohammed Ali Hassan"], ["Iraq"]),
+    )
+    metrics = Metrics()
+    assignments = resolve(entities, workers=1, metrics=metrics)
+
+    assert assignments[1] == (1, 1.0)
+    assert assignments[3] == (1, 1.0)
+    assert assignments[2] == (2, None)
+    assert metrics.sources["all"]["resolution_matches_refused"] == 1
+
+
+def test_resolve_does_not_chain_one_source_into_a_cluster_through_another():
+    entities = _entities(
+        (1, "UN", ["Omar Said"], []),
+        (2, "OFAC", ["Omar Said", "Abu Omar"], []),
+        (3, "UN", ["Abu Omar"], []),
+        (4, "UK", ["Abu Omar"], []),
+    )
+    assignments = resolve(entities, workers=1)
+
+    # 1 and 3 are both UN, so the 'Abu Omar' matches cannot pull 3 in
+    assert {entity_id: cluster_id for entity_id, (cluster_id, _) in assignments.items()} == {1: 1, 2: 1, 3: 3, 4: 1}
+
+
+def test_placeholder_nationality_counts_as_none_given():
+    entities = _entities(
+        (1, "UN", ["Zaid Karim"], ["Unknown"]),
+        (2, "OFAC", ["Zaid Karim"], ["Syria"]),
+    )
+    assert entities[1][2] == frozenset()
+    assert entities[2][2] == frozenset({"syria"})
+    assignments = resolve(entities, workers=1)
+    assert assignments[1][0] == assignments[2][0] == 1
+
+
+def test_different_nationalities_rule_out_a_match():
+    entities = _entities(
+        (1, "UN", ["Zaid Karim"], ["Iraq"]),
+        (2, "OFAC", ["Zaid Karim"], ["Syria"]),
+    )
+    assignments = resolve(entities, workers=1)
+    assert assignments[1][0] != assignments[2][0]
+
+
+def test_token_block_without_nationality_pairs_with_every_nationality():
+    keys = blocking_keys(frozenset({"nadia farouk"}), frozenset())
+    assert ('token', 'farouk', '') in keys
+    assert not any(key[0] == 'token' and key[2] for key in keys)
+
+    # only the token 'farouk' is shared: the names, spellings and Soundex signatures differ
+    entities = _entities(
+        (1, "UN", ["Nadia Farouk"], []),
+        (2, "OFAC", ["Umm Nadia Farouk"], ["Syria"]),
+        (3, "UK", ["Farouk Hamid"], ["Egypt"]),
+        (4, "UN", ["Nadia Farouk"], ["Egypt"]),
+    )
+    pairs = candidate_pairs(entities)
+    assert (1, 2) in pairs and (1, 3) in pairs
+    # listings of the same source are never paired
+    assert (1, 4) not in pairs
@@ -0,0 +1,124 @@
+import csv
+from difflib import SequenceMatcher
+
+import pytest
+
+from screening.batch import BatchScreener, screen_file
+from screening.index import PHONETIC_WEIGHT, ScreeningIndex
+from screening.snapshot import SnapshotIndex, write_snapshot
+from utils.normalize import normalize_name
+from utils.xml_parsers import parse_un
+
+ROWS = [
+    (1, "Mohammed Ali", "name"),
+    (1, "Abu Ali", "alias"),
+    (2, "Peter Smith", "name"),
+    (3, "Ali Mohamed", "name"),
+    (4, "Zaid Karim", "name"),
+]
+
+
+@pytest.fixture
+def index():
+    return ScreeningIndex.build(ROWS)
+
+
+def _score(index, query, name):
+    return index.score(normalize_name(query), index.names.index(name))
+
+
+def test_agreeing_soundex_codes_close_part_of_the_gap(index):
+    ratio = SequenceMatcher(None, "potter smith", "peter smith").ratio()
+    assert _score(index, "Potter Smith", "Peter Smith") == pytest.approx(ratio + (1 - ratio) * PHONETIC_WEIGHT)
+    # names without a common code keep their plain sequence ratio
+    ratio = SequenceMatcher(None, "zaid karim", "abu ali").ratio()
+    assert _score(index, "Zaid Karim", "Abu Ali") == pytest.approx(ratio)
+
+
+def test_names_that_only_sound_alike_stay_under_the_default_threshold():
+    index = ScreeningIndex.build([(1, "Peter", "name"), (2, "Ali Mohamed", "name")])
+    assert _score(index, "Potter", "Peter") < 0.85
+    assert _score(index, "Al Muhammad", "Ali Mohamed") < 0.85
+    assert index.screen("Potter") == []
+    assert index.screen("Al Muhammad") == []
+
+
+def test_screen_keeps_the_best_match_per_entity_above_the_threshold(index):
+    matches = index.screen("ABU  ALI")
+    assert [(m.entity_id, m.name, m.matched_name, m.kind, m.score) for m in matches] == [
+        (1, "Mohammed Ali", "Abu Ali", "alias", 1.0)]
+
+    matches = index.screen("Muhamad Ali", threshold=0.8)
+    assert [m.entity_id for m in matches] == [3, 1]
+    assert matches[0].score >= matches[1].score >= 0.8
+    assert index.screen("Muhamad Ali", threshold=0.8, limit=1) == matches[:1]
+    assert index.screen("Muhamad Ali", threshold=0.95) == []
+    assert index.screen("!!!") == []
+
+
+def test_batch_screener_agrees_with_the_index_on_listed_names(index):
+    screener = BatchScreener(ROWS)
+    queries = ["mohammed  ALI", "Abu Ali", "Peter Smith", "Zaid Karim", "Nobody Listed"]
+    results = screener.screen_chunk(queries, top_k=3, threshold=0.85)
+
+    for query, matches in zip(queries, results):
+        expected = [m for m in index.screen(query) if m.score == 1.0]
+        best = [(entity_id, name, matched_name, kind) for score, entity_id, name, matched_name, kind in matches
+                if score >= 0.9999]
+        assert best == [(m.entity_id, m.name, m.matched_name, m.kind) for m in expected]
+    assert results[-1] == []
+
+
+def test_batch_screener_applies_threshold_top_k_and_one_match_per_entity():
+    screener = BatchScreener(ROWS + [(5, "Mohammed Aly", "name")])
+    [matches] = screener.screen_chunk(["Mohammed Ali"], top_k=5, threshold=0.3)
+    assert [entity_id for _, entity_id, _, _, _ in matches] == [1, 3, 5]
+    assert all(score >= 0.3 for score, *_ in matches)
+    assert [s for s, *_ in matches] == sorted((s for s, *_ in matches), reverse=True)
+
+    [top] = screener.screen_chunk(["Mohammed Ali"], top_k=1, threshold=0.3)
+    assert top == matches[:1]
+    [strict] = screener.screen_chunk(["Mohammed Ali"], top_k=5, threshold=0.99)
+    assert [entity_id for _, entity_id, _, _, _ in strict] == [1]
+
+
+def test_screen_file_writes_one_row_per_match(tmp_path):
+    names = tmp_path / "names.csv"
+    names.write_text("name\nAbu Ali\nNobody Listed\nZaid Karim\n", encoding="utf-8")
+    out = tmp_path / "matches.csv"
+
+    assert screen_file(BatchScreener(ROWS), str(names), str(out), threshold=0.9) == (3, 2)
+    with open(out, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["row"], row["entity_id"], row["kind"]) for row in rows] == [("0", "1", "alias"), ("2", "4", "name")]
+
+
+def _un_index():
+    rows = []
+    with open("data/UN.xml", "rb") as f:
+        for entity_id, record in enumerate(parse_un(f, "UN"), 1):
+            rows.append((entity_id, record.name, "name"))
+            rows.extend((entity_id, alias, "alias") for alias in record.aliases)
+    return ScreeningIndex.build(rows)
+
+
+def test_snapshot_index_answers_like_the_in_memory_index(tmp_path):
+    index = _un_index()
+    path = write_snapshot(index, str(tmp_path / "index.bin"), generation=7)
+    queries = [index.names[i] for i in range(0, len(index), 97)]
+    queries += [name.upper()[::-1] for name in queries[:20]] + [name[:-2] for name in queries[:20]]
+
+    with SnapshotIndex(path) as snapshot:
+        assert snapshot.generation == 7
+        assert len(snapshot) == len(index)
+        for query in queries:
+            assert snapshot.screen(query, threshold=0.7) == index.screen(query, threshold=0.7)
+        with pytest.raises(TypeError):
+            snapshot.add(1, "Ali Hassan")
+
+
+def test_snapshot_index_rejects_other_files(tmp_path):
+    path = tmp_path / "index.bin"
+    path.write_bytes(b"not an index" * 10)
+    with pytest.raises(ValueError):
+        SnapshotIndex(str(path))
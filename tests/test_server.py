@@ -0,0 +1,163 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import screening.server
+from screening.index import ScreeningIndex
+from screening.server import MAX_BODY, ScreeningServer, score_batch
+from screening.snapshot import write_snapshot
+
+ROWS = [
+    (1, "Mohammed Ali", "name"),
+    (1, "Abu Ali", "alias"),
+    (2, "Peter Smith", "name"),
+    (3, "Zaid Karim", "name"),
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return write_snapshot(ScreeningIndex.build(ROWS), str(tmp_path / "index.bin"), generation=1)
+
+
+def _run(server, test):
+    """Run `test(port)` against `server` listening on a free local port."""
+    async def main():
+        listener = await server.start("127.0.0.1", 0)
+        try:
+            return await test(listener.sockets[0].getsockname()[1])
+        finally:
+            await server.shutdown(listener, timeout=1)
+    return asyncio.run(main())
+
+
+async def _request(port, raw):
+    """Send one raw HTTP request; returns (status, headers, decoded JSON body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(raw)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers["content-length"]))
+        return status, headers, json.loads(body)
+    finally:
+        writer.close()
+
+
+def _get(port, target):
+    return _request(port, f"GET {target} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n".encode())
+
+
+async def _wait_for(condition, timeout=5):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+def test_score_batch_cuts_each_result_to_its_own_threshold_and_limit():
+    class Screener:
+        def screen_chunk(self, names, top_k, threshold):
+            assert (top_k, threshold) == (3, 0.5)
+            return [[(0.9, 1), (0.7, 2), (0.6, 3)]] * len(names)
+
+    assert score_batch(Screener(), [("a", 0.5, 3), ("b", 0.8, 3), ("c", 0.5, 1)]) == [
+        [(0.9, 1), (0.7, 2), (0.6, 3)], [(0.9, 1)], [(0.9, 1)],
+    ]
+
+
+def test_full_queue_is_rejected_with_503(snapshot, monkeypatch):
+    release = threading.Event()
+
+    def blocked(screener, batch):
+        release.wait(5)
+        return [[] for _ in batch]
+
+    monkeypatch.setattr(screening.server, "score_batch", blocked)
+    server = ScreeningServer(snapshot, max_batch=1, max_wait_ms=0, max_pending=2, workers=1)
+
+    async def test(port):
+        first = asyncio.create_task(_get(port, "/screen?name=ali"))
+        await _wait_for(lambda: server.in_flight == 1)
+        queued = [asyncio.create_task(_get(port, f"/screen?name=ali+{i}")) for i in range(2)]
+        await _wait_for(lambda: server.queue.qsize() == 2)
+
+        status, headers, payload = await _get(port, "/screen?name=one+too+many")
+        assert status == 503
+        assert headers["retry-after"] == "1"
+        release.set()
+        assert [response[0] for response in await asyncio.gather(first, *queued)] == [200, 200, 200]
+        assert server.counts["rejected"] == 1
+
+    try:
+        _run(server, test)
+    finally:
+        release.set()
+
+
+def test_oversized_and_malformed_bodies_are_refused(snapshot):
+    server = ScreeningServer(snapshot)
+
+    async def test(port):
+        post = "POST /screen HTTP/1.1\r\nHost: test\r\nContent-Length: {}\r\n\r\n"
+        status, headers, _ = await _request(port, post.format(MAX_BODY + 1).encode())
+        assert status == 413
+        assert headers["connection"] == "close"
+        for length in ("abc", "-1"):
+            status, headers, payload = await _request(port, post.format(length).encode())
+            assert status == 400
+            assert payload == {"error": "invalid Content-Length"}
+            assert headers["connection"] == "close"
+        # the server is still answering
+        status, _, payload = await _get(port, "/screen?name=Mohammed+Ali")
+        assert status == 200 and payload["matches"][0]["entity_id"] == 1
+
+    _run(server, test)
+
+
+def test_concurrent_requests_are_scored_in_one_batch(snapshot):
+    # a long wait so every request lands in the first batch
+    server = ScreeningServer(snapshot, max_batch=8, max_wait_ms=500, workers=1)
+    names = ["Mohammed Ali", "Abu Ali", "Peter Smith", "Zaid Karim", "Nobody Known"]
+
+    async def test(port):
+        responses = await asyncio.gather(*(_get(port, f"/screen?name={name.replace(' ', '+')}&threshold=0.9")
+                                           for name in names))
+        assert [status for status, _, _ in responses] == [200] * 5
+        assert [[match["entity_id"] for match in payload["matches"]] for _, _, payload in responses] == \
+            [[1], [1], [2], [3], []]
+        assert responses[1][2]["matches"][0]["kind"] == "alias"
+        assert server.counts["batches"] == 1
+        assert server.counts["served"] == 5
+
+    _run(server, test)
+
+
+def test_a_republished_snapshot_is_swapped_in(snapshot):
+    server = ScreeningServer(snapshot, reload_seconds=0.02)
+
+    async def test(port):
+        status, _, payload = await _get(port, "/screen?name=Nadia+Farouk")
+        assert (status, payload["generation"], payload["matches"]) == (200, 1, [])
+
+        write_snapshot(ScreeningIndex.build(ROWS + [(4, "Nadia Farouk", "name")]), snapshot, generation=2)
+        await _wait_for(lambda: server.screener.generation == 2)
+
+        status, _, payload = await _get(port, "/screen?name=Nadia+Farouk")
+        assert (status, payload["generation"]) == (200, 2)
+        assert [match["entity_id"] for match in payload["matches"]] == [4]
+        _, _, health = await _get(port, "/health")
+        assert health["generation"] == 2
+        assert server.counts["reloads"] == 1
+
+    _run(server, test)
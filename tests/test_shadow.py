@@ -0,0 +1,110 @@
+import pytest
+
+from conftest import entity_count, record
+from db.aggregates import ListStats, check_stats
+from db.db_utils import load_batch
+from db.dedup_index import DedupIndex
+from db.lookups import LookupCache
+from db.shadow import (
+    FOREIGN_KEYS, SECONDARY_KEYS, ShadowLoader, build_indexes, discard_staging, prepare_staging,
+    swap_staging, validate_staging,
+)
+
+LIVE = [record("Ali Hassan", aliases=["Abu Ali"], nationalities=["Iraq"]), record("Omar Said"),
+        record("Zaid Karim", sanction_types=["ISIL"])]
+
+
+def _tables(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    return {row["name"] for row in cursor.fetchall()}
+
+
+def _indexed_columns(cursor, table):
+    cursor.execute(f"PRAGMA index_list({table})")
+    columns = set()
+    for index in cursor.fetchall():
+        cursor.execute(f"PRAGMA index_info({index['name']})")
+        columns.add(', '.join(row["name"] for row in cursor.fetchall()))
+    return columns
+
+
+def _foreign_keys(cursor, table):
+    cursor.execute(f"PRAGMA foreign_key_list({table})")
+    return {(row["from"], row["table"]) for row in cursor.fetchall()}
+
+
+def _load_live(cursor):
+    stats = ListStats()
+    load_batch(cursor, LIVE, stats=stats)
+    stats.flush(cursor)
+
+
+def _stage(cursor, records):
+    tables = prepare_staging(cursor)
+    index = DedupIndex()
+    stats = ListStats(tables)
+    loader = ShadowLoader(cursor, "TEST", index, LookupCache(), tables, stats)
+    loader.apply(records)
+    stats.flush(cursor)
+    build_indexes(cursor, tables)
+    return tables, index
+
+
+def test_staging_tables_are_built_and_swapped_in(conn, cursor):
+    _load_live(cursor)
+    conn.commit()
+
+    staged = [record("Nadia Farouk", aliases=["Umm Nadia"], nationalities=["Syria"]),
+              record("Ali Hassan", nationalities=["Iraq", "Jordan"])]
+    tables, index = _stage(cursor, staged)
+    counts = validate_staging(cursor, tables, index)
+    swap_staging(cursor, tables)
+    conn.commit()
+
+    assert counts["sanctioned_entities"] == 2
+    cursor.execute("SELECT name FROM sanctioned_entities ORDER BY name")
+    assert [row["name"] for row in cursor.fetchall()] == ["Ali Hassan", "Nadia Farouk"]
+    cursor.execute("SELECT COUNT(*) AS count FROM nationalities")
+    assert cursor.fetchone()["count"] == 3
+    cursor.execute("SELECT COUNT(*) AS count FROM source_snapshots")
+    assert cursor.fetchone()["count"] == 2
+    assert not any(name.endswith(("_staging", "_old")) for name in _tables(cursor))
+    # the summary tables went live with the list they describe
+    assert check_stats(cursor) == []
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    assert not any("_staging" in row["name"] for row in cursor.fetchall())
+
+
+def test_failed_validation_leaves_the_live_tables_intact(conn, cursor):
+    _load_live(cursor)
+    conn.commit()
+
+    tables, index = _stage(cursor, [record("Nadia Farouk")])
+    with pytest.raises(ValueError):
+        validate_staging(cursor, tables, index)
+    discard_staging(cursor)
+    conn.commit()
+
+    assert entity_count(cursor) == 3
+    cursor.execute("SELECT alias_name FROM aliases")
+    assert [row["alias_name"] for row in cursor.fetchall()] == ["Abu Ali"]
+    assert check_stats(cursor) == []
+    assert not any(name.endswith("_staging") for name in _tables(cursor))
+
+
+def test_swapped_tables_keep_their_indexes_and_foreign_keys(conn, cursor):
+    _load_live(cursor)
+    conn.commit()
+
+    tables, index = _stage(cursor, LIVE)
+    validate_staging(cursor, tables, index)
+    swap_staging(cursor, tables)
+    conn.commit()
+
+    for table, keys in SECONDARY_KEYS.items():
+        assert {columns for _, columns in keys} <= _indexed_columns(cursor, table)
+    # kept on the staging table through the load rather than rebuilt
+    assert "name_hash" in _indexed_columns(cursor, "sanctioned_entities")
+    for table in SECONDARY_KEYS:
+        expected = {(column, ref_table) for fk_table, column, ref_table, _ in FOREIGN_KEYS if fk_table == table}
+        assert _foreign_keys(cursor, table) == expected
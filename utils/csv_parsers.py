@@ -0,0 +1,48 @@
+import csv
+import io
+
+from utils.records import record_from_row
+
+# Cells read as missing: pandas.read_csv's default NA markers, which this
+# reader replaced, so the loaded values did not change
+NULL_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+# Header spellings mapped onto the export layout
+COLUMN_ALIASES = {
+    'SanctionType': 'Sanction Type',
+}
+
+
+def parse_csv(csv_data, source: str, encoding='utf-8-sig'):
+    """
+    Streams a flat CSV export (Name, Alias, Nationality, Designation,
+    Sanction Type, Source) row by row with the csv module and yields one
+    SanctionRecord per row, so memory stays flat regardless of the file size.
+    `csv_data` is raw bytes/str or an open binary file object. Null markers
+    become None as each row is read; rows without a Source get `source`.
+    """
+    if isinstance(csv_data, str):
+        csv_data = csv_data.encode(encoding)
+    if isinstance(csv_data, (bytes, bytearray)):
+        csv_data = io.BytesIO(csv_data)
+    stream = io.TextIOWrapper(csv_data, encoding=encoding, newline='')
+    try:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [COLUMN_ALIASES.get(name.strip(), name.strip()) for name in header]
+        for values in reader:
+            if not any(values):
+                continue
+            row = {column: (None if value in NULL_VALUES else value)
+                   for column, value in zip(columns, values)}
+            if not row.get('Source'):
+                row['Source'] = source
+            yield record_from_row(row)
+    finally:
+        # hand the binary stream back to the caller instead of closing it
+        stream.detach()
@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CACHE_DIR = os.getenv("FEED_CACHE_DIR", "cache/feeds")
+
+# (connect, read) timeouts in seconds
+REQUEST_TIMEOUT = (10, 120)
+
+
+def feed_hash(content, block_size=1 << 20):
+    """SHA-256 of a feed given as bytes or as a local file path."""
+    digest = hashlib.sha256()
+    if isinstance(content, str):
+        with open(content, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    else:
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def make_session(pool_size=10):
+    """A pooled requests.Session shared by every fetch in a run."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class FeedCache:
+    """
+    On-disk cache of raw URL feeds. For each source it keeps the gzip-compressed
+    body plus a small JSON sidecar with the ETag, Last-Modified and SHA-256 of
+    the body, which are used to make the next download conditional.
+
+    Fetched bodies are only recorded once the caller calls `commit()` after
+    the source has been loaded, so a failed load is retried on the next run.
+    A full reload reads an unchanged feed back with `read_body()` instead of
+    downloading it again.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.pending = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, source_name):
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', source_name)
+        base = os.path.join(self.cache_dir, slug)
+        return base + ".body.gz", base + ".json"
+
+    def load_meta(self, source_name):
+        _, meta_path = self._paths(source_name)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def read_body(self, source_name):
+        """The body of the last committed fetch of `source_name`, or None if none is cached."""
+        body_path, _ = self._paths(source_name)
+        try:
+            with gzip.open(body_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def fetch(self, session, source_name, url, force=False, timeout=REQUEST_TIMEOUT):
+        """
+        Conditionally download `url`. Returns the body, or None when the server
+        answers 304 or the body hashes to what was loaded last time.
+        """
+        meta = {} if force else self.load_meta(source_name)
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        resp = session.get(url, headers=headers, timeout=timeout)
+        if resp.status_code == 304:
+            return None
+        resp.raise_for_status()
+
+        content = resp.content
+        digest = feed_hash(content)
+        new_meta = {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "sha256": digest,
+        }
+        if meta.get("sha256") == digest:
+            # same bytes under new validators; remember them so the next request can 304
+            self._write_meta(source_name, new_meta)
+            return None
+
+        self.pending[source_name] = (content, new_meta)
+        return content
+
+    def commit(self, source_name):
+        """Persist the body fetched for `source_name` once it has been loaded."""
+        entry = self.pending.pop(source_name, None)
+        if entry is None:
+            return
+        content, meta = entry
+        body_path, _ = self._paths(source_name)
+        tmp_path = body_path + ".tmp"
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, body_path)
+        self._write_meta(source_name, meta)
+
+    def discard(self, source_name):
+        self.pending.pop(source_name, None)
+
+    def _write_meta(self, source_name, meta):
+        _, meta_path = self._paths(source_name)
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, meta_path)
@@ -0,0 +1,357 @@
+"""
+Declarative source mappings. Each XML feed is described by a JSON file in
+config/mappings/ instead of a hand-written parse function:
+
+    {
+      "lookups": {                       # ID-reference tables, filled while streaming
+        "sanctions_set": {"record": "sanctions-program", "path": "sanctions-set[@lang='eng']", "key": "@ssid"}
+      },
+      "records": {                       # record tag -> field rules
+        "target": {
+          "require": "individual",       # skip records without this path
+          "name": {"path": "individual/identity/name/name-part/value", "default": "Unknown"},
+          "sanction_types": {"path": "sanctions-set-id", "lookup": "sanctions_set", "unmapped": "keep"},
+          "designation": {"const": "individual"}
+        }
+      }
+    }
+
+Paths are relative to the record element, use local tag names (namespaces
+are ignored) and accept ElementTree-style predicates: [@attr='v'],
+[@attr!='v'], [@attr] and [n] for the n-th child with that tag. Field rules:
+
+    path / paths   where the values come from; with `paths` and `join`, the
+                   first value of each path is joined with the separator
+    take           "first" keeps only the first matching element
+    lookup         map each value through a lookup table; `unmapped` is
+                   "keep" (the raw value) or "skip"
+    before         keep the part of each value before this separator
+    default        used when nothing non-empty was found
+    const          a fixed value
+
+Every value is stripped and empty values are dropped. A mapping is compiled
+once into a tree of the paths it uses, and each record is handled in a
+single walk over that tree: every element the mapping needs is visited once,
+whatever the number of fields reading it, and subtrees no rule reaches are
+never entered.
+
+    from utils.mappings import mapping_parser
+    records = mapping_parser("un")(open("data/UN.xml", "rb"), "UN")
+"""
+import json
+import os
+import re
+
+from utils.records import SanctionRecord
+from utils.xml_parsers import _local, iter_elements
+
+MAPPINGS_DIR = os.getenv("SOURCE_MAPPINGS_DIR", "config/mappings")
+
+SCALAR_FIELDS = ('name', 'designation')
+LIST_FIELDS = ('aliases', 'nationalities', 'sanction_types')
+_RECORD_FIELDS = tuple(field for field in SanctionRecord._fields if field != 'source')
+
+_SEGMENT = re.compile(r"([\w.-]+)((?:\[[^\]]*\])*)")
+_PREDICATE = re.compile(r"\[(?:(\d+)|@([\w.-]+)(?:(!?=)'([^']*)')?)\]")
+
+
+def _parse_path(path):
+    """'a/b[@x='1']/c[1]' -> [('a', ()), ('b', (('eq', 'x', '1'),)), ('c', (('pos', None, 1),))]"""
+    segments = []
+    for part in path.split('/'):
+        match = _SEGMENT.fullmatch(part)
+        if match is None:
+            raise ValueError(f"unsupported path segment '{part}' in '{path}'")
+        tag, predicate_text = match.groups()
+        predicates = []
+        for position, attr, op, value in _PREDICATE.findall(predicate_text):
+            if position:
+                predicates.append(('pos', None, int(position)))
+            elif not op:
+                predicates.append(('has', attr, None))
+            else:
+                predicates.append(('eq' if op == '=' else 'ne', attr, value))
+        if ''.join(m.group(0) for m in _PREDICATE.finditer(predicate_text)) != predicate_text:
+            raise ValueError(f"unsupported predicate in '{part}' of '{path}'")
+        segments.append((tag, tuple(predicates)))
+    return segments
+
+
+def _matches(elem, position, predicates):
+    for kind, attr, value in predicates:
+        if kind == 'pos':
+            if position != value:
+                return False
+        elif kind == 'has':
+            if elem.get(attr) is None:
+                return False
+        # as in ElementTree, a missing attribute is "not equal"
+        elif (elem.get(attr) == value) != (kind == 'eq'):
+            return False
+    return True
+
+
+class _Node:
+    """One step of the compiled path tree; `slots` collect the elements matched here."""
+    __slots__ = ('children', 'slots', 'dispatch')
+
+    def __init__(self):
+        self.children = {}   # local tag -> [(predicates, _Node)]
+        self.slots = []
+        # raw tag as parsed (namespaced or not) -> branches, filled on first sight
+        self.dispatch = {}
+
+    def add(self, segments, slot):
+        node = self
+        for tag, predicates in segments:
+            branches = node.children.setdefault(tag, [])
+            for existing, child in branches:
+                if existing == predicates:
+                    break
+            else:
+                child = _Node()
+                branches.append((predicates, child))
+            node = child
+        node.slots.append(slot)
+
+    def branches(self, tag):
+        """(predicates, slots, node to descend into or None) for each branch matching the raw tag."""
+        branches = self.dispatch[tag] = tuple(
+            (predicates, tuple(child.slots), child if child.children else None)
+            for predicates, child in self.children.get(_local(tag), ())
+        )
+        return branches
+
+
+def _walk(elem, nodes, found):
+    """Collect into `found` the children of `elem` matched by `nodes`, recursing only where paths continue."""
+    if len(nodes) == 1:
+        return _walk_node(elem, nodes[0], found)
+    positions = None
+    for child in elem:
+        tag = child.tag
+        matched = None
+        position = None
+        for node in nodes:
+            branches = node.dispatch.get(tag)
+            if branches is None:
+                branches = node.branches(tag)
+            for predicates, slots, sub in branches:
+                if predicates:
+                    # [n] counts the siblings with this tag
+                    if position is None:
+                        if positions is None:
+                            positions = {}
+                        position = positions[tag] = positions.get(tag, 0) + 1
+                    if not _matches(child, position, predicates):
+                        continue
+                for slot in slots:
+                    found[slot].append(child)
+                if sub is not None:
+                    if matched is None:
+                        matched = [sub]
+                    else:
+                        matched.append(sub)
+        if matched:
+            _walk(child, matched, found)
+
+
+def _walk_node(elem, node, found):
+    """_walk for the usual case of a single active node."""
+    dispatch = node.dispatch
+    positions = None
+    for child in elem:
+        tag = child.tag
+        branches = dispatch.get(tag)
+        if branches is None:
+            branches = node.branches(tag)
+        if not branches:
+            continue
+        if len(branches) == 1 and not branches[0][0]:
+            _, slots, sub = branches[0]
+            for slot in slots:
+                found[slot].append(child)
+            if sub is not None:
+                _walk_node(child, sub, found)
+            continue
+        if positions is None:
+            positions = {}
+        position = positions[tag] = positions.get(tag, 0) + 1
+        matched = []
+        for predicates, slots, sub in branches:
+            if predicates and not _matches(child, position, predicates):
+                continue
+            for slot in slots:
+                found[slot].append(child)
+            if sub is not None:
+                matched.append(sub)
+        if matched:
+            _walk(child, matched, found)
+
+
+def _text(elem):
+    return (elem.text or '').strip()
+
+
+class _Tree:
+    """Path tree of one record tag; every path added gets a slot in the result of `collect`."""
+
+    def __init__(self):
+        self.root = _Node()
+        self.size = 0
+
+    def add(self, path):
+        slot = self.size
+        self.root.add(_parse_path(path), slot)
+        self.size += 1
+        return slot
+
+    def collect(self, elem):
+        found = [[] for _ in range(self.size)]
+        _walk(elem, (self.root,), found)
+        return found
+
+
+def _compile_field(field, rule, tree, lookup_names):
+    """Return fn(found, lookups) producing the value of `field` from the collected elements."""
+    is_list = field in LIST_FIELDS
+    if 'const' in rule:
+        constant = tuple(rule['const']) if is_list else rule['const']
+        return lambda found, lookups: constant
+
+    default = rule.get('default')
+    if is_list:
+        default = tuple(default or ())
+    if 'paths' in rule:
+        if 'join' not in rule:
+            raise ValueError(f"'{field}': 'paths' needs a 'join' separator")
+        slots = [tree.add(path) for path in rule['paths']]
+        separator = rule['join']
+
+        def joined(found, lookups):
+            value = separator.join(filter(None, (_text(found[slot][0]) for slot in slots if found[slot])))
+            if is_list:
+                return (value,) if value else default
+            return value or default
+        return joined
+
+    slot = tree.add(rule['path'])
+    first = rule.get('take', 'all' if is_list else 'first') == 'first'
+    lookup = rule.get('lookup')
+    if lookup is not None and lookup not in lookup_names:
+        raise ValueError(f"'{field}' uses undefined lookup '{lookup}'")
+    keep_unmapped = rule.get('unmapped', 'keep') == 'keep'
+    before = rule.get('before')
+
+    # the common rules get a direct function instead of the general generator below
+    if lookup is None and before is None:
+        if first:
+            def first_text(found, lookups):
+                elements = found[slot]
+                value = (elements[0].text or '').strip() if elements else ''
+                if is_list:
+                    return (value,) if value else default
+                return value or default
+            return first_text
+        if is_list:
+            def all_texts(found, lookups):
+                return tuple(filter(None, [(elem.text or '').strip() for elem in found[slot]])) or default
+            return all_texts
+
+    def values(found, lookups):
+        elements = found[slot][:1] if first and lookup is None else found[slot]
+        table = lookups[lookup] if lookup is not None else None
+        for elem in elements:
+            value = _text(elem)
+            if table is not None:
+                if value in table:
+                    value = table[value]
+                elif not keep_unmapped:
+                    continue
+            if before is not None:
+                value = value.split(before, 1)[0].strip()
+            if value:
+                yield value
+            # with a lookup, "first" means the first value that maps
+            if first:
+                return
+
+    if is_list:
+        return lambda found, lookups: tuple(values(found, lookups)) or default
+    return lambda found, lookups: next(values(found, lookups), default)
+
+
+class MappedParser:
+    """
+    A compiled mapping: called like the functions in utils.xml_parsers, with
+    the feed (bytes, str or a binary stream) and the source name, it yields
+    SanctionRecords.
+    """
+
+    def __init__(self, mapping, name=None):
+        self.name = name
+        self.lookups = {}    # record tag -> [(lookup name, tree, key attribute)]
+        self.records = {}    # record tag -> (tree, require slot, field functions)
+        lookup_names = set(mapping.get('lookups', {}))
+
+        for lookup_name, rule in mapping.get('lookups', {}).items():
+            key = rule.get('key', '')
+            if not key.startswith('@'):
+                raise ValueError(f"lookup '{lookup_name}': key must name an attribute, e.g. '@ssid'")
+            tree = _Tree()
+            tree.add(rule['path'])
+            self.lookups.setdefault(rule['record'], []).append((lookup_name, tree, key[1:]))
+
+        for tag, rules in mapping['records'].items():
+            unknown = set(rules) - set(_RECORD_FIELDS) - {'require'}
+            if unknown:
+                raise ValueError(f"record '{tag}': unknown fields {sorted(unknown)}")
+            tree = _Tree()
+            require = tree.add(rules['require']) if 'require' in rules else None
+            fields = tuple(
+                _compile_field(field, rules[field], tree, lookup_names) if field in rules
+                else self._empty(field)
+                for field in _RECORD_FIELDS
+            )
+            self.records[tag] = (tree, require, fields)
+
+        self.tags = set(self.records) | set(self.lookups)
+
+    @staticmethod
+    def _empty(field):
+        empty = () if field in LIST_FIELDS else None
+        return lambda found, lookups: empty
+
+    def __call__(self, xml_data, source: str):
+        tables = {name: {} for entries in self.lookups.values() for name, _, _ in entries}
+        for elem in iter_elements(xml_data, self.tags):
+            tag = _local(elem.tag)
+            # lookup tables precede the records that reference them in every feed
+            for lookup_name, tree, key in self.lookups.get(tag, ()):
+                table = tables[lookup_name]
+                for matched in tree.collect(elem)[0]:
+                    table[matched.get(key)] = _text(matched)
+            compiled = self.records.get(tag)
+            if compiled is None:
+                continue
+            tree, require, fields = compiled
+            found = tree.collect(elem)
+            if require is not None and not found[require]:
+                continue
+            yield SanctionRecord(*(field(found, tables) for field in fields), source)
+
+
+def load_mapping(name, directory=MAPPINGS_DIR):
+    with open(os.path.join(directory, f"{name}.json")) as f:
+        return json.load(f)
+
+
+def mapping_parser(name, directory=MAPPINGS_DIR):
+    """Load and compile config/mappings/<name>.json."""
+    return MappedParser(load_mapping(name, directory), name)
+
+
+def available_mappings(directory=MAPPINGS_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f[:-len('.json')] for f in os.listdir(directory) if f.endswith('.json'))
@@ -0,0 +1,166 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from pymysql.cursors import RE_INSERT_VALUES
+
+METRICS_PATH = os.getenv("ETL_METRICS_PATH", "artifacts/etl_metrics.jsonl")
+PROFILE_DIR = os.getenv("ETL_PROFILE_DIR", "artifacts/profiles")
+PROMETHEUS_PREFIX = "sanctions_etl"
+
+
+class Metrics:
+    """
+    Per-source timers and counters for one ETL run. Fetch threads and the
+    writer update it concurrently; parse workers report their numbers back
+    through the queue. `current` names the source the writer is loading, so
+    the SQL counting cursor can attribute statements to it.
+    """
+
+    def __init__(self):
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.sources = {}
+        self.current = None
+        self._lock = threading.Lock()
+
+    def add(self, source, name, value=1):
+        with self._lock:
+            stats = self.sources.setdefault(source, {})
+            stats[name] = stats.get(name, 0) + value
+
+    def set(self, source, name, value):
+        with self._lock:
+            self.sources.setdefault(source, {})[name] = value
+
+    @contextmanager
+    def timer(self, source, name):
+        """Add the time spent in the block to `<name>_seconds` of `source`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(source, f"{name}_seconds", time.perf_counter() - start)
+
+    def rows(self):
+        """One flat dict per source, with derived rates."""
+        rows = []
+        for source, stats in self.sources.items():
+            row = {"run_id": self.run_id, "source": source}
+            row.update({name: round(value, 6) if isinstance(value, float) else value
+                        for name, value in sorted(stats.items())})
+            if stats.get("records") and stats.get("write_seconds"):
+                row["records_per_sec"] = round(stats["records"] / stats["write_seconds"], 1)
+            if stats.get("parsed") and stats.get("parse_seconds"):
+                row["parse_records_per_sec"] = round(stats["parsed"] / stats["parse_seconds"], 1)
+            rows.append(row)
+        return rows
+
+    def write_json_lines(self, path=METRICS_PATH):
+        """Append this run's metrics to `path`, one JSON object per source."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        timestamp = datetime.now(timezone.utc).isoformat()
+        with open(path, "a") as f:
+            for row in self.rows():
+                f.write(json.dumps(dict(row, ts=timestamp)) + "\n")
+        return path
+
+    def write_prometheus(self, path):
+        """Write the run's metrics as gauges in Prometheus text exposition format."""
+        by_metric = {}
+        for row in self.rows():
+            for name, value in row.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    by_metric.setdefault(name, []).append((row["source"], value))
+        lines = []
+        for name, samples in sorted(by_metric.items()):
+            metric = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            for source, value in samples:
+                label = source.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{metric}{{source="{label}"}} {value}')
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        # node_exporter's textfile collector must never read a partial file
+        os.replace(tmp_path, path)
+        return path
+
+
+class CountingCursor:
+    """
+    Cursor proxy that counts SQL statements and server round trips for the
+    metrics' current source. pymysql folds an executemany INSERT ... VALUES
+    into one multi-row statement; any other executemany is one round trip
+    per row.
+    """
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    def execute(self, query, args=None):
+        self._metrics.add(self._metrics.current, "sql_statements")
+        self._metrics.add(self._metrics.current, "round_trips")
+        return self._cursor.execute(query, args)
+
+    def executemany(self, query, args):
+        args = list(args)
+        self._metrics.add(self._metrics.current, "sql_statements", len(args))
+        trips = 1 if RE_INSERT_VALUES.match(query) else len(args)
+        self._metrics.add(self._metrics.current, "round_trips", trips)
+        return self._cursor.executemany(query, args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+@contextmanager
+def profiled(name, profile=False, trace_memory=False, out_dir=PROFILE_DIR):
+    """
+    Opt-in cProfile / tracemalloc around a block. The profile is saved to
+    `<out_dir>/<name>.prof` (open with pstats or snakeviz) and the top
+    allocation sites to `<out_dir>/<name>.tracemalloc.txt`. Yields a dict
+    that holds `peak_bytes` after the block when memory is traced.
+    """
+    result = {}
+    profiler = cProfile.Profile() if profile else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield result
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if profile or trace_memory:
+            os.makedirs(out_dir, exist_ok=True)
+        slug = "".join(c if c.isalnum() or c in "._-" else "_" for c in name)
+        base = os.path.join(out_dir, slug)
+        if profiler is not None:
+            profiler.dump_stats(base + ".prof")
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+            print(f"  [INFO] Profile for {name} written to {base}.prof")
+            print(summary.getvalue())
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["peak_bytes"] = peak
+            with open(base + ".tracemalloc.txt", "w") as f:
+                f.write(f"peak {peak} bytes\n")
+                for stat in snapshot.statistics("lineno")[:25]:
+                    f.write(f"{stat}\n")
+            print(f"  [INFO] Peak traced memory for {name}: {peak / 2**20:.1f} MiB "
+                  f"(top allocations in {base}.tracemalloc.txt)")
@@ -0,0 +1,64 @@
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_key(value):
+    """Case-folded, whitespace-collapsed form of a value used for dedup lookups."""
+    if value is None:
+        return None
+    return _WHITESPACE.sub(' ', str(value)).strip().casefold()
+
+
+def _word_char(ch):
+    # letters and digits of any script, and the spacing vowel signs of Indic scripts
+    return ch.isalnum() or unicodedata.category(ch)[0] == 'M'
+
+
+def normalize_name(value, sort_tokens=True):
+    """
+    Matching form of a person/entity name: diacritics stripped, case-folded,
+    punctuation collapsed to single spaces and (by default) tokens sorted so
+    that word order does not matter. Letters of every script are kept, so
+    names written in Cyrillic, Arabic, CJK etc. still have a matching form.
+    """
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+    tokens = ''.join(ch if _word_char(ch) else ' ' for ch in stripped).split()
+    if sort_tokens:
+        tokens.sort()
+    return ' '.join(tokens)
+
+
+_SOUNDEX_CODES = {}
+for _letters, _code in (('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')):
+    for _letter in _letters:
+        _SOUNDEX_CODES[_letter] = _code
+
+
+def phonetic_key(token):
+    """American Soundex code of a single normalized token ('' for digits-only tokens)."""
+    letters = [ch for ch in token if 'a' <= ch <= 'z']
+    if not letters:
+        return ''
+    first = letters[0]
+    code = [first.upper()]
+    last = _SOUNDEX_CODES.get(first, '')
+    for ch in letters[1:]:
+        digit = _SOUNDEX_CODES.get(ch, '')
+        if digit and digit != last:
+            code.append(digit)
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code; vowels do
+        if ch not in 'hw':
+            last = digit
+    return ''.join(code).ljust(4, '0')
+
+
+def phonetic_keys(normalized):
+    """Set of Soundex codes for the tokens of an already normalized name."""
+    return {key for key in (phonetic_key(t) for t in normalized.split()) if key}
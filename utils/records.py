@@ -0,0 +1,57 @@
+from typing import NamedTuple, Optional, Tuple
+
+# Column names of the flat CSV exports (un_sanctions_data.csv, ...)
+CSV_COLUMNS = ["Name", "Alias", "Nationality", "Designation", "Sanction Type", "Source"]
+
+
+class SanctionRecord(NamedTuple):
+    """
+    One listed entity as produced by a feed parser. A plain tuple, so it costs
+    a fraction of the equivalent dict and pickles compactly between the parse
+    workers and the writer. Multi-valued fields are tuples of strings and are
+    written to the child tables as they are, without a join/split round trip.
+    """
+    name: Optional[str]
+    aliases: Tuple[str, ...] = ()
+    nationalities: Tuple[str, ...] = ()
+    designation: Optional[str] = None
+    sanction_types: Tuple[str, ...] = ()
+    source: Optional[str] = None
+
+    def as_row(self):
+        """The record in the flat CSV export layout, multi-valued fields comma-joined."""
+        return {
+            "Name": self.name,
+            "Alias": ', '.join(self.aliases) or None,
+            "Nationality": ', '.join(self.nationalities) or None,
+            "Designation": self.designation,
+            "Sanction Type": ', '.join(self.sanction_types) or None,
+            "Source": self.source,
+        }
+
+
+def split_field(value, sep=','):
+    """Split a comma-joined export cell into a tuple of stripped, non-empty values."""
+    if not value or not isinstance(value, str):
+        return ()
+    return tuple(v.strip() for v in value.split(sep) if v.strip())
+
+
+def _cell(value):
+    # pandas hands back NaN for empty cells in float-typed columns
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    return value or None
+
+
+def record_from_row(row):
+    """Build a SanctionRecord from a flat export row (a dict keyed by CSV_COLUMNS)."""
+    return SanctionRecord(
+        name=_cell(row.get("Name")),
+        aliases=split_field(row.get("Alias"), ', '),
+        nationalities=split_field(row.get("Nationality")),
+        designation=_cell(row.get("Designation")),
+        sanction_types=split_field(row.get("Sanction Type")),
+        source=_cell(row.get("Source")),
+    )
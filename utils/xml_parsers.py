@@ -1,77 +1,118 @@
 
+import io
 import xml.etree.ElementTree as ET
 
-def parse_un(xml_data: str, source: str):
+from utils.records import SanctionRecord
+
+
+def _as_stream(xml_data):
+    """Accept raw bytes/str or an already open binary file object."""
+    if isinstance(xml_data, str):
+        xml_data = xml_data.encode('utf-8')
+    if isinstance(xml_data, (bytes, bytearray)):
+        return io.BytesIO(xml_data)
+    return xml_data
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_elements(xml_data, tags):
+    """
+    Streams the document with iterparse and yields every element whose local
+    tag is in `tags` once it is fully built. After the caller is done with it
+    the element is cleared and detached from its parent, so memory stays flat
+    regardless of the feed size.
+    """
+    stack = []
+    for event, elem in ET.iterparse(_as_stream(xml_data), events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        stack.pop()
+        if _local(elem.tag) in tags:
+            yield elem
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+
+def parse_un(xml_data, source: str):
     """
     Parses the UN Sanctions List (both individuals and entities) into unified flat records.
+    Yields one record per INDIVIDUAL/ENTITY element.
     """
-    root = ET.fromstring(xml_data)
-    records = []
+    for elem in iter_elements(xml_data, {'INDIVIDUAL', 'ENTITY'}):
+        if elem.tag == 'INDIVIDUAL':
+            yield _un_individual(elem, source)
+        else:
+            yield _un_entity(elem, source)
+
 
-    # Handle INDIVIDUALS
-    for individual in root.findall('.//INDIVIDUAL'):
-        first = individual.findtext('FIRST_NAME', '').strip()
-        second = individual.findtext('SECOND_NAME', '').strip()
-        third = individual.findtext('THIRD_NAME', '').strip()
-        full_name = ' '.join(filter(None, [first, second, third])) or 'Unknown'
+def _un_individual(individual, source):
+    first = individual.findtext('FIRST_NAME', '').strip()
+    second = individual.findtext('SECOND_NAME', '').strip()
+    third = individual.findtext('THIRD_NAME', '').strip()
+    full_name = ' '.join(filter(None, [first, second, third])) or 'Unknown'
 
-        alias_elements = individual.findall('INDIVIDUAL_ALIAS')
-        alias = alias_elements[0].findtext('ALIAS_NAME').strip() if alias_elements else None
+    alias_elements = individual.findall('INDIVIDUAL_ALIAS')
+    alias = alias_elements[0].findtext('ALIAS_NAME').strip() if alias_elements else None
 
-        nationality_elements = individual.findall('NATIONALITY/VALUE')
-        nationality = nationality_elements[0].text.strip() if nationality_elements else 'Unknown'
+    nationality_elements = individual.findall('NATIONALITY/VALUE')
+    nationality = nationality_elements[0].text.strip() if nationality_elements else 'Unknown'
 
-        designation_elements = individual.findall('DESIGNATION/VALUE')
-        designation = designation_elements[0].text.strip() if designation_elements else 'individual'
+    designation_elements = individual.findall('DESIGNATION/VALUE')
+    designation = designation_elements[0].text.strip() if designation_elements else 'individual'
 
-        sanction_type = individual.findtext('UN_LIST_TYPE', 'Unknown').strip()
+    sanction_type = individual.findtext('UN_LIST_TYPE', 'Unknown').strip()
 
-        records.append({
-            "Name": full_name,
-            "Alias": alias,
-            "Nationality": nationality,
-            "Designation": designation,
-            "Sanction Type": sanction_type,
-            "Source": source
-        })
+    return SanctionRecord(
+        name=full_name,
+        aliases=(alias,) if alias else (),
+        nationalities=(nationality,) if nationality else (),
+        designation=designation,
+        sanction_types=(sanction_type,) if sanction_type else (),
+        source=source,
+    )
 
-    # Handle ENTITIES
-    for entity in root.findall('.//ENTITY'):
-        name = entity.findtext('FIRST_NAME', 'Unknown').strip()
 
-        alias_elements = entity.findall('ENTITY_ALIAS')
-        alias = alias_elements[0].findtext('ALIAS_NAME').strip() if alias_elements else None
+def _un_entity(entity, source):
+    name = entity.findtext('FIRST_NAME', 'Unknown').strip()
 
-        nationality_elements = entity.findall('NATIONALITY/VALUE')
-        nationality = nationality_elements[0].text.strip() if nationality_elements else 'Unknown'
+    alias_elements = entity.findall('ENTITY_ALIAS')
+    alias = alias_elements[0].findtext('ALIAS_NAME').strip() if alias_elements else None
 
-        designation = 'entity'
+    nationality_elements = entity.findall('NATIONALITY/VALUE')
+    nationality = nationality_elements[0].text.strip() if nationality_elements else 'Unknown'
 
-        sanction_type = entity.findtext('UN_LIST_TYPE', 'Unknown').strip()
+    designation = 'entity'
 
-        records.append({
-            "Name": name,
-            "Alias": alias,
-            "Nationality": nationality,
-            "Designation": designation,
-            "Sanction Type": sanction_type,
-            "Source": source
-        })
+    sanction_type = entity.findtext('UN_LIST_TYPE', 'Unknown').strip()
 
-    return records
+    return SanctionRecord(
+        name=name,
+        aliases=(alias,) if alias else (),
+        nationalities=(nationality,) if nationality else (),
+        designation=designation,
+        sanction_types=(sanction_type,) if sanction_type else (),
+        source=source,
+    )
 
 
-def parse_xml(xml_data: str, source: str):
+def parse_xml(xml_data, source: str):
 
     """
-    Parses an OFAC SDN feed and returns a list of dicts with keys:
-      Name, Alias, Nationality, Designation, Sanction Type, Source, Date of Birth, Place of Birth
+    Parses an OFAC SDN feed and yields one SanctionRecord per sdnEntry
+    (name, aliases, nationalities, designation, sanction types, source).
     """
-    ns_uri = ET.fromstring(xml_data).tag
-    ns = {'ns': ns_uri[ns_uri.find("{")+1 : ns_uri.find("}")]}
-    
-    records = []
-    for entry in ET.fromstring(xml_data).findall(".//ns:sdnEntry", ns):
+    ns = None
+    for entry in iter_elements(xml_data, {'sdnEntry'}):
+        # Namespace is taken from the first entry, so the feed is only read once
+        if ns is None:
+            ns_uri = entry.tag
+            ns = {'ns': ns_uri[ns_uri.find("{")+1 : ns_uri.find("}")]}
+
         # 1) Name
         fn = entry.findtext("ns:firstName", default="", namespaces=ns)
         ln = entry.findtext("ns:lastName",  default="", namespaces=ns)
@@ -92,8 +133,7 @@ def parse_xml(xml_data: str, source: str):
         
         # 5) Sanction Type(s) = all <program> under <programList>
         programs = entry.findall("ns:programList/ns:program", ns)
-        sanction_types = [p.text for p in programs if p is not None]
-        sanction_type_str = ", ".join(sanction_types) if sanction_types else "Unknown"
+        sanction_types = tuple(p.text.strip() for p in programs if p.text and p.text.strip()) or ("Unknown",)
         
         # # 6) Date / Place of Birth (you already have these)
         # dob = entry.findtext("ns:dateOfBirthList/ns:dateOfBirthItem/ns:dateOfBirth",
@@ -104,41 +144,36 @@ def parse_xml(xml_data: str, source: str):
         # 7) Source (constant passed in)
         source_val = source
         
-        records.append({
-            "Name":           name,
-            "Alias":          aka,
-            "Nationality":    nationality,
-            "Designation":    designation,
-            "Sanction Type":  sanction_type_str,
-            "Source":         source_val,
-            # "Date of Birth":  dob,
-            # "Place of Birth": pob
-        })
-    
-    return records
-
-
-def parse_sdn(xml_data: bytes, source: str):
+        yield SanctionRecord(
+            name=name,
+            aliases=(aka.strip(),) if aka.strip() else (),
+            nationalities=(nationality.strip(),) if nationality.strip() else (),
+            designation=designation,
+            sanction_types=sanction_types,
+            source=source_val,
+        )
+
+
+def parse_sdn(xml_data, source: str):
     """
-    Parses the usoafc-sdn Sanctions List into the unified schema:
-      Name, Alias, Nationality, Designation, Sanction Type, Source
+    Parses the usoafc-sdn Sanctions List into SanctionRecords.
+    The feed lists every <sanctions-program> before the first <target>, so the
+    sanctions-set map is complete by the time targets are streamed.
     """
-    root = ET.fromstring(xml_data)
-
-    # 1) Build a map of sanctions-set IDs → English description
     set_map = {}
-    for prog in root.findall('sanctions-program'):
-        for s in prog.findall("sanctions-set[@lang='eng']"):
-            sid = s.get('ssid')
-            set_map[sid] = s.text.strip()
-
-    records = []
-    # 2) Loop over each <target>
-    for tgt in root.findall('target'):
+    for elem in iter_elements(xml_data, {'sanctions-program', 'target'}):
+        # 1) Build a map of sanctions-set IDs → English description
+        if elem.tag == 'sanctions-program':
+            for s in elem.findall("sanctions-set[@lang='eng']"):
+                sid = s.get('ssid')
+                set_map[sid] = s.text.strip()
+            continue
+
+        # 2) Each <target>
+        tgt = elem
         # a) collect all referenced sanctions-set IDs, map to text
         sids = [e.text for e in tgt.findall('sanctions-set-id')]
-        sanction_types = [ set_map.get(sid, sid) for sid in sids ]
-        sanction_type_str = ', '.join(sanction_types) if sanction_types else 'Unknown'
+        sanction_types = tuple(set_map.get(sid, sid) for sid in sids) or ('Unknown',)
 
         # b) find the individual node
         indiv = tgt.find('individual')
@@ -151,8 +186,7 @@ def parse_sdn(xml_data: bytes, source: str):
             default='Unknown'
         ).strip()
 
-        # d) Alias: not present in this feed, so we'll default to None
-        alias = None
+        # d) Alias: not present in this feed
 
         # e) Nationality: identity/nationality/country
         nationality = indiv.findtext(
@@ -163,16 +197,13 @@ def parse_sdn(xml_data: bytes, source: str):
         # f) Designation: the fact that this is an <individual>
         designation = 'individual'
 
-        records.append({
-            "Name":           name,
-            "Alias":          alias,
-            "Nationality":    nationality,
-            "Designation":    designation,
-            "Sanction Type":  sanction_type_str,
-            "Source":         source
-        })
-
-    return records
+        yield SanctionRecord(
+            name=name,
+            nationalities=(nationality,) if nationality else (),
+            designation=designation,
+            sanction_types=sanction_types,
+            source=source,
+        )
 
 # this function parses the xml file as this had missing value so we will predict the missing value and will be using that.
 # def parse_uk(xml_data: str, source: str):
@@ -245,24 +276,24 @@ def parse_sdn(xml_data: bytes, source: str):
 #     return results
 
 
-def parse_swiss(xml_data: str, source: str):
+def parse_swiss(xml_data, source: str):
     """
-    Parses the Swiss Sanctions List into the unified schema:
-    Name, Alias, Nationality, Designation, Sanction Type, Source
+    Parses the Swiss Sanctions List into SanctionRecords.
+    Programs precede targets in the feed, so the sanctions-set map is built
+    while streaming.
     """
-    root = ET.fromstring(xml_data)
-    records = []
-
-    # Build a mapping from sanctions-set-id to designation (sanction type)
     ssid_to_designation = {}
-    for prog in root.findall('sanctions-program'):
-        for sset in prog.findall('sanctions-set'):
-            ssid = sset.attrib.get('ssid')
-            designation = sset.text.strip() if sset.text else ''
-            ssid_to_designation[ssid] = designation
-
-    # Parse each target (person/organization)
-    for target in root.findall('target'):
+    for elem in iter_elements(xml_data, {'sanctions-program', 'target'}):
+        # Build a mapping from sanctions-set-id to designation (sanction type)
+        if elem.tag == 'sanctions-program':
+            for sset in elem.findall('sanctions-set'):
+                ssid = sset.attrib.get('ssid')
+                designation = sset.text.strip() if sset.text else ''
+                ssid_to_designation[ssid] = designation
+            continue
+
+        # Parse each target (person/organization)
+        target = elem
         name = ''
         aliases = []
         nationalities = []
@@ -300,19 +331,11 @@ def parse_swiss(xml_data: str, source: str):
                         if country.text:
                             nationalities.append(country.text.strip())
 
-        # Prepare alias string or None if empty
-        alias_str = ', '.join(aliases).strip()
-        if not alias_str:
-            alias_str = None
-
-        # Append record
-        records.append({
-            'Name': name if name else None,
-            'Alias': alias_str,
-            'Nationality': ', '.join(nationalities) if nationalities else None,
-            'Designation': designation,
-            'Sanction Type': 'Individual',
-            'Source': source
-        })
-
-    return records
\ No newline at end of file
+        yield SanctionRecord(
+            name=name if name else None,
+            aliases=tuple(alias for alias in aliases if alias),
+            nationalities=tuple(nationalities),
+            designation=designation,
+            sanction_types=('Individual',),
+            source=source,
+        )
\ No newline at end of file